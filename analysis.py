@@ -3,20 +3,27 @@ Trend and momentum scoring for shitcoin hunting.
 Not financial advice — scores measure recent buzz and price action only.
 """
 
+import bisect
+import heapq
 import math
-from datetime import datetime, timezone
+import time
+from datetime import datetime
+from operator import itemgetter
+from typing import NamedTuple
 
 from config import (
-    WEIGHT_PRICE_CHANGE_24H,
-    WEIGHT_VOL_MCAP_RATIO,
-    WEIGHT_TRENDING,
-    WEIGHT_PRICE_CHANGE_7D,
-    WEIGHT_MARKET_CAP_RANK,
-    NEWLY_LISTED_BONUS,
+    NEWLY_LISTED_DAYS,
     BLUE_CHIP_RANK_CUTOFF,
     STABLECOIN_IDS,
     STABLECOIN_SYMBOLS,
+    QUANTILE_CLIP,
+    QUANTILE_SKETCH_K,
 )
+import features
+import profiles
+import scoring_engine
+from profiles import ScanProfile, DEFAULT_WEIGHTS
+from quantiles import KLLSketch
 
 # Sentinel value returned for coins that are filtered out (stables, blue chips)
 FILTERED_OUT = -1.0
@@ -44,26 +51,88 @@ def _normalize_log(value: float, lo: float, hi: float) -> float:
     return max(0.0, min(1.0, (lv - ll) / (lh - ll)))
 
 
+def _parse_atl(atl_date: str | None) -> float | None:
+    """ATL date → epoch seconds; None if missing, unparseable or without a timezone."""
+    if not atl_date:
+        return None
+    try:
+        dt = datetime.fromisoformat(atl_date.replace("Z", "+00:00"))
+        return dt.timestamp() if dt.tzinfo is not None else None
+    except Exception:
+        return None
+
+
+# ── Derived-attribute cache ───────────────────────────────────────────────────
+class Derived:
+    """
+    Per-coin values that hardly ever change between scans, together with the
+    source fields they were derived from. Immutable once built, so readers on
+    other threads never see a half-updated entry.
+    """
+
+    __slots__ = ("id", "symbol", "atl_date", "id_lower", "stable", "atl_ts")
+
+    def __init__(self, cid: str, symbol: str | None, atl_date: str | None, prev: "Derived | None" = None):
+        self.id       = cid
+        self.symbol   = symbol
+        self.atl_date = atl_date
+        if prev is not None and prev.symbol == symbol:
+            self.id_lower, self.stable = prev.id_lower, prev.stable
+        else:
+            self.id_lower = cid.lower()
+            self.stable   = self.id_lower in STABLECOIN_IDS or (symbol or "").lower() in STABLECOIN_SYMBOLS
+        if prev is not None and prev.atl_date == atl_date:
+            self.atl_ts = prev.atl_ts
+        else:
+            self.atl_ts = _parse_atl(atl_date)
+
+
+class DerivedCache:
+    """
+    Derived attributes keyed by coin id. An entry is rebuilt only when the
+    symbol or atl_date it came from changes (and then only the affected part),
+    so repeated scans do no string or datetime work for known coins.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, Derived] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, coin: dict) -> Derived:
+        cid    = coin.get("id") or ""
+        symbol = coin.get("symbol")
+        atl    = coin.get("atl_date")
+        entry  = self._entries.get(cid)
+        if entry is None or entry.symbol != symbol or entry.atl_date != atl:
+            entry = Derived(cid, symbol, atl, entry)
+            if cid:
+                self._entries[cid] = entry
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+derived = DerivedCache()
+
+
 def _is_stablecoin(coin: dict) -> bool:
-    coin_id  = (coin.get("id") or "").lower()
-    symbol   = (coin.get("symbol") or "").lower()
-    return coin_id in STABLECOIN_IDS or symbol in STABLECOIN_SYMBOLS
+    return derived.get(coin).stable
 
 
-def _is_newly_listed(coin: dict) -> bool:
+def _is_newly_listed(coin: dict, now: float | None = None) -> bool:
     """
-    Proxy for 'new coin': ATL date within the last 180 days.
+    Proxy for 'new coin': ATL date within the last NEWLY_LISTED_DAYS (180) days.
     Not perfect but CoinGecko's markets endpoint doesn't give true listing date.
+    `now` (epoch seconds) lets a scan pass one reference time for every coin.
     """
-    atl_date = coin.get("atl_date") or ""
-    if not atl_date:
-        return False
-    try:
-        dt      = datetime.fromisoformat(atl_date.replace("Z", "+00:00"))
-        age_days = (datetime.now(timezone.utc) - dt).days
-        return age_days <= 180
-    except Exception:
+    atl_ts = derived.get(coin).atl_ts
+    if atl_ts is None:
         return False
+    now = time.time() if now is None else now
+    return (now - atl_ts) // 86400 <= NEWLY_LISTED_DAYS
 
 
 def score_coin(
@@ -76,14 +145,13 @@ def score_coin(
     pct_7d_lo: float = -50.0,
     pct_7d_hi: float = 400.0,
     exclude_blue_chips: bool = True,
+    now: float | None = None,
 ) -> float:
     """
     Compute a shitcoin momentum score (0–1). Returns FILTERED_OUT (-1) for
     stablecoins and blue chips (when exclude_blue_chips=True).
     Higher score = stronger recent momentum. NOT a prediction of future returns.
     """
-    trend_ids = trend_ids or set()
-
     # ── Hard filters ──────────────────────────────────────────────────────────
     if _is_stablecoin(coin):
         return FILTERED_OUT
@@ -92,102 +160,583 @@ def score_coin(
     if exclude_blue_chips and rank is not None and rank <= BLUE_CHIP_RANK_CUTOFF:
         return FILTERED_OUT
 
+    return _factor_score(
+        coin, trend_ids or set(),
+        vmr_lo, vmr_hi, pct_24h_lo, pct_24h_hi, pct_7d_lo, pct_7d_hi,
+        exclude_blue_chips, time.time() if now is None else now,
+    )
+
+
+def _factor_score(
+    coin: dict,
+    trend_ids: set[str],
+    vmr_lo: float,
+    vmr_hi: float,
+    pct_24h_lo: float,
+    pct_24h_hi: float,
+    pct_7d_lo: float,
+    pct_7d_hi: float,
+    exclude_blue_chips: bool,
+    now: float,
+    weights: dict[str, float] = DEFAULT_WEIGHTS,
+) -> float:
+    """
+    score_coin without the hard filters — for coins already known to pass them.
+    `weights` maps every factor to its weight (a ScanProfile's; config's by default).
+    """
+    rank  = coin.get("market_cap_rank")
     score = 0.0
+    w     = weights
 
     # ── 1. 24h price spike (highest weight, 0.30) ─────────────────────────────
     pct_24 = coin.get("price_change_percentage_24h")
     if pct_24 is not None:
-        score += WEIGHT_PRICE_CHANGE_24H * _normalize(pct_24, pct_24h_lo, pct_24h_hi)
+        score += w["pct_24h"] * _normalize(pct_24, pct_24h_lo, pct_24h_hi)
     else:
-        score += WEIGHT_PRICE_CHANGE_24H * 0.4   # slight penalty for missing data
+        score += w["pct_24h"] * 0.4   # slight penalty for missing data
 
     # ── 2. Volume / market cap ratio (0.25) ───────────────────────────────────
     # The single best "something is happening relative to the coin's size" signal.
     # Log-scaled because a ratio of 0.5 vs 2.0 matters, but 2.0 vs 5.0 matters less.
     vmr = coin.get("vol_mcap_ratio", 0.0)
-    score += WEIGHT_VOL_MCAP_RATIO * _normalize_log(vmr, vmr_lo, vmr_hi)
+    score += w["vmr"] * _normalize_log(vmr, vmr_lo, vmr_hi)
 
     # ── 3. Trending / gainers list bonus (0.20) ───────────────────────────────
-    cid = (coin.get("id") or "").lower()
-    if cid in trend_ids:
-        score += WEIGHT_TRENDING * 1.0   # on the list: full weight
+    d = derived.get(coin)
+    if d.id_lower in trend_ids:
+        score += w["trending"] * 1.0   # on the list: full weight
     else:
-        score += WEIGHT_TRENDING * 0.05  # off the list: tiny baseline (not zero)
+        score += w["trending"] * 0.05  # off the list: tiny baseline (not zero)
 
     # ── 4. 7d price change — sustained run (0.15) ─────────────────────────────
     pct_7 = coin.get("price_change_percentage_7d")
     if pct_7 is not None:
-        score += WEIGHT_PRICE_CHANGE_7D * _normalize(pct_7, pct_7d_lo, pct_7d_hi)
+        score += w["pct_7d"] * _normalize(pct_7, pct_7d_lo, pct_7d_hi)
     else:
-        score += WEIGHT_PRICE_CHANGE_7D * 0.4
+        score += w["pct_7d"] * 0.4
 
     # ── 5. Market cap rank — prefer micro/small cap (0.10) ───────────────────
     # Rank 50 = moderate, 500 = tiny. Both can move. We want the sweet spot, not rank 1.
     if rank is not None:
         cutoff = BLUE_CHIP_RANK_CUTOFF if exclude_blue_chips else 1
         rank_score = _normalize(rank, cutoff, 500)
-        score += WEIGHT_MARKET_CAP_RANK * rank_score
+        score += w["mcap_rank"] * rank_score
     else:
-        score += WEIGHT_MARKET_CAP_RANK * 0.7  # unknown rank → treat as small cap
+        score += w["mcap_rank"] * 0.7  # unknown rank → treat as small cap
 
     # ── 6. Newly listed proxy bonus (+0.05 flat) ──────────────────────────────
-    if _is_newly_listed(coin):
-        score += NEWLY_LISTED_BONUS
+    if d.atl_ts is not None and (now - d.atl_ts) // 86400 <= NEWLY_LISTED_DAYS:
+        score += w["newly_listed"]
+
+    # ── 7. Sparkline features (optional — FEATURE_WEIGHTS, all 0 by default) ──
+    for name, weight, lo, hi in features.scoring_factors(w):
+        value = coin.get(name)
+        score += weight * (0.4 if value is None else _normalize(value, lo, hi))
 
     return min(1.0, max(0.0, score))
 
 
+# ── Normalization ranges ──────────────────────────────────────────────────────
+# Range-normalized factors and the (lo, hi) used before any data has been seen
+FACTOR_DEFAULTS: dict[str, tuple[float, float]] = {
+    "vmr":     (0.0,   1.0),
+    "pct_24h": (-50.0, 200.0),
+    "pct_7d":  (-50.0, 400.0),
+}
+
+
+def _factor_values(c: dict) -> tuple:
+    """(vmr, pct_24h, pct_7d) of a coin, in FACTOR_DEFAULTS order; None = missing."""
+    return (
+        c.get("vol_mcap_ratio", 0.0),
+        c.get("price_change_percentage_24h"),
+        c.get("price_change_percentage_7d"),
+    )
+
+
+def _passes_rank_filters(coin: dict, exclude_blue_chips: bool, max_rank: int | None) -> bool:
+    """The market-cap-rank hard filters: blue-chip cut and a profile's max_rank."""
+    rank = coin.get("market_cap_rank")
+    if exclude_blue_chips and rank is not None and rank <= BLUE_CHIP_RANK_CUTOFF:
+        return False
+    return max_rank is None or (rank is not None and rank <= max_rank)
+
+
+def _trend_id_set(trending_coins: list[dict] | None) -> set[str]:
+    """Lower-cased coin ids from /search/trending items (or browser-scraped stand-ins)."""
+    trend_ids: set[str] = set()
+    if trending_coins:
+        for t in trending_coins:
+            item = t.get("item") if isinstance(t.get("item"), dict) else t
+            if item:
+                tid = (item.get("id") or item.get("coin_id") or "").lower()
+                if tid:
+                    trend_ids.add(tid)
+    return trend_ids
+
+
+class ScoreAccumulator:
+    """
+    Streaming front half of rank_coins. Feed it coins page by page with add():
+    stablecoins are dropped and the normalization ranges are tracked as pages
+    arrive, so rank() only has to score and sort. rank() can be called
+    mid-stream for a provisional ranking.
+
+    Factors a profile normalizes by "quantile" (FACTOR_NORMALIZATION or a scan
+    profile's override) also feed a KLL sketch and normalize between its
+    QUANTILE_CLIP percentiles instead of min/max. Accumulators fed with
+    different shards of a universe combine with merge().
+
+    With NumPy installed each page is turned into columns on arrival and rank()
+    runs the vectorized scoring_engine; otherwise coins are scored one by one.
+    rank_profiles() ranks one snapshot under several scan profiles at once.
+    """
+
+    def __init__(self, exclude_blue_chips: bool = True, vectorized: bool | None = None):
+        self.exclude_blue_chips = exclude_blue_chips   # default for profiles that don't set it
+        self.vectorized         = scoring_engine.available() if vectorized is None else vectorized
+        self.seen               = 0
+        self._candidates: list[dict] = []   # per-coin path — blue chips kept, profiles filter them
+        self._columns:    list       = []   # vectorized path — one SnapshotColumns per add()
+        self._features            = profiles.scored_features()
+        # Range stats — tracked on all non-stable coins (blue chips included) for fair normalization
+        self._ranges: dict[str, list[float]] = {name: [] for name in FACTOR_DEFAULTS}   # [lo, hi]
+        self._sketches: dict[str, KLLSketch] = {
+            name: KLLSketch(QUANTILE_SKETCH_K) for name in profiles.quantile_factors()
+        }
+
+    @staticmethod
+    def _track(bounds: list[float], value: float) -> None:
+        if not bounds:
+            bounds.extend((value, value))
+        elif value < bounds[0]:
+            bounds[0] = value
+        elif value > bounds[1]:
+            bounds[1] = value
+
+    def add(self, coins: list[dict]) -> None:
+        features.attach(coins)
+        if self.vectorized:
+            self._add_columns(coins)
+            return
+        for c in coins:
+            self.seen += 1
+            if _is_stablecoin(c):
+                continue
+
+            for name, value in zip(FACTOR_DEFAULTS, _factor_values(c)):
+                if value is not None:
+                    self._track(self._ranges[name], value)
+                    if name in self._sketches:
+                        self._sketches[name].update(value)
+            self._candidates.append(c)
+
+    def _add_columns(self, coins: list[dict]) -> None:
+        if not coins:
+            return
+        cols = scoring_engine.SnapshotColumns.from_coins(coins, derived.get, self._features)
+        self.seen += cols.n
+        for name in FACTOR_DEFAULTS:
+            values = cols.factor_values(name)
+            if values.size:
+                self._track(self._ranges[name], float(values.min()))
+                self._track(self._ranges[name], float(values.max()))
+                if name in self._sketches:
+                    self._sketches[name].update_many(values.tolist())
+        self._columns.append(cols)
+
+    def merge(self, other: "ScoreAccumulator") -> None:
+        """Fold in an accumulator fed with another shard of the same universe."""
+        if other.vectorized != self.vectorized or other.exclude_blue_chips != self.exclude_blue_chips:
+            raise ValueError("Can only merge accumulators with the same settings")
+        self.seen += other.seen
+        self._candidates.extend(other._candidates)
+        self._columns.extend(other._columns)
+        for name, lo_hi in other._ranges.items():
+            for value in lo_hi:
+                self._track(self._ranges[name], value)
+        for name, sketch in other._sketches.items():
+            self._sketches[name].merge(sketch)
+
+    def bounds(self, profile: ScanProfile | None = None) -> dict[str, tuple[float, float]]:
+        """
+        Normalization (lo, hi) per factor under `profile` (default: plain config):
+        the profile's fixed bounds, else clip quantiles in quantile mode, else min/max.
+        """
+        profile = profile or profiles.DEFAULT
+        out = {}
+        for name, default in FACTOR_DEFAULTS.items():
+            fixed  = profile.fixed_bounds(name)
+            sketch = self._sketches.get(name)
+            if fixed is not None:
+                out[name] = fixed
+            elif profile.quantile_mode(name) and sketch is not None and sketch.n:
+                out[name] = tuple(sketch.quantiles(QUANTILE_CLIP[name]))
+            else:
+                out[name] = tuple(self._ranges[name]) or default
+        return out
+
+    def rank(
+        self,
+        trending_coins: list[dict] | None = None,
+        top_k: int | None = None,
+        profile: ScanProfile | None = None,
+    ) -> list[dict]:
+        """
+        Score the candidates seen so far; attach 'trend_score' and 'rank'.
+        With top_k only the best k are selected (bounded heap / partition instead
+        of a full sort) and only they get rank metadata; ties keep snapshot order
+        either way, so the result equals rank()[:top_k].
+        """
+        profile = profile or profiles.DEFAULT
+        ranked  = self._ranked_all([profile], _trend_id_set(trending_coins), top_k)[profile.name]
+        return [_with_rank(c, s, i, copy=False) for i, (s, c) in enumerate(ranked, 1)]
+
+    def rank_profiles(
+        self,
+        scan_profiles: list[ScanProfile],
+        trending_coins: list[dict] | None = None,
+        top_k: int | None = None,
+    ) -> dict[str, list[dict]]:
+        """
+        {profile name: ranking} for every profile over the same snapshot. The
+        normalized factor columns are computed once and shared; each ranking
+        holds copies of its winners, so one coin can carry a different
+        trend_score / rank in each.
+        """
+        ranked = self._ranked_all(scan_profiles, _trend_id_set(trending_coins), top_k)
+        return {
+            name: [_with_rank(c, s, i, copy=True) for i, (s, c) in enumerate(pairs, 1)]
+            for name, pairs in ranked.items()
+        }
+
+    def _ranked_all(
+        self, scan_profiles: list[ScanProfile], trend_ids: set[str], top_k: int | None,
+    ) -> dict[str, list[tuple[float, dict]]]:
+        """{profile name: (score, coin) pairs, best first}."""
+        now  = time.time()   # one reference time for every coin's newly-listed check
+        jobs = []
+        for p in scan_profiles:
+            bounds = self.bounds(p)
+            jobs.append((
+                p.name, p.weights, bounds["vmr"], bounds["pct_24h"], bounds["pct_7d"],
+                p.blue_chips_excluded(self.exclude_blue_chips), p.max_rank,
+            ))
+
+        if self.vectorized:
+            if not self._columns:
+                return {name: [] for name, *_ in jobs}
+            cols = scoring_engine.SnapshotColumns.concat(self._columns)
+            self._columns = [cols]
+            factors = scoring_engine.FactorColumns(cols, trend_ids, now)
+            # Big snapshots score in the process pool, off this interpreter (parallel.py)
+            scores  = scoring_engine.score_profiles_parallel(factors, jobs)
+            return {
+                name: [
+                    (float(s[idx]), cols.coins[idx])
+                    for idx in scoring_engine.ranked_indices(s, top_k).tolist()
+                ]
+                for name, s in scores.items()
+            }
+
+        out = {}
+        for name, weights, (vmr_lo, vmr_hi), (pct_24h_lo, pct_24h_hi), (pct_7d_lo, pct_7d_hi), excl, max_rank in jobs:
+            # Candidates already passed the stablecoin filter in add() — rank filters, then the factors
+            scored = (
+                (_factor_score(
+                    c, trend_ids,
+                    vmr_lo, vmr_hi, pct_24h_lo, pct_24h_hi, pct_7d_lo, pct_7d_hi,
+                    excl, now, weights,
+                ), c)
+                for c in self._candidates
+                if _passes_rank_filters(c, excl, max_rank)
+            )
+            if top_k is None:
+                out[name] = sorted(scored, key=itemgetter(0), reverse=True)
+            else:
+                out[name] = heapq.nlargest(top_k, scored, key=itemgetter(0))
+        return out
+
+
+def _with_rank(coin: dict, score: float, rank: int, copy: bool) -> dict:
+    c = coin.copy() if copy else coin
+    c["trend_score"] = score
+    c["rank"]        = rank
+    return c
+
+
 def rank_coins(
     market_coins: list[dict],
     trending_coins: list[dict] | None = None,
     exclude_blue_chips: bool = True,
+    top_k: int | None = None,
+    profile: ScanProfile | None = None,
 ) -> list[dict]:
     """
     Score every coin, filter out stables and (optionally) blue chips,
     then return sorted list with 'trend_score' and 'rank' attached.
+    With top_k only the best k are selected and returned.
+    Uses the vectorized scoring_engine when NumPy is installed.
     """
-    # Build trending ID set
-    trend_ids: set[str] = set()
-    if trending_coins:
-        for t in trending_coins:
-            item = t.get("item") if isinstance(t.get("item"), dict) else t
-            if item:
-                tid = (item.get("id") or item.get("coin_id") or "").lower()
-                if tid:
-                    trend_ids.add(tid)
+    acc = ScoreAccumulator(exclude_blue_chips=exclude_blue_chips)
+    acc.add(market_coins)
+    return acc.rank(trending_coins, top_k=top_k, profile=profile)
+
+
+def rank_coins_profiles(
+    market_coins: list[dict],
+    scan_profiles: list[ScanProfile] | None = None,
+    trending_coins: list[dict] | None = None,
+    exclude_blue_chips: bool = True,
+    top_k: int | None = None,
+) -> dict[str, list[dict]]:
+    """
+    rank_coins for several scan profiles (default: every one in SCAN_PROFILES)
+    from one snapshot — factor columns are shared, each ranking holds copies.
+    """
+    acc = ScoreAccumulator(exclude_blue_chips=exclude_blue_chips)
+    acc.add(market_coins)
+    return acc.rank_profiles(
+        list(profiles.PROFILES.values()) if scan_profiles is None else scan_profiles,
+        trending_coins, top_k=top_k,
+    )
+
+
+# ── Live re-ranking ───────────────────────────────────────────────────────────
+class RankMove(NamedTuple):
+    id:        str
+    old_rank:  int | None     # None = wasn't ranked (filtered out / new)
+    new_rank:  int | None
+    old_score: float | None
+    new_score: float | None
+
+
+class IncrementalRanker:
+    """
+    Keeps a scan's ranking current from partial updates — poller prices
+    (fetch_simple_prices output) or refreshed market pages — without a rescan.
+
+    Holds every non-stable coin of the snapshot (blue chips included, since they
+    count toward the normalization ranges), a sorted multiset of each range
+    factor and the ranked order. An update rescores only the coins it touches,
+    unless it moves a normalization bound: then every score shifts and the
+    whole snapshot is rescored once. Scores follow one scan profile at a time;
+    set_profile() switches it.
+    """
+
+    # Fields a partial update may carry; the rest of a coin row is left alone
+    LIVE_FIELDS = (
+        "current_price", "market_cap", "total_volume", "vol_mcap_ratio",
+        "price_change_percentage_24h", "price_change_percentage_7d",
+        "market_cap_rank", "atl_date", "sparkline", "hourly", *features.FEATURE_NAMES,
+    )
+    # Of those, the ones score_coin reads
+    SCORED_FIELDS = (
+        "vol_mcap_ratio", "price_change_percentage_24h", "price_change_percentage_7d",
+        "market_cap_rank", "atl_date", *features.FEATURE_NAMES,
+    )
+
+    def __init__(
+        self,
+        coins: list[dict],
+        trending_coins: list[dict] | None = None,
+        exclude_blue_chips: bool = True,
+        profile: ScanProfile | None = None,
+    ):
+        self.exclude_blue_chips = exclude_blue_chips
+        self.profile            = profile or profiles.DEFAULT
+        self.trend_ids          = _trend_id_set(trending_coins)
+        self.full_rescores      = 0
+        self._coins:  dict[str, dict]  = {}
+        self._seq:    dict[str, int]   = {}   # snapshot position — breaks score ties like the scan's stable sort
+        self._scores: dict[str, float] = {}
+        self._order:  list[tuple[float, int, str]] = []   # (-score, seq, id), best first
+        self._values: tuple[list[float], ...] = ([], [], [])   # sorted vmr, 24h %, 7d %
+        for c in coins:
+            cid = c.get("id")
+            if cid and cid not in self._coins and not _is_stablecoin(c):
+                self._coins[cid] = c
+                self._seq[cid]   = len(self._seq)
+                for vals, v in zip(self._values, _factor_values(c)):
+                    if v is not None:
+                        vals.append(v)
+        for vals in self._values:
+            vals.sort()
+        self._bounds = self._current_bounds()
+        self._rescore_all()
+
+    # ── state ─────────────────────────────────────────────────────
+    def _add_values(self, c: dict) -> None:
+        for vals, v in zip(self._values, _factor_values(c)):
+            if v is not None:
+                bisect.insort(vals, v)
+
+    def _remove_values(self, c: dict) -> None:
+        for vals, v in zip(self._values, _factor_values(c)):
+            if v is not None:
+                i = bisect.bisect_left(vals, v)
+                if i < len(vals) and vals[i] == v:
+                    del vals[i]
 
-    # Range stats — computed only on non-filtered coins for fair normalization
-    non_stable = [c for c in market_coins if not _is_stablecoin(c)]
-
-    vmrs    = [c.get("vol_mcap_ratio", 0.0) for c in non_stable]
-    pct_24s = [c.get("price_change_percentage_24h") for c in non_stable if c.get("price_change_percentage_24h") is not None]
-    pct_7s  = [c.get("price_change_percentage_7d") for c in non_stable  if c.get("price_change_percentage_7d")  is not None]
-
-    vmr_lo,    vmr_hi    = (min(vmrs),    max(vmrs))    if vmrs    else (0.0, 1.0)
-    pct_24h_lo, pct_24h_hi = (min(pct_24s), max(pct_24s)) if pct_24s else (-50.0, 200.0)
-    pct_7d_lo,  pct_7d_hi  = (min(pct_7s),  max(pct_7s))  if pct_7s  else (-50.0, 400.0)
-
-    # Score each coin
-    scored: list[dict] = []
-    for c in market_coins:
-        s = score_coin(
-            c,
-            trend_ids=trend_ids,
-            vmr_lo=vmr_lo,
-            vmr_hi=vmr_hi,
-            pct_24h_lo=pct_24h_lo,
-            pct_24h_hi=pct_24h_hi,
-            pct_7d_lo=pct_7d_lo,
-            pct_7d_hi=pct_7d_hi,
-            exclude_blue_chips=exclude_blue_chips,
+    def _current_bounds(self) -> tuple:
+        bounds = []
+        for vals, (name, default) in zip(self._values, FACTOR_DEFAULTS.items()):
+            fixed = self.profile.fixed_bounds(name)
+            if fixed is not None:
+                bounds.append(fixed)
+            elif not vals:
+                bounds.append(default)
+            elif self.profile.quantile_mode(name):
+                # Exact clip quantiles — the same rank rule the sketch uses
+                bounds.append(tuple(
+                    vals[max(0, math.ceil(q * len(vals)) - 1)] for q in QUANTILE_CLIP[name]
+                ))
+            else:
+                bounds.append((vals[0], vals[-1]))
+        return tuple(bounds)
+
+    def _score(self, c: dict, now: float) -> float | None:
+        # Stablecoins never enter _coins; the rank filters depend on a live field
+        excl = self.profile.blue_chips_excluded(self.exclude_blue_chips)
+        if not _passes_rank_filters(c, excl, self.profile.max_rank):
+            return None
+        (vmr_lo, vmr_hi), (pct_24h_lo, pct_24h_hi), (pct_7d_lo, pct_7d_hi) = self._bounds
+        return _factor_score(
+            c, self.trend_ids,
+            vmr_lo, vmr_hi, pct_24h_lo, pct_24h_hi, pct_7d_lo, pct_7d_hi,
+            excl, now, self.profile.weights,
         )
-        if s == FILTERED_OUT:
-            continue
-        c["trend_score"] = s
-        scored.append(c)
 
-    ranked = sorted(scored, key=lambda x: x["trend_score"], reverse=True)
-    for i, c in enumerate(ranked, 1):
-        c["rank"] = i
+    def _rescore_all(self) -> None:
+        self._scores = {}
+        order = []
+        now   = time.time()
+        for cid, c in self._coins.items():
+            s = self._score(c, now)
+            if s is not None:
+                self._scores[cid] = s
+                order.append((-s, self._seq[cid], cid))
+        order.sort()
+        self._order = order
+
+    def _key(self, cid: str) -> tuple[float, int, str] | None:
+        s = self._scores.get(cid)
+        return None if s is None else (-s, self._seq[cid], cid)
+
+    def _rank(self, cid: str) -> int | None:
+        key = self._key(cid)
+        return None if key is None else bisect.bisect_left(self._order, key) + 1
+
+    # ── reading ───────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def coin(self, cid: str) -> dict | None:
+        return self._coins.get(cid)
+
+    def rank_of(self, cid: str) -> int | None:
+        return self._rank(cid)
+
+    def ranked(self, n: int | None = None) -> list[dict]:
+        """The best n coins (all if None) with 'trend_score' and 'rank' attached."""
+        out = []
+        for i, (neg, _, cid) in enumerate(self._order[:n] if n is not None else self._order, 1):
+            c = self._coins[cid]
+            c["trend_score"] = -neg
+            c["rank"]        = i
+            out.append(c)
+        return out
+
+    # ── updating ──────────────────────────────────────────────────
+    def set_profile(self, profile: ScanProfile) -> None:
+        """Re-rank the whole snapshot under another scan profile."""
+        self.profile = profile
+        self._bounds = self._current_bounds()
+        self._rescore_all()
+
+    def update(self, changes: dict[str, dict]) -> list[RankMove]:
+        """
+        Apply {coin_id: {field: value}} (e.g. fetch_simple_prices output) and
+        re-rank. Ids not in the snapshot are ignored. Returns the moves of every
+        coin whose score or rank changed — just the updated coins normally, the
+        whole snapshot when a normalization bound moved — best new rank first.
+        """
+        return self._apply(self._stage(changes))
+
+    def update_coins(self, coins: list[dict]) -> list[RankMove]:
+        """Apply refreshed market rows (e.g. a re-fetched page); unseen coins join the ranking."""
+        features.attach(coins)
+        changes: dict[str, dict] = {}
+        added:   list[str]       = []
+        for c in coins:
+            cid = c.get("id")
+            if not cid:
+                continue
+            if cid in self._coins:
+                changes[cid] = {k: c.get(k) for k in self.LIVE_FIELDS}
+            elif not _is_stablecoin(c):
+                self._coins[cid] = c
+                self._seq[cid]   = len(self._seq)
+                self._add_values(c)
+                added.append(cid)
+        return self._apply(self._stage(changes) + added)
+
+    def _stage(self, changes: dict[str, dict]) -> list[str]:
+        """Write the changed fields onto the coins; ids whose score inputs changed."""
+        touched: list[str] = []
+        for cid, fields in changes.items():
+            c = self._coins.get(cid)
+            if c is None:
+                continue
+            live   = {k: v for k, v in fields.items() if k in self.LIVE_FIELDS}
+            scored = any(k in self.SCORED_FIELDS and c.get(k) != v for k, v in live.items())
+            if scored:
+                self._remove_values(c)
+            for k, v in live.items():
+                c[k] = v
+            if scored:
+                self._add_values(c)
+                touched.append(cid)
+        return touched
+
+    def _apply(self, touched: list[str]) -> list[RankMove]:
+        if not touched:
+            return []
+        bounds = self._current_bounds()
+        if bounds != self._bounds:
+            # A range moved → every normalized factor shifts; rescore everything once
+            before = {cid: (i, -neg) for i, (neg, _, cid) in enumerate(self._order, 1)}
+            self._bounds = bounds
+            self._rescore_all()
+            self.full_rescores += 1
+            after  = {cid: (i, -neg) for i, (neg, _, cid) in enumerate(self._order, 1)}
+            moves = []
+            for cid in before.keys() | after.keys():
+                old_rank, old_score = before.get(cid, (None, None))
+                new_rank, new_score = after.get(cid, (None, None))
+                if (old_rank, old_score) != (new_rank, new_score):
+                    moves.append(RankMove(cid, old_rank, new_rank, old_score, new_score))
+            return sorted(moves, key=_move_order)
+
+        old = {cid: (self._rank(cid), self._scores.get(cid)) for cid in touched}
+        now = time.time()
+        for cid in touched:
+            key = self._key(cid)
+            if key is not None:
+                del self._order[bisect.bisect_left(self._order, key)]
+            s = self._score(self._coins[cid], now)
+            if s is None:
+                self._scores.pop(cid, None)
+            else:
+                self._scores[cid] = s
+                bisect.insort(self._order, (-s, self._seq[cid], cid))
+        moves = []
+        for cid in touched:
+            new = (self._rank(cid), self._scores.get(cid))
+            if new != old[cid]:
+                moves.append(RankMove(cid, old[cid][0], new[0], old[cid][1], new[1]))
+        return sorted(moves, key=_move_order)
+
 
-    return ranked
+def _move_order(m: RankMove) -> tuple:
+    return (m.new_rank is None, m.new_rank or 0, m.id)
@@ -4,7 +4,7 @@ SHITCOINER — Native Desktop Momentum Scanner
 Shitcoin momentum scanner. Not financial advice.
 """
 
-import sys, json, time, math, os, stat, urllib.request, threading
+import sys, time, math, os, stat, urllib.request
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
@@ -30,7 +30,6 @@ except ImportError:
 # ── Config paths ──────────────────────────────────────────────────
 CONFIG_DIR  = Path.home() / ".shitcoiner"
 CONFIG_DIR.mkdir(exist_ok=True)
-WATCHLIST_F = CONFIG_DIR / "watchlist.json"
 ENV_PATH    = CONFIG_DIR / ".env"
 
 try:
@@ -236,6 +235,12 @@ def fmt_vmr(n) -> str:
 def fmt_score(n) -> str:
     return f"{n:.3f}" if n is not None else "—"
 
+def fmt_num(n, spec: str = ".1f", suffix: str = "") -> str:
+    return f"{n:{spec}}{suffix}" if n is not None else "—"
+
+def pct_color(n) -> str:
+    return TEXT2 if n is None else (BUY if n >= 0 else SELL)
+
 def get_signal(score, velocity, vmr):
     if score is None:
         return "⚪", "NO DATA", TEXT2
@@ -268,44 +273,39 @@ def center_item(text: str, color: str = TEXT) -> QTableWidgetItem:
     return it
 
 
-# ── Watchlist storage ─────────────────────────────────────────────
-def load_watchlist() -> dict:
-    try:
-        return json.loads(WATCHLIST_F.read_text()) if WATCHLIST_F.exists() else {}
-    except Exception:
-        return {}
-
-def save_watchlist(wl: dict) -> None:
-    WATCHLIST_F.write_text(json.dumps(wl, indent=2))
-
-
 # ── Score history ─────────────────────────────────────────────────
-_score_lock    = threading.Lock()
-_score_history: dict[str, list] = {}   # id -> [(ts, score)]
-_MAX_HIST      = 30
+# Persisted in ~/.shitcoiner/history.db (history_store.py); the live trend per coin
+# (EMA, slope, acceleration) is kept in memory by momentum.py, seeded from that history.
+# Seeding queries the database, so it runs in the scan / poller threads; the readers
+# below (GUI thread included) only look at memory.
+def load_score_history(ids: list[str]) -> None:
+    """Seed momentum for the coins not seen yet this session, in one batched history query."""
+    import history_store, momentum
+    from config import MOMENTUM_MAX_AGE
+    todo = momentum.tracker.unseeded(ids)
+    if todo:
+        momentum.tracker.seed_many(todo, history_store.store.recent(todo, time.time() - MOMENTUM_MAX_AGE))
 
 def record_scores(coins: list[dict]) -> None:
+    import history_store, momentum
     now = time.time()
-    with _score_lock:
-        for c in coins:
-            cid   = c.get("id")
-            score = c.get("trend_score")
-            if not cid or score is None:
-                continue
-            hist = _score_history.setdefault(cid, [])
-            hist.append((now, float(score)))
-            if len(hist) > _MAX_HIST:
-                _score_history[cid] = hist[-_MAX_HIST:]
+    load_score_history([c["id"] for c in coins if c.get("id")])
+    history_store.store.record(coins, now)
+    momentum.tracker.record(coins, now)
+
+def score_momentum(cid: str):
+    """MomentumStats of a coin (None if it has no loaded score history); lock-free."""
+    import momentum
+    return momentum.tracker.get(cid)
 
 def score_velocity(cid: str) -> float | None:
-    with _score_lock:
-        hist = _score_history.get(cid, [])
-        return round(hist[-1][1] - hist[0][1], 4) if len(hist) >= 2 else None
+    """Least-squares score change per hour over the recent scans."""
+    stats = score_momentum(cid)
+    return round(stats.slope, 4) if stats is not None and stats.slope is not None else None
 
 def latest_score(cid: str) -> float | None:
-    with _score_lock:
-        hist = _score_history.get(cid, [])
-        return hist[-1][1] if hist else None
+    stats = score_momentum(cid)
+    return stats.score if stats is not None else None
 
 
 # ── Sparkline widget ──────────────────────────────────────────────
@@ -352,24 +352,66 @@ class SparklineWidget(QWidget):
 
 
 # ── Worker threads ────────────────────────────────────────────────
+def _load_icon(img_url: str) -> "QPixmap | None":
+    """20×20 coin icon, or None (best-effort, blocking — call from a worker thread)."""
+    if not img_url.startswith("https://"):
+        return None
+    try:
+        data = urllib.request.urlopen(img_url, timeout=4).read()
+        px   = QPixmap()
+        px.loadFromData(data)
+        return px.scaled(
+            20, 20,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+    except Exception:
+        return None
+
+
 class ScanWorker(QThread):
     progress  = pyqtSignal(str)
+    partial   = pyqtSignal(list)   # provisional ranking while later pages are still loading
     finished  = pyqtSignal(list)
     error     = pyqtSignal(str)
 
-    def __init__(self, top_n=25, fetch=500, exclude_blue_chips=True):
+    def __init__(self, top_n=25, fetch=500, exclude_blue_chips=True, crawler=None, profile=None):
         super().__init__()
         self.top_n              = top_n
         self.fetch              = fetch
         self.exclude_blue_chips = exclude_blue_chips
+        self.crawler            = crawler   # UniverseCrawler → rank its snapshot instead of fetching
+        self.profile            = profile   # scan profile name emitted in `finished` (None = default)
+        self.ranker             = None      # IncrementalRanker over the whole snapshot, set when done
+        self.by_profile: dict[str, list[dict]] = {}   # every scan profile's ranking, set when done
 
     def run(self):
         try:
-            from market_data import get_all_market_data, fetch_trending, RateLimitError
-            from analysis    import rank_coins
-
-            self.progress.emit(f"Fetching top {self.fetch} coins from CoinGecko…")
-            market_coins = get_all_market_data(top_n=self.fetch)
+            from market_data import iter_market_data, fetch_trending, RateLimitError
+            from analysis    import ScoreAccumulator, IncrementalRanker
+            import archive
+            import clusters
+            import profiles
+
+            profile = profiles.get(self.profile)
+            acc = ScoreAccumulator(exclude_blue_chips=self.exclude_blue_chips)
+            snapshot: list[dict] = []
+            if self.crawler is not None:
+                self.progress.emit("Waiting for the universe crawler…")
+                if not self.crawler.wait_for_data(60):
+                    raise RuntimeError(self.crawler.last_error or "Universe crawler has no data yet.")
+                snap = self.crawler.snapshot()
+                self.progress.emit(f"Scoring {len(snap):,} coins from the universe snapshot…")
+                acc.add(snap)
+                snapshot = snap
+            else:
+                self.progress.emit(f"Fetching top {self.fetch} coins from CoinGecko…")
+                for page in iter_market_data(top_n=self.fetch):
+                    acc.add(page)
+                    snapshot.extend(page)
+                    if acc.seen < self.fetch:
+                        self.partial.emit(acc.rank(top_k=self.top_n, profile=profile))
+                        self.progress.emit(f"Scored {acc.seen}/{self.fetch} coins — fetching more…")
 
             self.progress.emit("Fetching trending data…")
             trending = []
@@ -378,33 +420,33 @@ class ScanWorker(QThread):
             except Exception:
                 pass
 
+            # Tag the whole snapshot so every profile's copies and live re-ranks carry the clusters
+            self.progress.emit("Finding co-movement clusters…")
+            clusters.detect(snapshot).tag(snapshot)
+
             self.progress.emit("Scoring coins…")
-            ranked = rank_coins(
-                market_coins,
-                trending_coins=trending or None,
-                exclude_blue_chips=self.exclude_blue_chips,
-            )
-            coins = ranked[:self.top_n]
+            scan_profiles = list(profiles.PROFILES.values())
+            if profile not in scan_profiles:
+                scan_profiles.append(profile)
+            self.by_profile = acc.rank_profiles(scan_profiles, trending_coins=trending or None, top_k=self.top_n)
+            coins = self.by_profile[profile.name]
+            load_score_history([c["id"] for ranked in self.by_profile.values() for c in ranked])
             record_scores(coins)
+            archive.archive_scan(snapshot, trending)
+            self.ranker = IncrementalRanker(snapshot, trending or None, self.exclude_blue_chips, profile)
 
-            # Download icons in-thread (best-effort)
+            # Download icons in-thread (best-effort) — once per coin across all profiles
             self.progress.emit("Loading coin icons…")
-            for c in coins:
-                img_url = c.get("image") or ""
-                if img_url.startswith("https://"):
-                    try:
-                        data = urllib.request.urlopen(img_url, timeout=4).read()
-                        px   = QPixmap()
-                        px.loadFromData(data)
-                        c["_pixmap"] = px.scaled(
-                            20, 20,
-                            Qt.AspectRatioMode.KeepAspectRatio,
-                            Qt.TransformationMode.SmoothTransformation,
-                        )
-                    except Exception:
-                        c["_pixmap"] = None
-                else:
-                    c["_pixmap"] = None
+            icons: dict[str, QPixmap | None] = {}
+            for ranked in self.by_profile.values():
+                for c in ranked:
+                    cid = c.get("id")
+                    if cid not in icons:
+                        icons[cid] = _load_icon(c.get("image") or "")
+                        live = self.ranker.coin(cid)
+                        if live is not None:
+                            live["_pixmap"] = icons[cid]
+                    c["_pixmap"] = icons[cid]
 
             self.finished.emit(coins)
 
@@ -433,7 +475,8 @@ class PricePoller(QThread):
                 try:
                     from market_data import fetch_simple_prices
                     data = fetch_simple_prices(self.ids)
-                    # Attach score info
+                    # Attach score info (history for new ids is loaded here, off the GUI thread)
+                    load_score_history(list(data))
                     for cid, d in data.items():
                         d["trend_score"]    = latest_score(cid)
                         d["score_velocity"] = score_velocity(cid)
@@ -512,8 +555,8 @@ class AddToBagDialog(QDialog):
         lay.addLayout(btns)
 
     def _save(self):
-        wl = load_watchlist()
-        wl[self.coin["id"]] = {
+        import watchlist
+        watchlist.store.put(self.coin["id"], {
             "id":         self.coin["id"],
             "symbol":     self.coin.get("symbol","").upper(),
             "name":       self.coin.get("name",""),
@@ -523,8 +566,7 @@ class AddToBagDialog(QDialog):
             "alertPrice": self.in_alert_price.value() or None,
             "alertScore": self.in_alert_score.value() or None,
             "addedAt":    time.time(),
-        }
-        save_watchlist(wl)
+        })
         self.accept()
 
 
@@ -683,7 +725,8 @@ class BagPanel(QWidget):
         self._refresh_view()
 
     def _refresh_view(self):
-        wl = load_watchlist()
+        import watchlist
+        wl = watchlist.store.all()
         if not wl:
             self._table.setVisible(False)
             self._empty.setVisible(True)
@@ -755,13 +798,12 @@ class BagPanel(QWidget):
         self._table.resizeRowsToContents()
 
     def _remove(self, cid: str):
-        wl = load_watchlist()
-        wl.pop(cid, None)
-        save_watchlist(wl)
-        self._refresh_view()
+        import watchlist
+        watchlist.store.remove(cid)   # the window refreshes on the change signal
 
     def _check_alerts(self):
-        wl = load_watchlist()
+        import watchlist
+        wl = watchlist.store.all()
         for cid, pos in wl.items():
             px    = self._price_cache.get(cid, {})
             price = px.get("current_price")
@@ -788,19 +830,33 @@ class BagPanel(QWidget):
 
 
 # ── Main window ───────────────────────────────────────────────────
-SCAN_COLS = ["#", "☆", "", "COIN", "7D CHART", "PRICE", "24H %", "V/MCAP", "SIGNAL", "SCORE", "CAP #"]
+SCAN_COLS = ["#", "☆", "", "COIN", "7D CHART", "PRICE", "1H %", "4H %", "12H %", "24H %",
+             "V/MCAP", "VOLAT", "MAX DD", "RSI", "SIGNAL", "SCORE", "CAP #"]
 
 class MainWindow(QMainWindow):
+    watchlist_changed = pyqtSignal()   # bag edited here or on disk (emitted from any thread)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("SHITCOINER")
-        self.setMinimumSize(1000, 700)
+        self.setMinimumSize(1200, 700)
         self._coins: list[dict] = []
         self._poller: PricePoller | None = None
         self._scan_worker: ScanWorker | None = None
+        self._crawler = None   # UniverseCrawler, started the first time UNIVERSE is scanned
+        self._live    = None   # IncrementalRanker over the last scan, re-ranked from poller prices
+        self._rank_delta: dict[str, int | None] = {}   # id -> places moved by the last live update
+
+        import watchlist
+        load_score_history(watchlist.store.ids())   # once, so the bag shows scores before the first poll
         self._build()
         self._setup_tray()
 
+        # Queued: the store may notice a change mid-render, or in its save timer's thread
+        self.watchlist_changed.connect(self._on_watchlist_changed, Qt.ConnectionType.QueuedConnection)
+        self._notify_watchlist = self.watchlist_changed.emit
+        watchlist.store.subscribe(self._notify_watchlist)
+
     def _build(self):
         central = QWidget()
         self.setCentralWidget(central)
@@ -863,12 +919,21 @@ class MainWindow(QMainWindow):
 
         fetch_lbl = QLabel("FETCH:")
         fetch_lbl.setStyleSheet(f"color:{TEXT2};")
-        self._fetch = QComboBox(); self._fetch.setFixedWidth(90)
-        self._fetch.addItems(["TOP 300", "TOP 500"])
+        self._fetch = QComboBox(); self._fetch.setFixedWidth(100)
+        self._fetch.addItems(["TOP 300", "TOP 500", "UNIVERSE"])
         self._fetch.setCurrentIndex(1)
 
         self._bluechip = QCheckBox("INCLUDE BLUE CHIPS")
 
+        # Scan profiles re-rank the last snapshot — switching never refetches
+        import profiles
+        profile_lbl = QLabel("PROFILE:")
+        profile_lbl.setStyleSheet(f"color:{TEXT2};")
+        self._profile = QComboBox(); self._profile.setFixedWidth(130)
+        self._profile.addItems(profiles.names())
+        self._profile.setCurrentText(profiles.get().name)
+        self._profile.currentTextChanged.connect(self._on_profile_changed)
+
         sep2 = QFrame(); sep2.setFrameShape(QFrame.Shape.VLine)
         sep2.setStyleSheet(f"color:{BORDER}; max-width:1px;")
 
@@ -876,7 +941,8 @@ class MainWindow(QMainWindow):
         self._status_lbl.setStyleSheet(f"color:{TEXT2}; font-size:11px; letter-spacing:1px;")
 
         for w in [self._scan_btn, self._ai_btn, sep1, topn_lbl, self._topn,
-                  fetch_lbl, self._fetch, self._bluechip, sep2, self._status_lbl]:
+                  fetch_lbl, self._fetch, self._bluechip, profile_lbl, self._profile,
+                  sep2, self._status_lbl]:
             tb_lay.addWidget(w)
         tb_lay.addStretch()
         root.addWidget(tb_frame)
@@ -950,8 +1016,16 @@ class MainWindow(QMainWindow):
         self.setStatusBar(sb)
         self._sb_lbl = QLabel("SHITCOINER  //  NOT FINANCIAL ADVICE  //  USE AT YOUR OWN RISK")
         self._sb_lbl.setStyleSheet(f"color:{TEXT2}; letter-spacing:1px;")
+        self._budget_lbl = QLabel("")
+        self._budget_lbl.setStyleSheet(f"color:{TEXT2}; letter-spacing:1px;")
+        sb.addWidget(self._budget_lbl)
         sb.addPermanentWidget(self._sb_lbl)
 
+        self._budget_timer = QTimer(self)
+        self._budget_timer.timeout.connect(self._update_budget)
+        self._budget_timer.start(2000)
+        self._update_budget()
+
     def _setup_tray(self):
         if not QSystemTrayIcon.isSystemTrayAvailable():
             return
@@ -973,39 +1047,94 @@ class MainWindow(QMainWindow):
         self._status_lbl.setText(msg)
         self._status_lbl.setStyleSheet(f"color:{color}; font-size:11px; letter-spacing:1px;")
 
+    def _update_budget(self):
+        from market_data import request_budget, cache_stats
+        b  = request_budget()
+        cs = cache_stats()
+        txt = f"API  {b['remaining']}/{b['per_minute']} per min"
+        served = cs["hits"] + cs["stale"]
+        if served + cs["misses"]:
+            txt += f"  //  cache {served}/{served + cs['misses']}"
+        if b["queued"]:
+            txt += f"  //  {b['queued']} queued"
+        if b["blocked_for"] > 0:
+            txt += f"  //  backing off {b['blocked_for']:.0f}s"
+        if self._crawler is not None:
+            st = self._crawler.status()
+            txt += (f"  //  universe {st['coins']:,} coins, {st['pages']}/{st['last_page']} pages"
+                    f", oldest {st['oldest_age'] / 60:.0f}m")
+        self._budget_lbl.setText(txt)
+        self._budget_lbl.setStyleSheet(
+            f"color:{WARN if b['blocked_for'] > 0 else TEXT2}; letter-spacing:1px;"
+        )
+
     def _run_scan(self):
         if self._scan_worker and self._scan_worker.isRunning():
             return
         self._scan_btn.setEnabled(False)
         self._set_status("SCANNING…", WARN)
         self._table.setRowCount(0)
+        self._rank_delta = {}
 
         fetch_val = 300 if self._fetch.currentIndex() == 0 else 500
+        crawler   = None
+        if self._fetch.currentIndex() == 2:
+            if self._crawler is None:
+                from crawler import UniverseCrawler
+                self._crawler = UniverseCrawler()
+                self._crawler.start()
+            crawler = self._crawler
         self._scan_worker = ScanWorker(
             top_n=self._topn.value(),
             fetch=fetch_val,
             exclude_blue_chips=not self._bluechip.isChecked(),
+            crawler=crawler,
+            profile=self._profile.currentText(),
         )
         self._scan_worker.progress.connect(lambda m: self._set_status(m, WARN))
+        self._scan_worker.partial.connect(self._render_table)
         self._scan_worker.finished.connect(self._on_scan_done)
         self._scan_worker.error.connect(self._on_scan_error)
         self._scan_worker.start()
 
     def _on_scan_done(self, coins: list[dict]):
         self._coins = coins
+        self._live  = self._scan_worker.ranker
         self._scan_btn.setEnabled(True)
         self._set_status(f"DONE  —  {len(coins)} COINS RANKED", BUY)
         self._results_lbl.setText(f"SCAN RESULTS  [{len(coins)} coins]")
         self._render_table(coins)
         self._start_poller()
+        if self._profile.currentText() != self._scan_worker.profile:
+            self._on_profile_changed(self._profile.currentText())   # switched while scanning
+
+    def _on_profile_changed(self, name: str):
+        """Show another profile's ranking of the last scan; no network call."""
+        worker = self._scan_worker
+        if worker is None or worker.isRunning() or name not in worker.by_profile:
+            return   # a running scan picks the profile up when it finishes
+        import profiles
+        self._rank_delta = {}
+        if self._live is not None:
+            # Live prices have moved on since the scan: show the re-scored live ranking
+            self._live.set_profile(profiles.get(name))
+            self._coins = self._live.ranked(self._topn.value())
+        else:
+            self._coins = worker.by_profile[name]
+        self._results_lbl.setText(f"SCAN RESULTS  [{len(self._coins)} coins]  ·  {name}")
+        self._set_status(f"PROFILE  —  {name}", BUY)
+        self._render_table(self._coins)
+        if self._poller:
+            self._poller.ids = self._poll_ids()
 
     def _on_scan_error(self, msg: str):
         self._scan_btn.setEnabled(True)
         self._set_status(f"ERROR: {msg[:80]}", SELL)
 
     def _render_table(self, coins: list[dict]):
+        import watchlist
         self._table.setRowCount(0)
-        wl = load_watchlist()
+        wl = watchlist.store.all()
 
         for c in coins:
             cid    = c.get("id", "")
@@ -1028,8 +1157,15 @@ class MainWindow(QMainWindow):
             self._table.insertRow(row)
             self._table.setRowHeight(row, 34)
 
-            # # rank
-            self._table.setItem(row, 0, center_item(str(rank), ACCENT))
+            # # rank (+ places moved by the last live re-rank)
+            delta = self._rank_delta.get(cid, 0)
+            if cid in self._rank_delta and delta is None:
+                self._table.setItem(row, 0, center_item(f"{rank} ▲", BUY))
+            elif delta:
+                self._table.setItem(row, 0, center_item(
+                    f"{rank} {'▲' if delta > 0 else '▼'}{abs(delta)}", BUY if delta > 0 else SELL))
+            else:
+                self._table.setItem(row, 0, center_item(str(rank), ACCENT))
 
             # ☆ star
             star_btn = QPushButton("⭐" if cid in wl else "☆")
@@ -1050,8 +1186,16 @@ class MainWindow(QMainWindow):
 
             # Name
             new_tag = "  [NEW]" if is_new else ""
-            name_item = QTableWidgetItem(f"{sym}{new_tag}\n{name}")
+            brk_tag = "  [BRK]" if c.get("breakout") else ""   # above the prior BREAKOUT_HOURS high
+            cluster = c.get("cluster_id")
+            clu_tag = f"  [C{cluster}]" if cluster is not None else ""   # co-movement group
+            name_item = QTableWidgetItem(f"{sym}{new_tag}{brk_tag}{clu_tag}\n{name}")
             name_item.setForeground(QColor(TEXT))
+            if cluster is not None:
+                name_item.setToolTip(
+                    f"Moves with {c['cluster_size'] - 1} other coins (cluster C{cluster}) — "
+                    f"group momentum {c['cluster_momentum']:+.1f}%"
+                )
             self._table.setItem(row, 3, name_item)
 
             # Sparkline
@@ -1066,16 +1210,27 @@ class MainWindow(QMainWindow):
             # Price
             self._table.setItem(row, 5, right_item(fmt_price(price)))
 
+            # 1h / 4h / 12h % (sparkline features)
+            for col, key in ((6, "ret_1h"), (7, "ret_4h"), (8, "ret_12h")):
+                v = c.get(key)
+                self._table.setItem(row, col, right_item(fmt_pct(v), pct_color(v)))
+
             # 24h %
-            self._table.setItem(row, 6, right_item(fmt_pct(p24), p24_color))
+            self._table.setItem(row, 9, right_item(fmt_pct(p24), p24_color))
 
             # V/MCap
-            self._table.setItem(row, 7, right_item(fmt_vmr(vmr), WARN))
+            self._table.setItem(row, 10, right_item(fmt_vmr(vmr), WARN))
+
+            # Volatility / max drawdown / RSI (sparkline features)
+            rsi = c.get("rsi")
+            self._table.setItem(row, 11, right_item(fmt_num(c.get("volatility"), ".1f", "%"), TEXT2))
+            self._table.setItem(row, 12, right_item(fmt_num(c.get("max_drawdown"), ".1f", "%"), TEXT2))
+            self._table.setItem(row, 13, right_item(fmt_num(rsi, ".0f"), WARN if (rsi or 0) >= 70 else TEXT2))
 
             # Signal
             sig_item = QTableWidgetItem(f"  {dot}  {label}")
             sig_item.setForeground(QColor(sig_color))
-            self._table.setItem(row, 8, sig_item)
+            self._table.setItem(row, 14, sig_item)
 
             # Score
             sc_item = QTableWidgetItem(fmt_score(score) + vel_arrow)
@@ -1083,35 +1238,41 @@ class MainWindow(QMainWindow):
                 BUY if vel_arrow == "  ▲" else (SELL if vel_arrow == "  ▼" else ACCENT)
             ))
             sc_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            self._table.setItem(row, 9, sc_item)
+            self._table.setItem(row, 15, sc_item)
 
             # Cap rank
-            self._table.setItem(row, 10, center_item(f"#{cap_r}" if cap_r else "—", TEXT2))
+            self._table.setItem(row, 16, center_item(f"#{cap_r}" if cap_r else "—", TEXT2))
 
         self._table.resizeRowsToContents()
 
     def _toggle_bag(self, cid: str, coin: dict):
-        wl = load_watchlist()
-        if cid in wl:
-            wl.pop(cid)
-            save_watchlist(wl)
-            self._bag.refresh()
-            self._render_table(self._coins)
-        else:
-            dlg = AddToBagDialog(coin, self)
-            if dlg.exec() == QDialog.DialogCode.Accepted:
-                self._bag.refresh()
-                self._render_table(self._coins)
-                self._start_poller()
+        import watchlist
+        if not watchlist.store.remove(cid):
+            AddToBagDialog(coin, self).exec()
+        # either way the views follow from watchlist_changed
+
+    def _on_watchlist_changed(self):
+        self._bag.refresh()
+        self._render_table(self._coins)
+        self._start_poller()
+
+    def _poll_ids(self) -> list[str]:
+        """Bag coins plus the live ranking's best LIVE_RANK_POLL, so rank changes show up."""
+        from config import LIVE_RANK_POLL
+        import watchlist
+        ids = watchlist.store.ids()
+        if self._live is not None:
+            ids += [c["id"] for c in self._live.ranked(LIVE_RANK_POLL)]
+        return list(dict.fromkeys(ids))
 
     def _start_poller(self):
-        wl = load_watchlist()
-        if not wl:
+        ids = self._poll_ids()
+        if not ids:
             return
         if self._poller and self._poller.isRunning():
-            self._poller.ids = list(wl.keys())
+            self._poller.ids = ids
             return
-        self._poller = PricePoller(list(wl.keys()))
+        self._poller = PricePoller(ids)
         self._poller.updated.connect(self._on_prices)
         self._poller.failed.connect(lambda e: self._set_status(f"POLL ERR: {e[:60]}", SELL))
         self._poller.start()
@@ -1119,9 +1280,21 @@ class MainWindow(QMainWindow):
     def _on_prices(self, data: dict):
         ts = time.strftime("%H:%M:%S")
         self._bag.update_prices(data, ts)
-        # update wl ids in poller
+        if self._live is not None and not (self._scan_worker and self._scan_worker.isRunning()):
+            moves = self._live.update(data)
+            if moves:
+                shown = {c.get("id"): i for i, c in enumerate(self._coins, 1)}
+                self._coins = self._live.ranked(self._topn.value())
+                self._rank_delta = {
+                    c["id"]: (shown[c["id"]] - c["rank"]) if c["id"] in shown else None
+                    for c in self._coins
+                }
+                self._render_table(self._coins)
+                moved = sum(1 for d in self._rank_delta.values() if d != 0)
+                self._set_status(f"LIVE  —  {moved} RANK CHANGES  @ {ts}", BUY)
+        # update ids in poller
         if self._poller:
-            self._poller.ids = list(load_watchlist().keys())
+            self._poller.ids = self._poll_ids()
 
     def _get_ai(self):
         if not self._coins:
@@ -1171,14 +1344,26 @@ class MainWindow(QMainWindow):
         )
 
     def closeEvent(self, event):
+        import watchlist
+        watchlist.store.unsubscribe(self._notify_watchlist)
+        watchlist.store.flush()
         if self._poller and self._poller.isRunning():
             self._poller.stop()
             self._poller.wait(1000)
+        if self._crawler is not None:
+            self._crawler.stop()
+        import parallel
+        parallel.shutdown()
         event.accept()
 
 
 # ── Entry point ───────────────────────────────────────────────────
 def main():
+    from config import RECORD_PATH
+    if RECORD_PATH:
+        from replay import recorder
+        recorder.start(RECORD_PATH)
+
     app = QApplication(sys.argv)
     app.setApplicationName("SHITCOINER")
     app.setStyleSheet(QSS)
@@ -1202,4 +1387,6 @@ def main():
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()   # the standalone build's scoring pool re-enters here
     main()
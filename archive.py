@@ -0,0 +1,328 @@
+"""
+Columnar snapshot archive.
+Each scan's full snapshot is one file under ARCHIVE_DIR: a short JSON header
+followed by 64-byte aligned columns — fixed-width numbers (float64), the
+hourly sparkline as a (coins × HOURS) float32 matrix, and ids / symbols /
+names / images / ATL dates as int32 codes into the file's own string table.
+manifest.jsonl lists every file with its time and row count.
+
+Readers mmap a file and wrap just the columns they ask for with
+np.frombuffer, so a query touches only those columns of the snapshots in
+its time range — there is nothing to parse but the header. Snapshot files
+are written to a temporary name and renamed, and manifest lines are
+appended only after, so readers never see a partial snapshot. Needs NumPy.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import ARCHIVE_DIR, ARCHIVE_SNAPSHOTS, ARCHIVE_RETENTION, ARCHIVE_MAX_BYTES
+from features import HOURS
+
+MAGIC        = b"SHITSNAP"
+_ALIGN       = 64
+_PRUNE_EVERY = 3600   # seconds between retention sweeps (run from append())
+
+# Columns per coin: float64 numbers and int32 string codes, plus a uint8 "trending" flag
+NUMERIC_FIELDS = (
+    "current_price", "market_cap", "market_cap_rank", "total_volume",
+    "price_change_percentage_24h", "price_change_percentage_7d", "vol_mcap_ratio",
+)
+STRING_FIELDS = ("id", "symbol", "name", "image", "atl_date")
+
+
+class ManifestEntry(NamedTuple):
+    file: str     # name inside the archive directory
+    t:    float   # epoch seconds of the scan
+    rows: int
+
+
+class SnapshotFile:
+    """
+    One archived snapshot, memory-mapped. column() returns read-only views
+    into the map (NaN for missing numbers); strings() decodes a string
+    column; coins() rebuilds the Coin rows.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{self.path.name} is not an archived snapshot")
+        (size,)     = struct.unpack_from("<I", self._map, len(MAGIC))
+        header      = json.loads(self._map[len(MAGIC) + 4:len(MAGIC) + 4 + size])
+        self.t      = header["t"]
+        self.rows   = header["rows"]
+        self.layout = header["columns"]   # name -> [offset, dtype, shape]
+        self._table = None
+
+    def column(self, name: str):
+        off, dt, shape = self.layout[name]
+        a = np.frombuffer(self._map, dtype=np.dtype(dt), count=int(np.prod(shape)), offset=off)
+        return a.reshape(shape)
+
+    def _string_table(self) -> list[str]:
+        if self._table is None:
+            ends = self.column("_string_ends")
+            blob = self.column("_strings").tobytes()
+            starts = np.concatenate(([0], ends[:-1])).tolist()
+            self._table = [blob[a:b].decode("utf-8") for a, b in zip(starts, ends.tolist())]
+        return self._table
+
+    def strings(self, name: str) -> list[str | None]:
+        table = self._string_table()
+        return [table[code] if code >= 0 else None for code in self.column(name).tolist()]
+
+    def hourly(self):
+        """(rows, HOURS) float32 prices as recorded — right-aligned, NaN-padded; see features.fill_matrix."""
+        return self.column("hourly")
+
+    def coins(self) -> list:
+        """The snapshot as Coin rows, as market_data built them at scan time (sparkline re-derived)."""
+        from market_data import Coin, _downsample
+        from array import array
+
+        cols     = {name: self.column(name).tolist() for name in NUMERIC_FIELDS}
+        strs     = {name: self.strings(name) for name in STRING_FIELDS}
+        hourly   = self.hourly()
+        recorded = ~np.isnan(hourly)
+        out = []
+        for i in range(self.rows):
+            # Strip the left padding only — gaps inside the series stay NaN, as at ingest
+            row    = hourly[i, int(recorded[i].argmax()):] if recorded[i].any() else hourly[i, :0]
+            fields = {name: (None if (v := cols[name][i]) != v else v) for name in NUMERIC_FIELDS}
+            if fields["market_cap_rank"] is not None:
+                fields["market_cap_rank"] = int(fields["market_cap_rank"])
+            out.append(Coin(
+                **fields, **{name: strs[name][i] for name in STRING_FIELDS},
+                hourly=array("f", row.tobytes()),
+                sparkline=array("f", _downsample(row[~np.isnan(row)].tolist())),
+            ))
+        return out
+
+    def trend_ids(self) -> set[str]:
+        ids = self.strings("id")
+        return {ids[i].lower() for i in np.flatnonzero(self.column("trending")).tolist() if ids[i]}
+
+    def close(self) -> None:
+        self._table = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass   # views handed out still pin the map; it closes when they go
+
+    def __enter__(self) -> "SnapshotFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _encode(coins: list, trend_ids: set[str], t: float) -> bytes:
+    """Serialize one snapshot: header, then the aligned columns."""
+    n = len(coins)
+    table: dict[str, int] = {}
+    arrays = {}
+    for name in NUMERIC_FIELDS:
+        arrays[name] = np.fromiter(
+            (np.nan if (v := c.get(name)) is None else v for c in coins), dtype="<f8", count=n,
+        )
+    for name in STRING_FIELDS:
+        arrays[name] = np.fromiter(
+            (-1 if (v := c.get(name)) is None else table.setdefault(str(v), len(table)) for c in coins),
+            dtype="<i4", count=n,
+        )
+    arrays["trending"] = np.fromiter(
+        ((c.get("id") or "").lower() in trend_ids for c in coins), dtype="u1", count=n,
+    )
+    hourly = np.full((n, HOURS), np.nan, dtype="<f4")
+    for i, c in enumerate(coins):
+        h = c.get("hourly")
+        if h:
+            row = np.frombuffer(h, dtype=np.float32) if hasattr(h, "typecode") else np.asarray(h, dtype=np.float32)
+            row = row[-HOURS:]
+            hourly[i, HOURS - row.size:] = row
+    arrays["hourly"] = hourly
+    encoded = [s.encode("utf-8") for s in table]
+    arrays["_strings"]     = np.frombuffer(b"".join(encoded), dtype="u1")
+    arrays["_string_ends"] = np.cumsum([len(b) for b in encoded], dtype="<i8")
+
+    # Header size depends on the offsets it lists: lay out against a generous fixed header block
+    names   = list(arrays)
+    layout  = {}
+    head    = 4096 + 64 * len(names)
+    off     = head
+    for name in names:
+        layout[name] = [off, arrays[name].dtype.str, list(arrays[name].shape)]
+        off += -(-arrays[name].nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({"t": t, "rows": n, "columns": layout}).encode()
+    if len(MAGIC) + 4 + len(header) > head:
+        raise ValueError("Snapshot header overflow")
+    buf = bytearray(off)
+    buf[:len(MAGIC)] = MAGIC
+    struct.pack_into("<I", buf, len(MAGIC), len(header))
+    buf[len(MAGIC) + 4:len(MAGIC) + 4 + len(header)] = header
+    for name in names:
+        data = arrays[name].tobytes()
+        buf[layout[name][0]:layout[name][0] + len(data)] = data
+    return bytes(buf)
+
+
+class Archive:
+    """
+    The archive directory. append() stores a scan (never raises — failures
+    land in last_error), entries() reads the manifest, open() / at() map
+    snapshot files, column() gathers one column across a time range.
+    """
+
+    def __init__(self, root: Path | str = ARCHIVE_DIR):
+        self.root       = Path(root)
+        self.last_error: str | None = None
+        self._lock      = threading.RLock()
+        self._pruned_at = 0.0
+        self._entries: list[ManifestEntry] = []
+        self._read_to   = 0   # manifest bytes already parsed
+
+    @property
+    def manifest(self) -> Path:
+        return self.root / "manifest.jsonl"
+
+    # ── Writing ───────────────────────────────────────────────────
+    def append(self, coins: list, trending_coins: list[dict] | None = None, t: float | None = None) -> Path | None:
+        """Archive a scan's snapshot (Coin / dict rows); returns the file written, or None."""
+        if np is None or not coins:
+            return None
+        from analysis import _trend_id_set
+
+        t = time.time() if t is None else t
+        try:
+            data = _encode(coins, _trend_id_set(trending_coins), t)
+            with self._lock:
+                self.root.mkdir(parents=True, exist_ok=True)
+                name = f"{int(t * 1000)}.snap"
+                path = self.root / name
+                tmp  = path.with_name(f"{name}.{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+                with open(self.manifest, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps({"file": name, "t": t, "rows": len(coins)}) + "\n")
+                if t - self._pruned_at >= _PRUNE_EVERY:
+                    self._pruned_at = t
+                    self.prune(t)
+            return path
+        except (OSError, ValueError) as e:
+            self.last_error = f"Snapshot archive write failed: {e}"
+            return None
+
+    def prune(self, now: float | None = None) -> int:
+        """Drop snapshots past ARCHIVE_RETENTION, then the oldest until under ARCHIVE_MAX_BYTES. Returns how many."""
+        now     = time.time() if now is None else now
+        entries = self.entries()
+        sizes   = []
+        for e in entries:
+            try:
+                sizes.append((self.root / e.file).stat().st_size)
+            except OSError:
+                sizes.append(0)
+        total, drop = sum(sizes), 0
+        while drop < len(entries) and (entries[drop].t < now - ARCHIVE_RETENTION or total > ARCHIVE_MAX_BYTES):
+            total -= sizes[drop]
+            drop  += 1
+        if not drop:
+            return 0
+        tmp = self.manifest.with_name(f"manifest.{os.getpid()}.tmp")
+        tmp.write_text("".join(json.dumps(e._asdict()) + "\n" for e in entries[drop:]), encoding="utf-8")
+        os.replace(tmp, self.manifest)
+        self._entries, self._read_to = [], 0
+        for e in entries[:drop]:
+            try:
+                (self.root / e.file).unlink()
+            except OSError:
+                pass
+        return drop
+
+    # ── Reading ───────────────────────────────────────────────────
+    def entries(self, since: float | None = None, until: float | None = None) -> list[ManifestEntry]:
+        """Manifest entries in [since, until], oldest first (only new manifest lines are parsed)."""
+        with self._lock:
+            self._read_manifest()
+            entries = self._entries
+        lo = 0 if since is None else bisect.bisect_left(entries, since, key=lambda e: e.t)
+        hi = len(entries) if until is None else bisect.bisect_right(entries, until, key=lambda e: e.t)
+        return entries[lo:hi]
+
+    def _read_manifest(self) -> None:
+        try:
+            with open(self.manifest, "rb") as fh:
+                size = os.fstat(fh.fileno()).st_size
+                if size < self._read_to:          # rewritten by a prune
+                    self._entries, self._read_to = [], 0
+                fh.seek(self._read_to)
+                chunk = fh.read(size - self._read_to)
+        except OSError:
+            self._entries, self._read_to = [], 0
+            return
+        chunk = chunk[:chunk.rfind(b"\n") + 1]    # a line still being appended waits for next time
+        self._read_to += len(chunk)
+        for line in chunk.splitlines():
+            try:
+                rec = json.loads(line)
+                self._entries.append(ManifestEntry(rec["file"], rec["t"], rec["rows"]))
+            except (ValueError, KeyError):
+                continue
+        if chunk:
+            self._entries = sorted(self._entries, key=lambda e: e.t)   # a new list: callers hold the old one
+
+    def open(self, entry: ManifestEntry) -> SnapshotFile:
+        return SnapshotFile(self.root / entry.file)
+
+    def at(self, t: float) -> SnapshotFile | None:
+        """The latest snapshot taken at or before `t` (what the board looked like then)."""
+        entries = self.entries(until=t)
+        return self.open(entries[-1]) if entries else None
+
+    def files(self, since: float | None = None, until: float | None = None) -> Iterable[SnapshotFile]:
+        """Open each snapshot in the range in turn (closing the previous one); missing files are skipped."""
+        for entry in self.entries(since, until):
+            try:
+                snap = self.open(entry)
+            except (OSError, ValueError):
+                continue
+            with snap:
+                yield snap
+
+    def column(self, name: str, since: float | None = None, until: float | None = None):
+        """
+        (times, offsets, values): `name` of every snapshot in the range stacked
+        row-wise, with snapshot i's rows at values[offsets[i]:offsets[i + 1]].
+        """
+        times, parts = [], []
+        for snap in self.files(since, until):
+            times.append(snap.t)
+            parts.append(np.array(snap.column(name)))
+        sizes = [len(p) for p in parts]
+        values = np.concatenate(parts) if parts else np.empty(0)
+        return np.array(times), np.concatenate(([0], np.cumsum(sizes, dtype=np.int64))), values
+
+
+store = Archive()
+
+
+def archive_scan(coins: list, trending_coins: list[dict] | None = None) -> None:
+    """Save a finished scan's snapshot when ARCHIVE_SNAPSHOTS is on."""
+    if ARCHIVE_SNAPSHOTS:
+        store.append(coins, trending_coins)
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Backtest the momentum score over recorded market snapshots.
+
+Every snapshot of a series is stacked into one set of row-aligned columns plus
+a (snapshots × coins) price matrix, so scoring, per-snapshot top-k selection,
+forward returns and turnover are whole-array operations across all snapshots
+at once — months of 10-minute snapshots evaluate in seconds. Scores follow
+rank_coins factor for factor, with each snapshot's own normalization ranges
+and its own clock for the newly-listed bonus.
+
+    python backtest.py capture.jsonl [more.jsonl ...] [--top 20] [--horizons 1h,4h,24h] [-p all]
+    python backtest.py --archive [--days 14]
+
+Snapshots come from JSONL captures written by --record / SHITCOINER_RECORD
+(see replay.py), or with --archive [DIR] from the scan archive (archive.py).
+Needs NumPy.
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import (
+    NEWLY_LISTED_DAYS,
+    BLUE_CHIP_RANK_CUTOFF,
+    FEATURE_RANGES,
+    QUANTILE_CLIP,
+    BACKTEST_HORIZONS,
+    BACKTEST_TOP_K,
+    BACKTEST_SCAN_GAP,
+    BACKTEST_TOLERANCE,
+    ARCHIVE_DIR,
+)
+import analysis
+import features
+import profiles
+import scoring_engine
+from profiles import ScanProfile
+
+
+class Snapshot(NamedTuple):
+    t:         float        # epoch seconds the snapshot was taken
+    coins:     list         # market rows (Coin / dict), any order
+    trend_ids: set[str]     # lower-cased ids on the trending list at the time
+
+
+# ── Loading ───────────────────────────────────────────────────────
+def iter_capture_snapshots(paths: Iterable[str | Path], gap: float = BACKTEST_SCAN_GAP) -> Iterator[Snapshot]:
+    """
+    Snapshots from replay captures, one per recorded scan: /coins/markets pages
+    recorded within `gap` seconds of each other (and not repeating a page)
+    form one snapshot, tagged with the latest /search/trending seen before it.
+    A page recorded again with the same fetch time (a cached copy re-recorded
+    by a later run) is skipped. Lines are streamed, so captures larger than
+    memory are fine.
+    """
+    from market_data import _normalize_coin
+
+    trend_ids: set[str] = set()
+    pages: dict[str, list] = {}
+    fetched: dict[tuple, float] = {}   # (page params) -> fetch time of its latest recording
+    first = last = None
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue   # torn line
+                ep = rec.get("path", "")
+                if ep.endswith("/search/trending"):
+                    trend_ids = analysis._trend_id_set((rec.get("body") or {}).get("coins"))
+                    continue
+                if not ep.endswith("/coins/markets") or not isinstance(rec.get("body"), list):
+                    continue
+                params = rec.get("params", {})
+                key    = tuple(sorted(params.items()))
+                if fetched.get(key) == rec["t"]:
+                    continue
+                fetched[key] = rec["t"]
+                page = str(params.get("page", "1"))
+                if pages and (page in pages or rec["t"] - last > gap):
+                    yield Snapshot(first, [c for rows in pages.values() for c in rows], trend_ids)
+                    pages = {}
+                if not pages:
+                    first = rec["t"]
+                pages[page] = [_normalize_coin(raw) for raw in rec["body"]]
+                last = rec["t"]
+    if pages:
+        yield Snapshot(first, [c for rows in pages.values() for c in rows], trend_ids)
+
+
+class SnapshotSeries:
+    """
+    Snapshots stacked row-wise, oldest first. Row r belongs to snapshot
+    snap[r] and is coin ids[coin[r]]; rows of a snapshot are contiguous
+    (offsets). `cols` holds the scoring inputs of every row (coins / ids
+    dropped), `trending` the on-the-list flag, and prices[s, u] the price of
+    coin u in snapshot s (NaN when the coin wasn't in it).
+    """
+
+    __slots__ = ("times", "offsets", "snap", "coin", "ids", "cols", "trending", "prices")
+
+    def __init__(self, times, offsets, snap, coin, ids, cols, trending, prices):
+        self.times    = times
+        self.offsets  = offsets
+        self.snap     = snap
+        self.coin     = coin
+        self.ids      = ids
+        self.cols     = cols
+        self.trending = trending
+        self.prices   = prices
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def rows(self) -> int:
+        return len(self.snap)
+
+    @classmethod
+    def from_snapshots(cls, snapshots: Iterable[Snapshot]) -> "SnapshotSeries":
+        """Columnize snapshots one at a time (the hourly series are reduced to features and dropped)."""
+        if np is None:
+            raise RuntimeError("Backtesting needs NumPy")
+        index: dict[str, int] = {}
+        parts = []
+        for snap in snapshots:
+            coins = [c for c in snap.coins if c.get("id")]
+            if not coins:
+                continue
+            features.attach(coins)
+            cols = scoring_engine.SnapshotColumns.from_coins(coins, analysis.derived.get, features.FEATURE_NAMES)
+            price = np.fromiter(
+                (math.nan if (p := c.get("current_price")) is None else p for c in coins), dtype=float, count=len(coins),
+            )
+            trending = np.fromiter((cid in snap.trend_ids for cid in cols.ids), dtype=bool, count=len(coins))
+            parts.append(_part(snap.t, [c["id"] for c in coins], cols, price, trending, index))
+        return cls._stack(parts, index)
+
+    @classmethod
+    def from_archive(cls, source=None, since: float | None = None, until: float | None = None) -> "SnapshotSeries":
+        """
+        Columnize the archived snapshots in [since, until] (archive.py; default
+        the scan archive) straight from their mapped columns — no Coin rows.
+        """
+        if np is None:
+            raise RuntimeError("Backtesting needs NumPy")
+        import archive
+        import parallel
+
+        index: dict[str, int] = {}
+        parts = []
+        for snap in (source or archive.store).files(since, until):
+            ids  = snap.strings("id")
+            keep = np.fromiter((bool(cid) for cid in ids), dtype=bool, count=snap.rows)
+            if not keep.any():
+                continue
+            derive = [
+                analysis.derived.get({"id": cid, "symbol": sym, "atl_date": atl})
+                for cid, sym, atl, k in zip(ids, snap.strings("symbol"), snap.strings("atl_date"), keep) if k
+            ]
+            column = lambda name: np.array(snap.column(name)[keep], dtype=float)
+            feats  = parallel.map_rows(
+                features.compute, {"m": features.fill_matrix(snap.hourly()[keep])}, features.FEATURE_NAMES,
+            )
+            cols = scoring_engine.SnapshotColumns(
+                None, None,
+                column("price_change_percentage_24h"), column("price_change_percentage_7d"),
+                np.nan_to_num(column("vol_mcap_ratio"), nan=0.0), column("market_cap_rank"),
+                np.fromiter((d.stable for d in derive), dtype=bool, count=len(derive)),
+                np.fromiter((math.nan if d.atl_ts is None else d.atl_ts for d in derive), dtype=float, count=len(derive)),
+                feats,
+            )
+            parts.append(_part(
+                snap.t, [cid for cid in ids if cid], cols, column("current_price"),
+                snap.column("trending")[keep].astype(bool), index,
+            ))
+        return cls._stack(parts, index)
+
+    @classmethod
+    def _stack(cls, parts: list[tuple], index: dict[str, int]) -> "SnapshotSeries":
+        parts.sort(key=lambda p: p[0])
+        sizes   = np.array([p[1].n for p in parts], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        cat     = lambda name: np.concatenate([getattr(p[1], name) for p in parts]) if parts else np.empty(0)
+        cols = scoring_engine.SnapshotColumns(
+            None, None, cat("pct_24h"), cat("pct_7d"), cat("vmr"), cat("mcap_rank"),
+            cat("stable").astype(bool), cat("atl_ts"),
+            {name: np.concatenate([p[1].features[name] for p in parts]) if parts else np.empty(0)
+             for name in features.FEATURE_NAMES},
+        )
+        coin   = np.concatenate([p[2] for p in parts]) if parts else np.empty(0, dtype=np.int64)
+        snap   = np.repeat(np.arange(len(parts)), sizes)
+        prices = np.full((len(parts), len(index)), np.nan, dtype=np.float32)
+        if parts:
+            prices[snap, coin] = np.concatenate([p[3] for p in parts])
+        prices[prices <= 0] = np.nan
+        ids = [None] * len(index)
+        for cid, u in index.items():
+            ids[u] = cid
+        return cls(
+            np.array([p[0] for p in parts], dtype=float), offsets, snap, coin, ids, cols,
+            np.concatenate([p[4] for p in parts]) if parts else np.empty(0, dtype=bool), prices,
+        )
+
+
+def _part(t: float, ids: list[str], cols, price, trending, index: dict[str, int]) -> tuple:
+    """One snapshot's share of a SnapshotSeries; `index` maps coin ids to price-matrix columns."""
+    uidx = np.fromiter((index.setdefault(cid, len(index)) for cid in ids), dtype=np.int64, count=len(ids))
+    cols.coins = cols.ids = None
+    return t, cols, uidx, price, trending
+
+
+# ── Scoring every snapshot at once ────────────────────────────────
+def _segment_bounds(series: SnapshotSeries, values, quantiles: tuple[float, float] | None, default):
+    """
+    Per-snapshot (lo, hi) of `values` over non-stable rows with a value, as
+    ScoreAccumulator.bounds computes them: min/max, or in quantile mode the
+    exact clip quantiles its sketch approximates. Snapshots without values
+    get `default`.
+    """
+    valid = ~series.cols.stable & ~np.isnan(values)
+    count = np.bincount(series.snap[valid], minlength=len(series))
+    has   = count > 0
+    lo    = np.full(len(series), float(default[0]))
+    hi    = np.full(len(series), float(default[1]))
+    start = series.offsets[:-1]
+    if quantiles is None:
+        # fmin/fmax skip the NaNs; reduceat needs non-empty segments, `has` drops the rest
+        masked  = np.where(valid, values, np.nan)
+        starts  = np.minimum(start, max(0, series.rows - 1))
+        lo[has] = np.fmin.reduceat(masked, starts)[has]
+        hi[has] = np.fmax.reduceat(masked, starts)[has]
+        return lo, hi
+    # Sort rows by (snapshot, value) with missing values last in their snapshot
+    order = np.lexsort((np.where(valid, values, np.inf), series.snap))
+    for out, q in zip((lo, hi), quantiles):
+        pos      = start + np.maximum(0, np.ceil(q * count).astype(np.int64) - 1)
+        out[has] = values[order[pos[has]]]
+    return lo, hi
+
+
+def _normalize(values, lo, hi):
+    """scoring_engine._normalize with per-row bounds."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.clip((values - lo) / (hi - lo), 0.0, 1.0)
+    return np.where(hi > lo, out, 0.5)
+
+
+def _normalize_log(values, lo, hi):
+    """scoring_engine._normalize_log with per-row bounds."""
+    ll = np.log1p(np.maximum(0.0, lo))
+    lh = np.log1p(hi)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.clip((np.log1p(values) - ll) / (lh - ll), 0.0, 1.0)
+    out = np.where(lh <= ll, 0.5, out)
+    out = np.where(hi <= lo, 0.0, out)
+    return np.where(values > 0, out, 0.0)
+
+
+def factor_matrix(series: SnapshotSeries, profile: ScanProfile | None = None, names: list[str] | None = None):
+    """
+    (F, names): one 0–1 column per factor in `names` (default: every factor
+    `profile` weights) for every row, so a profile's scores are F @ weights.
+    Normalization ranges, the blue-chip cut-off and the newly-listed clock
+    follow `profile` and each row's own snapshot.
+    """
+    profile = profile or profiles.DEFAULT
+    names   = names if names is not None else [n for n, w in profile.weights.items() if w]
+    cols    = series.cols
+    snap    = series.snap
+    excl    = profile.blue_chips_excluded(True)
+
+    bounds = {}
+    for name, default in analysis.FACTOR_DEFAULTS.items():
+        fixed = profile.fixed_bounds(name)
+        if fixed is not None:
+            bounds[name] = fixed
+        else:
+            q = QUANTILE_CLIP[name] if profile.quantile_mode(name) else None
+            lo, hi = _segment_bounds(series, getattr(cols, name), q, default)
+            bounds[name] = (lo[snap], hi[snap])
+
+    F = np.empty((series.rows, len(names)))
+    for j, name in enumerate(names):
+        if name in ("pct_24h", "pct_7d"):
+            raw = getattr(cols, name)
+            F[:, j] = np.where(np.isnan(raw), 0.4, _normalize(raw, *bounds[name]))
+        elif name == "vmr":
+            F[:, j] = _normalize_log(cols.vmr, *bounds["vmr"])
+        elif name == "trending":
+            F[:, j] = np.where(series.trending, 1.0, 0.05)
+        elif name == "mcap_rank":
+            cutoff  = BLUE_CHIP_RANK_CUTOFF if excl else 1
+            F[:, j] = np.where(np.isnan(cols.mcap_rank), 0.7, _normalize(cols.mcap_rank, cutoff, 500))
+        elif name == "newly_listed":
+            with np.errstate(invalid="ignore"):
+                F[:, j] = np.floor((series.times[snap] - cols.atl_ts) / 86400.0) <= NEWLY_LISTED_DAYS
+        else:
+            f      = cols.features[name]
+            lo, hi = FEATURE_RANGES[name]
+            F[:, j] = np.where(np.isnan(f), 0.4, _normalize(f, lo, hi))
+    return F, names
+
+
+def profile_scores(series: SnapshotSeries, profile: ScanProfile | None = None):
+    """Every row's score under `profile` (NaN where its hard filters drop the coin)."""
+    profile  = profile or profiles.DEFAULT
+    F, names = factor_matrix(series, profile)
+    score    = np.clip(F @ np.array([profile.weights[n] for n in names]), 0.0, 1.0)
+    keep     = scoring_engine.filter_mask(series.cols, profile.blue_chips_excluded(True), profile.max_rank)
+    return np.where(keep, score, np.nan)
+
+
+def top_k(series: SnapshotSeries, scores, k: int):
+    """(snapshots × k) coin indices of each snapshot's best k rows, best first; -1 pads short snapshots."""
+    scored = ~np.isnan(scores)
+    # By snapshot, then score descending, then row — ties keep snapshot order as in rank_coins
+    order  = np.lexsort((np.where(scored, -scores, np.inf), series.snap))
+    pos    = np.arange(series.rows) - series.offsets[series.snap[order]]
+    take   = (pos < k) & scored[order]
+    picks  = np.full((len(series), k), -1, dtype=np.int64)
+    picks[series.snap[order[take]], pos[take]] = series.coin[order[take]]
+    return picks
+
+
+def exit_index(series: SnapshotSeries, horizon: float, tolerance: float = BACKTEST_TOLERANCE):
+    """Per snapshot, the later snapshot nearest to `horizon` seconds on (-1 if none within tolerance)."""
+    target = series.times + horizon
+    after  = np.minimum(np.searchsorted(series.times, target), len(series) - 1)
+    before = np.maximum(after - 1, 0)
+    j      = np.where(np.abs(series.times[before] - target) < np.abs(series.times[after] - target), before, after)
+    ok     = (j > np.arange(len(series))) & (np.abs(series.times[j] - target) <= tolerance * horizon)
+    return np.where(ok, j, -1)
+
+
+def _returns(series: SnapshotSeries, s, u, j):
+    """% change of coin u from snapshot s to snapshot j (arrays, broadcast); NaN where j or u is -1."""
+    valid = (u >= 0) & (j >= 0)
+    u     = np.where(valid, u, 0)
+    entry = series.prices[s, u].astype(float)
+    exit_ = series.prices[np.where(j >= 0, j, 0), u].astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(valid, (exit_ / entry - 1.0) * 100.0, np.nan)
+
+
+def forward_returns(series: SnapshotSeries, picks, horizon: float, tolerance: float = BACKTEST_TOLERANCE):
+    """% return of each pick from its snapshot to the exit snapshot `horizon` later; NaN when unknown."""
+    j = exit_index(series, horizon, tolerance)
+    return _returns(series, np.arange(len(series))[:, None], picks, j[:, None])
+
+
+def row_forward_returns(series: SnapshotSeries, horizon: float, tolerance: float = BACKTEST_TOLERANCE):
+    """forward_returns for every row of the series (row-aligned with its columns)."""
+    j = exit_index(series, horizon, tolerance)
+    return _returns(series, series.snap, series.coin, j[series.snap])
+
+
+def turnover(series: SnapshotSeries, picks) -> float:
+    """Mean share of the top-k replaced from one snapshot to the next."""
+    if len(series) < 2:
+        return math.nan
+    n_ids  = max(1, len(series.ids))
+    s      = np.arange(len(series))[:, None]
+    valid  = picks >= 0
+    now    = np.where(valid, s * n_ids + picks, -1)[1:]
+    before = np.where(valid, (s + 1) * n_ids + picks, -2)[:-1]   # previous picks, keyed as the next snapshot
+    kept   = np.isin(now, before[valid[:-1]]) & valid[1:]
+    held   = valid[1:].sum(axis=1)
+    both   = (held > 0) & (valid[:-1].sum(axis=1) > 0)
+    if not both.any():
+        return math.nan
+    return float(np.mean(1.0 - kept.sum(axis=1)[both] / held[both]))
+
+
+# ── Reports ───────────────────────────────────────────────────────
+class HorizonStats(NamedTuple):
+    horizon:  float   # seconds
+    picks:    int     # top-k picks with a known forward return
+    hit_rate: float   # share of those that went up
+    mean:     float   # mean forward return, %
+    median:   float   # median forward return, %
+    baseline: float   # mean forward return of every scored coin, % — what picking at random gets
+
+
+class BacktestResult(NamedTuple):
+    profile:   str
+    top_k:     int
+    snapshots: int
+    turnover:  float
+    horizons:  list[HorizonStats]
+
+
+def run(
+    series: SnapshotSeries,
+    profile: ScanProfile | None = None,
+    k: int = BACKTEST_TOP_K,
+    horizons: Iterable[float] = BACKTEST_HORIZONS,
+) -> BacktestResult:
+    """Score every snapshot under `profile`, take each one's top k and measure what happened next."""
+    profile = profile or profiles.DEFAULT
+    scores  = profile_scores(series, profile)
+    picks   = top_k(series, scores, k)
+    scored  = ~np.isnan(scores)
+
+    stats = []
+    for h in horizons:
+        fwd  = forward_returns(series, picks, h)
+        fwd  = fwd[~np.isnan(fwd)]
+        base = row_forward_returns(series, h)[scored]
+        base = base[~np.isnan(base)]
+        stats.append(HorizonStats(
+            h, int(fwd.size),
+            float(np.mean(fwd > 0)) if fwd.size else math.nan,
+            float(fwd.mean()) if fwd.size else math.nan,
+            float(np.median(fwd)) if fwd.size else math.nan,
+            float(base.mean()) if base.size else math.nan,
+        ))
+    return BacktestResult(profile.name, k, len(series), turnover(series, picks), stats)
+
+
+def _fmt_horizon(seconds: float) -> str:
+    if seconds % 86400 == 0:
+        return f"{seconds / 86400:g}d"
+    if seconds % 3600 == 0:
+        return f"{seconds / 3600:g}h"
+    return f"{seconds / 60:g}m"
+
+
+def _parse_horizon(text: str) -> float:
+    unit = {"m": 60, "h": 3600, "d": 86400}.get(text[-1:].lower())
+    return float(text[:-1]) * unit if unit else float(text)
+
+
+def format_result(r: BacktestResult) -> str:
+    lines = [
+        f"Profile {r.profile} — top {r.top_k} over {r.snapshots} snapshots, "
+        f"turnover {r.turnover:.0%} per snapshot",
+        f"  {'horizon':>8} {'picks':>7} {'hit rate':>9} {'mean':>9} {'median':>9} {'all coins':>10}",
+    ]
+    for h in r.horizons:
+        if not h.picks:
+            lines.append(f"  {_fmt_horizon(h.horizon):>8} {0:>7}   (no exit snapshot that far ahead)")
+            continue
+        lines.append(
+            f"  {_fmt_horizon(h.horizon):>8} {h.picks:>7} {h.hit_rate:>9.1%} "
+            f"{h.mean:>+8.2f}% {h.median:>+8.2f}% {h.baseline:>+9.2f}%"
+        )
+    return "\n".join(lines)
+
+
+def add_source_arguments(parser: argparse.ArgumentParser) -> None:
+    """Snapshot source options shared with optimize.py."""
+    parser.add_argument("captures", nargs="*", help="JSONL captures written by --record / SHITCOINER_RECORD")
+    parser.add_argument("--archive", nargs="?", const=str(ARCHIVE_DIR), metavar="DIR",
+                        help=f"Use the scan archive instead (default {ARCHIVE_DIR})")
+    parser.add_argument("--days", type=float, help="Only the last N days of the archive")
+
+
+def load_series(args: argparse.Namespace) -> SnapshotSeries | None:
+    """SnapshotSeries from the source chosen by add_source_arguments(); None if none was given."""
+    if args.archive:
+        import archive
+        since = time.time() - args.days * 86400 if args.days else None
+        return SnapshotSeries.from_archive(archive.Archive(args.archive), since)
+    if args.captures:
+        return SnapshotSeries.from_snapshots(iter_capture_snapshots(args.captures))
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backtest the momentum score over recorded market snapshots.")
+    add_source_arguments(parser)
+    parser.add_argument("--top", type=int, default=BACKTEST_TOP_K, help=f"Picks per snapshot (default {BACKTEST_TOP_K})")
+    parser.add_argument("--horizons", default=",".join(_fmt_horizon(h) for h in BACKTEST_HORIZONS),
+                        help="Comma-separated forward horizons, e.g. 30m,1h,1d")
+    parser.add_argument("-p", "--profile", action="append", metavar="NAME",
+                        help="Scan profile to test; repeat for several, or 'all' (default: config weights)")
+    args = parser.parse_args()
+
+    if np is None:
+        print("Backtesting needs NumPy (pip install numpy)", file=sys.stderr)
+        return 1
+    try:
+        horizons = [_parse_horizon(h) for h in args.horizons.split(",") if h]
+        wanted   = (
+            list(profiles.PROFILES.values()) if args.profile and "all" in (n.lower() for n in args.profile)
+            else [profiles.get(n) for n in args.profile] if args.profile else [profiles.DEFAULT]
+        )
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    series = load_series(args)
+    if series is None:
+        print("Give capture files or --archive", file=sys.stderr)
+        return 2
+    if len(series) < 2:
+        print("Need at least two market snapshots in the captures", file=sys.stderr)
+        return 1
+    span = (series.times[-1] - series.times[0]) / 3600
+    print(f"{len(series)} snapshots, {series.rows:,} rows, {len(series.ids):,} coins over {span:.1f}h")
+    for p in wanted:
+        print()
+        print(format_result(run(series, p, args.top, horizons)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -113,8 +113,25 @@ COMMON=(
   --hidden-import=requests.adapters
   --hidden-import=urllib3
   --hidden-import=dotenv
+  --hidden-import=numpy
   --hidden-import=analysis
+  --hidden-import=scoring_engine
+  --hidden-import=quantiles
+  --hidden-import=features
+  --hidden-import=clusters
+  --hidden-import=profiles
+  --hidden-import=parallel
+  --hidden-import=history_store
+  --hidden-import=momentum
+  --hidden-import=watchlist
+  --hidden-import=archive
   --hidden-import=market_data
+  --hidden-import=rate_limit
+  --hidden-import=http_cache
+  --hidden-import=crawler
+  --hidden-import=replay
+  --hidden-import=backtest
+  --hidden-import=optimize
   --hidden-import=config
   --hidden-import=explainer
   --hidden-import=ai_commentary
@@ -0,0 +1,156 @@
+"""
+Co-movement clusters ("pump groups").
+Coordinated pumps move several micro-caps together. This stage correlates the
+recent hourly returns of every coin in a snapshot and groups coins that move
+in lockstep:
+
+    1. hourly log returns over the last CLUSTER_WINDOW_HOURS, market-neutral
+       (each hour's cross-sectional mean removed, so "everything dumped with
+       BTC" doesn't glue the whole universe together)
+    2. rows scaled to unit length, so Z @ Z.T is the correlation matrix —
+       computed block by block (BLAS matmul) to keep memory flat at 5k+ coins
+    3. edges where correlation ≥ CLUSTER_MIN_CORR, connected components of
+       that graph, groups of at least CLUSTER_MIN_SIZE kept
+
+Results are cached per snapshot. Needs NumPy; without it no clusters are found.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import features
+from config import (
+    CLUSTER_WINDOW_HOURS,
+    CLUSTER_MIN_CORR,
+    CLUSTER_MIN_SIZE,
+    CLUSTER_MOMENTUM_HOURS,
+    CLUSTER_BLOCK,
+)
+
+_CACHE_SIZE = 4
+_cache: "OrderedDict[tuple, Clusters]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class Clusters:
+    """
+    Detected groups. Cluster ids run 1.. in order of falling momentum, so C1
+    is the hottest group. Coins outside every group have no entry in `labels`.
+    """
+
+    __slots__ = ("labels", "members", "momentum")
+
+    def __init__(self, labels: dict[str, int], members: dict[int, list[str]], momentum: dict[int, float]):
+        self.labels   = labels     # coin id -> cluster id
+        self.members  = members    # cluster id -> coin ids
+        self.momentum = momentum   # cluster id -> mean member return over CLUSTER_MOMENTUM_HOURS, %
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def tag(self, coins: list) -> None:
+        """Set cluster_id / cluster_size / cluster_momentum on each coin (None when unclustered)."""
+        for c in coins:
+            k = self.labels.get(c.get("id"))
+            c["cluster_id"]       = k
+            c["cluster_size"]     = len(self.members[k]) if k is not None else None
+            c["cluster_momentum"] = self.momentum.get(k) if k is not None else None
+
+
+def _components(n: int, a, b):
+    """Connected-component labels (smallest member index) for an n-node graph with edges a[i]–b[i]."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        new = labels.copy()
+        np.minimum.at(new, a, low)
+        np.minimum.at(new, b, low)
+        new = new[new]   # pointer jumping — halves the remaining path length each round
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def _edges(z, min_corr: float, block: int):
+    """(i, j) index arrays with i < j and z[i]·z[j] ≥ min_corr, one row block at a time."""
+    ei, ej = [], []
+    for start in range(0, len(z), block):
+        corr   = z[start:start + block] @ z.T
+        bi, bj = np.nonzero(corr >= min_corr)
+        bi    += start
+        keep   = bj > bi
+        ei.append(bi[keep])
+        ej.append(bj[keep])
+    if not ei:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(ei), np.concatenate(ej)
+
+
+def detect(
+    coins: list,
+    min_corr: float = CLUSTER_MIN_CORR,
+    window: int = CLUSTER_WINDOW_HOURS,
+    min_size: int = CLUSTER_MIN_SIZE,
+) -> Clusters:
+    """Co-movement clusters across `coins` (the whole scanned snapshot, not just the winners)."""
+    if np is None or len(coins) < min_size:
+        return Clusters({}, {}, {})
+
+    prices = features.hourly_matrix(coins)
+    recent = prices[:, -(window + 1):]
+    ids    = tuple(c.get("id") for c in coins)
+    key    = (ids, hashlib.blake2b(recent.tobytes(), digest_size=16).digest(), min_corr, window, min_size)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.diff(np.log(recent), axis=1)
+    rows = np.flatnonzero(~np.isnan(r).any(axis=1))   # full window only
+    r    = r[rows]
+    if len(rows):
+        r = r - r.mean(axis=0)                 # remove the market-wide move each hour
+        r = r - r.mean(axis=1, keepdims=True)
+        norm = np.sqrt((r * r).sum(axis=1))
+        live = norm > 1e-12                    # flat lines (pegged / dead coins) correlate with nothing
+        rows, r, norm = rows[live], r[live], norm[live]
+    z = (r / norm[:, None]).astype(np.float32) if len(rows) else np.empty((0, 0), dtype=np.float32)
+
+    a, b   = _edges(z, min_corr, CLUSTER_BLOCK)
+    labels = _components(len(rows), a, b)
+    roots, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = (prices[:, -1] / prices[:, -1 - CLUSTER_MOMENTUM_HOURS] - 1.0) * 100.0
+
+    groups = []
+    for g in np.flatnonzero(sizes >= min_size):
+        member_rows = rows[inverse == g]
+        vals        = ret[member_rows]
+        vals        = vals[~np.isnan(vals)]
+        groups.append((float(vals.mean()) if vals.size else 0.0, member_rows))
+    groups.sort(key=lambda g: g[0], reverse=True)
+
+    out_labels:   dict[str, int]       = {}
+    out_members:  dict[int, list[str]] = {}
+    out_momentum: dict[int, float]     = {}
+    for k, (momentum, member_rows) in enumerate(groups, 1):
+        out_members[k]  = [ids[i] for i in member_rows.tolist()]
+        out_momentum[k] = momentum
+        for cid in out_members[k]:
+            out_labels[cid] = k
+    result = Clusters(out_labels, out_members, out_momentum)
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -1,11 +1,46 @@
 """Configuration and constants — shitcoin momentum scanner."""
 
+import os
+from pathlib import Path
+
 # ── CoinGecko API ─────────────────────────────────────────────────────────────
-COINGECKO_BASE   = "https://api.coingecko.com/api/v3"
-COINGECKO_TOP_N  = 500   # fetch top 500 by market cap — small/micro cap territory
-REQUEST_TIMEOUT  = 15
-RATE_LIMIT_WAIT  = 65    # seconds to wait after a 429 before telling the user to retry
-MAX_RETRIES      = 2     # number of retry attempts on transient errors
+# Override with COINGECKO_BASE=http://127.0.0.1:8765/api/v3 to run against `python replay.py`
+COINGECKO_BASE          = os.environ.get("COINGECKO_BASE", "https://api.coingecko.com/api/v3")
+COINGECKO_TOP_N         = 500   # fetch top 500 by market cap — small/micro cap territory
+REQUEST_TIMEOUT         = 15
+RATE_LIMIT_WAIT         = 65    # seconds to back off after a 429 that carries no Retry-After header
+RATE_LIMIT_RETRIES      = 2     # 429s absorbed (by waiting out the backoff) before a call gives up
+MAX_RETRIES             = 2     # number of retry attempts on transient errors
+REQUESTS_PER_MINUTE     = 25    # shared budget for every CoinGecko call in the process (free tier ≈ 30)
+REQUEST_BURST           = 5     # requests that may go out back-to-back before the budget paces them
+MAX_CONCURRENT_REQUESTS = 4     # parallel CoinGecko calls (market pages etc.) — keep small on the free tier
+SIMPLE_PRICE_BATCH      = 100   # max ids per /simple/price call
+SIMPLE_PRICE_MAX_CHARS  = 1500  # max length of the comma-joined ids param, well under URL limits
+RECORD_PATH             = os.environ.get("SHITCOINER_RECORD")   # append every API response here (see replay.py)
+
+# ── Response cache ────────────────────────────────────────────────────────────
+# Per-endpoint (ttl, stale_window) in seconds. Within ttl a cached response is served
+# as-is; within ttl + stale_window it is served while a background refresh runs.
+CACHE_DIR  = Path.home() / ".shitcoiner" / "cache"
+CACHE_TTLS: dict[str, tuple[float, float]] = {
+    "/search/trending": (600, 1800),   # trending list barely moves minute to minute
+    "/coins/markets":   (60,  120),    # a rescan a minute later reuses the pages
+    "/simple/price":    (5,   0),      # the bag poller wants live prices, never stale
+}
+# Market pages already in memory younger than this answer gainers/losers without a request
+SNAPSHOT_MAX_AGE = 120
+
+# ── Universe crawler ──────────────────────────────────────────────────────────
+# Background mode that keeps a rolling snapshot of every /coins/markets page.
+CRAWLER_MAX_PAGES    = 60     # 60 × 250 = 15,000 coins — deep enough for fresh listings
+CRAWLER_BUDGET_SHARE = 0.4    # fraction of REQUESTS_PER_MINUTE the crawler may use
+CRAWLER_HOT_REFRESH  = 180    # seconds between refreshes of a page with a big mover on it
+CRAWLER_COLD_REFRESH = 900    # seconds between refreshes of every other page
+CRAWLER_HOT_MOVE     = 30.0   # |24h %| that makes a page "hot"
+
+# ── Live re-ranking ───────────────────────────────────────────────────────────
+LIVE_POLL_INTERVAL = 10    # seconds between price polls that re-rank the last scan
+LIVE_RANK_POLL     = 100   # best-ranked coins polled each round (so coins can climb into view)
 
 # ── Browser automation ────────────────────────────────────────────────────────
 BROWSER_TYPES = ["chromium", "firefox", "webkit"]
@@ -24,7 +59,139 @@ WEIGHT_MARKET_CAP_RANK  = 0.10   # prefer rank 50–500 (micro/small cap volatil
 # ──────────────────────────────────────────────────────────────────────────────
 # WEIGHT_TOTAL = 1.00
 # Newly listed proxy: flat additive bonus on top, clamped to 1.0
-NEWLY_LISTED_BONUS      = 0.05   # added if atl_date is within ~180 days (new coin heuristic)
+NEWLY_LISTED_BONUS      = 0.05   # added if atl_date is within NEWLY_LISTED_DAYS (new coin heuristic)
+NEWLY_LISTED_DAYS       = 180
+
+# ── Factor normalization ──────────────────────────────────────────────────────
+# Per factor: "minmax" scales between the snapshot's min and max (one +5000% outlier
+# squashes everyone else); "quantile" scales between the QUANTILE_CLIP percentiles of a
+# streaming quantile sketch (quantiles.py) and clamps anything beyond them to 0 / 1.
+FACTOR_NORMALIZATION: dict[str, str] = {
+    "pct_24h": "minmax",
+    "pct_7d":  "minmax",
+    "vmr":     "minmax",
+}
+QUANTILE_CLIP: dict[str, tuple[float, float]] = {
+    "pct_24h": (0.02, 0.98),
+    "pct_7d":  (0.02, 0.98),
+    "vmr":     (0.05, 0.99),
+}
+QUANTILE_SKETCH_K = 200   # sketch size — rank error ≈ 1.7 / k, memory O(k) at any universe size
+
+# ── Sparkline features ────────────────────────────────────────────────────────
+# Multi-timeframe features from the 7-day hourly sparkline (features.py, needs numpy).
+# Optional scoring factors on top of the weights above: 0 = shown in the GUI but not
+# scored; a negative weight turns a feature into a penalty (e.g. max_drawdown).
+# Each value is scaled 0–1 linearly (clamped) across its FEATURE_RANGES entry.
+FEATURE_WEIGHTS: dict[str, float] = {
+    "ret_1h":       0.0,
+    "ret_4h":       0.0,
+    "ret_12h":      0.0,
+    "volatility":   0.0,
+    "max_drawdown": 0.0,
+    "rsi":          0.0,
+    "breakout":     0.0,
+}
+FEATURE_RANGES: dict[str, tuple[float, float]] = {
+    "ret_1h":       (-10.0, 30.0),    # %
+    "ret_4h":       (-20.0, 60.0),    # %
+    "ret_12h":      (-30.0, 100.0),   # %
+    "volatility":   (0.0,   40.0),    # daily %, from hourly log returns
+    "max_drawdown": (0.0,   80.0),    # % off the 7d running peak
+    "rsi":          (0.0,   100.0),
+    "breakout":     (0.0,   1.0),     # 1 = above the prior BREAKOUT_HOURS high
+}
+RSI_PERIOD     = 14   # hourly changes in the RSI window
+BREAKOUT_HOURS = 72   # breakout = last price above the highest close of this many prior hours
+
+# ── Co-movement clusters ──────────────────────────────────────────────────────
+# Groups of coins whose hourly returns move together (clusters.py, needs numpy).
+CLUSTER_WINDOW_HOURS   = 48     # hourly returns compared
+CLUSTER_MIN_CORR       = 0.80   # edge threshold on market-neutral return correlation
+CLUSTER_MIN_SIZE       = 3      # smallest group reported
+CLUSTER_MOMENTUM_HOURS = 24     # cluster momentum = mean member return over this many hours
+CLUSTER_BLOCK          = 1024   # rows per correlation block — memory ≈ block × coins × 4 bytes
+
+# ── Parallel scoring ──────────────────────────────────────────────────────────
+# Numeric scan stages (sparkline features, profile scoring) on snapshots of at least
+# PARALLEL_MIN_ROWS coins run in a process pool over shared memory (parallel.py), off
+# the GUI's interpreter. Smaller scans, or PARALLEL_WORKERS ≤ 1, stay in-process.
+PARALLEL_WORKERS  = int(os.environ.get("SHITCOINER_WORKERS", min(4, (os.cpu_count() or 1) - 1)))
+PARALLEL_MIN_ROWS = 10_000
+# Task-shaped work (optimize.py's candidate chunks) goes to the pool once its total
+# cost — snapshots × coins × factors × candidates — reaches PARALLEL_MIN_WORK.
+PARALLEL_MIN_WORK = 1e8
+
+# ── Scan profiles ─────────────────────────────────────────────────────────────
+# Named views of one snapshot: switching profile re-ranks the coins already fetched.
+# Each entry overrides parts of the defaults above; anything left out keeps them.
+#   "weights"             factor -> weight: pct_24h, vmr, trending, pct_7d, mcap_rank,
+#                         newly_listed (the flat bonus) and any FEATURE_WEIGHTS name
+#   "exclude_blue_chips"  True / False; leave out to follow the blue-chip toggle / flag
+#   "max_rank"            only coins ranked ≤ this by market cap (a top 300 out of a 500 fetch)
+#   "normalization"       factor -> "minmax" / "quantile", as in FACTOR_NORMALIZATION
+#   "bounds"              factor -> fixed (lo, hi) for pct_24h / pct_7d / vmr instead of the snapshot's
+SCAN_PROFILES: dict[str, dict] = {
+    "MOMENTUM":   {},
+    "EARLY PUMP": {
+        "weights": {"pct_24h": 0.15, "vmr": 0.30, "trending": 0.15, "pct_7d": 0.05,
+                    "mcap_rank": 0.10, "ret_1h": 0.10, "ret_4h": 0.15},
+    },
+    "WEEKLY RUN": {
+        "weights": {"pct_24h": 0.15, "vmr": 0.20, "trending": 0.15, "pct_7d": 0.40, "mcap_rank": 0.10},
+    },
+    "TOP 300":       {"max_rank": 300},
+    "OUTLIER-PROOF": {"normalization": {"pct_24h": "quantile", "pct_7d": "quantile", "vmr": "quantile"}},
+}
+DEFAULT_PROFILE = "MOMENTUM"
+# Profiles saved by optimize.py (same format as above); merged in after SCAN_PROFILES
+USER_PROFILES_PATH = Path.home() / ".shitcoiner" / "profiles.json"
+
+# ── Watchlist ─────────────────────────────────────────────────────────────────
+# The bag (watchlist.py): held in memory, saved to this file after edits settle.
+WATCHLIST_PATH        = Path.home() / ".shitcoiner" / "watchlist.json"
+WATCHLIST_SAVE_DELAY  = 1.0   # seconds after the last change before it is written
+WATCHLIST_CHECK_EVERY = 2.0   # seconds between checks of the file for outside edits
+
+# ── Score history ─────────────────────────────────────────────────────────────
+# Every scan's scores go to an SQLite database (history_store.py); older data is kept
+# only as hourly, then daily, rollups.
+HISTORY_DB_PATH          = Path.home() / ".shitcoiner" / "history.db"
+HISTORY_RAW_RETENTION    = 3 * 86400     # every recorded score, this long
+HISTORY_HOURLY_RETENTION = 60 * 86400    # hourly rollups, this long
+HISTORY_DAILY_RETENTION  = 730 * 86400   # daily rollups, this long
+HISTORY_VELOCITY_WINDOW  = 6 * 3600      # history_store.velocity(): change in score over this window
+
+# ── Score momentum ────────────────────────────────────────────────────────────
+# Live per-coin score trend (momentum.py): EMA, least-squares slope per hour and
+# acceleration over the latest scores. The GUI's score velocity is the slope.
+MOMENTUM_WINDOW        = 32           # scores kept per coin
+MOMENTUM_MAX_AGE       = 24 * 3600    # scores older than this (vs the newest) drop out of the fit
+MOMENTUM_EMA_HALF_LIFE = 3600         # seconds for an old score's weight in the EMA to halve
+
+# ── Snapshot archive ──────────────────────────────────────────────────────────
+# Every scan's full snapshot is kept as a memory-mappable columnar file (archive.py)
+# for history and backtests. Oldest snapshots go first when either limit is hit.
+ARCHIVE_DIR       = Path(os.environ.get("SHITCOINER_ARCHIVE", Path.home() / ".shitcoiner" / "archive"))
+ARCHIVE_SNAPSHOTS = True                # False = don't save scans
+ARCHIVE_RETENTION = 30 * 86400          # seconds a snapshot is kept
+ARCHIVE_MAX_BYTES = 2 * 1024 ** 3       # total size of the archive
+
+# ── Backtesting ───────────────────────────────────────────────────────────────
+# backtest.py replays recorded market snapshots through the scoring and checks what
+# the top picks did next.
+BACKTEST_HORIZONS  = (3600, 4 * 3600, 24 * 3600)   # forward-return horizons, seconds
+BACKTEST_TOP_K     = 20
+BACKTEST_SCAN_GAP  = 300    # market pages recorded further apart than this start a new snapshot
+BACKTEST_TOLERANCE = 0.25   # the exit snapshot may be up to this fraction of the horizon off target
+
+# ── Weight optimization ───────────────────────────────────────────────────────
+# optimize.py searches weight sets against the same recordings and saves the best as a profile.
+OPTIMIZE_HORIZON    = 4 * 3600   # forward return the search maximizes, seconds
+OPTIMIZE_CANDIDATES = 1000       # weight sets drawn by random / halving search
+OPTIMIZE_GRID_STEP  = 0.05       # weight increment of the grid search
+OPTIMIZE_HALVING    = 3          # successive halving keeps 1/this of the candidates per round
+OPTIMIZE_HOLDOUT    = 0.3        # latest share of snapshots kept out of the search, for validation
 
 # ── Blue chip exclusion ───────────────────────────────────────────────────────
 # Coins ranked ≤ this by market cap are considered "blue chips" and hidden by default.
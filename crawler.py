@@ -0,0 +1,144 @@
+"""
+Background crawler for the whole /coins/markets universe.
+COINGECKO_TOP_N stops at rank 500; the coins this scanner actually hunts live
+far below that. The crawler walks every page at background priority, inside a
+fixed share of the request budget, and keeps a rolling merged snapshot.
+Pages where big movers showed up recently are revisited more often.
+"""
+
+import threading
+import time
+
+from config import (
+    REQUESTS_PER_MINUTE,
+    CRAWLER_MAX_PAGES,
+    CRAWLER_BUDGET_SHARE,
+    CRAWLER_HOT_REFRESH,
+    CRAWLER_COLD_REFRESH,
+    CRAWLER_HOT_MOVE,
+)
+from market_data import PAGE_SIZE, Coin, fetch_market_page
+from rate_limit import PRIORITY_BACKGROUND
+
+
+class _Page:
+    __slots__ = ("fetched_at", "coins", "hot")
+
+    def __init__(self, fetched_at: float, coins: list[Coin], hot: bool):
+        self.fetched_at = fetched_at
+        self.coins      = coins
+        self.hot        = hot
+
+
+def _is_hot(coins: list[Coin]) -> bool:
+    """A page is hot if anything on it moved at least CRAWLER_HOT_MOVE % in 24h."""
+    return any(abs(c.price_change_percentage_24h or 0.0) >= CRAWLER_HOT_MOVE for c in coins)
+
+
+class UniverseCrawler(threading.Thread):
+    """
+    Daemon thread that keeps every markets page (up to max_pages) reasonably fresh.
+    Unseen pages go first, in order; after that the page with the earliest due
+    time is refreshed next (hot pages are due after CRAWLER_HOT_REFRESH, the rest
+    after CRAWLER_COLD_REFRESH). Requests are spaced so the crawler never uses
+    more than `budget_share` of REQUESTS_PER_MINUTE, and they queue behind scans
+    and polls in the shared scheduler anyway.
+    """
+
+    def __init__(self, max_pages: int = CRAWLER_MAX_PAGES, budget_share: float = CRAWLER_BUDGET_SHARE):
+        super().__init__(name="universe-crawler", daemon=True)
+        self.max_pages   = max_pages
+        self._interval   = 60.0 / max(0.1, REQUESTS_PER_MINUTE * budget_share)
+        self._pages: dict[int, _Page] = {}
+        self._last_page  = max_pages           # shrinks once a short page marks the end
+        self._lock       = threading.Lock()
+        self._stop_evt   = threading.Event()
+        self._data_evt   = threading.Event()   # set once the first page has landed
+        self.last_error: str | None = None
+
+    # ── control ───────────────────────────────────────────────────
+    def stop(self) -> None:
+        self._stop_evt.set()
+
+    def wait_for_data(self, timeout: float | None = None) -> bool:
+        return self._data_evt.wait(timeout)
+
+    def run(self) -> None:
+        while not self._stop_evt.is_set():
+            page, due = self._next_page()
+            delay = due - time.time()
+            if delay > 0:
+                self._stop_evt.wait(min(delay, self._interval))
+                continue
+            self._crawl(page)
+            self._stop_evt.wait(self._interval)
+
+    # ── scheduling ────────────────────────────────────────────────
+    def _next_page(self) -> tuple[int, float]:
+        """(page, due_time) of the page to refresh next."""
+        with self._lock:
+            for page in range(1, self._last_page + 1):
+                if page not in self._pages:
+                    return page, 0.0
+            due = {
+                page: st.fetched_at + (CRAWLER_HOT_REFRESH if st.hot else CRAWLER_COLD_REFRESH)
+                for page, st in self._pages.items()
+            }
+        page = min(due, key=due.get)
+        return page, due[page]
+
+    def _crawl(self, page: int) -> None:
+        try:
+            coins = fetch_market_page(page, PRIORITY_BACKGROUND)
+        except Exception as e:
+            self.last_error = str(e)
+            return
+        self.last_error = None
+        with self._lock:
+            if len(coins) < PAGE_SIZE:
+                # End of the listed universe — forget anything past it
+                self._last_page = max(1, page if coins else page - 1)
+                for p in [p for p in self._pages if p > self._last_page]:
+                    del self._pages[p]
+            elif page == self._last_page and page < self.max_pages:
+                self._last_page += 1   # the universe grew past the old last page
+            if coins:
+                self._pages[page] = _Page(time.time(), coins, _is_hot(coins))
+        if coins:
+            self._data_evt.set()
+
+    # ── reading ───────────────────────────────────────────────────
+    def snapshot(self) -> list[Coin]:
+        """
+        Consistent merged view of the universe: one copy of every coin, taken from
+        the freshest page it appeared on (coins drift across page boundaries between
+        refreshes), in market-cap order. Copies, so callers may rank them freely.
+        """
+        with self._lock:
+            pages = sorted(self._pages.values(), key=lambda st: st.fetched_at, reverse=True)
+        seen: dict[str, Coin] = {}
+        for st in pages:
+            for c in st.coins:
+                if c.id and c.id not in seen:
+                    seen[c.id] = c
+        merged = sorted(seen.values(), key=lambda c: c.market_cap_rank or float("inf"))
+        return [c.copy() for c in merged]
+
+    def freshness(self) -> list[tuple[int, float, bool]]:
+        """Per page: (page, age_seconds, hot)."""
+        now = time.time()
+        with self._lock:
+            return [(p, now - st.fetched_at, st.hot) for p, st in sorted(self._pages.items())]
+
+    def status(self) -> dict:
+        fr = self.freshness()
+        with self._lock:
+            n_coins = sum(len(st.coins) for st in self._pages.values())
+        return {
+            "pages":      len(fr),
+            "last_page":  self._last_page,
+            "coins":      n_coins,
+            "hot":        sum(1 for _, _, hot in fr if hot),
+            "oldest_age": max((age for _, age, _ in fr), default=0.0),
+            "error":      self.last_error,
+        }
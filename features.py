@@ -0,0 +1,117 @@
+"""
+Multi-timeframe features from the 7-day hourly sparkline.
+Every coin's hourly prices go into one (coins × hours) matrix and each feature
+is a handful of whole-matrix operations, so a page or a 15k-coin universe costs
+about the same number of Python steps.
+
+Features (None when a coin has too little history):
+    ret_1h / ret_4h / ret_12h   % return over the last 1 / 4 / 12 hours
+    volatility                  realized volatility — std of hourly log returns, per day, in %
+    max_drawdown                largest peak-to-trough drop over the window, in %
+    rsi                         RSI over the last RSI_PERIOD hourly changes (simple-average / Cutler form)
+    breakout                    last price above the highest close of the prior BREAKOUT_HOURS
+
+NumPy is optional — without it no features are attached and feature factors
+score as missing data.
+"""
+
+import warnings
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import RSI_PERIOD, BREAKOUT_HOURS, FEATURE_WEIGHTS, FEATURE_RANGES
+import parallel
+
+HOURS         = 168   # CoinGecko's sparkline_in_7d: one price per hour for 7 days
+MIN_HISTORY   = 24    # points needed before volatility / drawdown / RSI mean anything
+FEATURE_NAMES = ("ret_1h", "ret_4h", "ret_12h", "volatility", "max_drawdown", "rsi", "breakout")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def scoring_factors(weights: dict[str, float] | None = None) -> list[tuple[str, float, float, float]]:
+    """(name, weight, lo, hi) for every feature with a non-zero weight in `weights` (default FEATURE_WEIGHTS)."""
+    weights = FEATURE_WEIGHTS if weights is None else weights
+    return [(name, weights[name], *FEATURE_RANGES[name]) for name in FEATURE_NAMES if weights.get(name)]
+
+
+def hourly_matrix(coins: list, hours: int = HOURS):
+    """
+    (len(coins), hours) float64 matrix of hourly prices, right-aligned so the
+    last column is the latest hour. Short series are NaN-padded on the left and
+    gaps inside a series are forward-filled.
+    """
+    m = np.full((len(coins), hours), np.nan)
+    for i, c in enumerate(coins):
+        h = c.get("hourly")
+        if not h:
+            continue
+        row = np.frombuffer(h, dtype=np.float32) if isinstance(h, array) else np.asarray(h, dtype=float)
+        row = row[-hours:]
+        m[i, hours - row.size:] = row
+    return fill_matrix(m)
+
+
+def fill_matrix(m):
+    """Copy of a right-aligned raw price matrix with non-positive prices as NaN and gaps forward-filled."""
+    m = np.array(m, dtype=float)
+    m[m <= 0] = np.nan
+    # Forward-fill: index of the latest non-NaN column at or before each position
+    idx = np.where(np.isnan(m), 0, np.arange(m.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return m[np.arange(len(m))[:, None], idx]
+
+
+def compute(m) -> dict:
+    """All features for a price matrix from hourly_matrix(); one float64 array per name, NaN = n/a."""
+    # Series are forward-filled and right-aligned, so enough points means the recent window is complete
+    enough = np.count_nonzero(~np.isnan(m), axis=1) >= MIN_HISTORY
+    last   = m[:, -1]
+    out: dict = {}
+
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN rows in nan-reductions
+
+        for h in (1, 4, 12):
+            out[f"ret_{h}h"] = (last / m[:, -1 - h] - 1.0) * 100.0
+
+        logret = np.diff(np.log(m), axis=1)
+        out["volatility"] = np.where(enough, np.nanstd(logret, axis=1) * np.sqrt(24.0) * 100.0, np.nan)
+
+        peak = np.fmax.accumulate(m, axis=1)
+        out["max_drawdown"] = np.where(enough, np.nanmax(1.0 - m / peak, axis=1) * 100.0, np.nan)
+
+        delta = np.diff(m[:, -(RSI_PERIOD + 1):], axis=1)
+        gain  = np.clip(delta, 0.0, None).mean(axis=1)
+        loss  = np.clip(-delta, 0.0, None).mean(axis=1)
+        rsi   = np.where(loss > 0, 100.0 - 100.0 / (1.0 + gain / loss), np.where(gain > 0, 100.0, 50.0))
+        out["rsi"] = np.where(enough, rsi, np.nan)
+
+        prior_high = np.nanmax(m[:, -(BREAKOUT_HOURS + 1):-1], axis=1)
+        out["breakout"] = np.where(enough, (last > prior_high).astype(float), np.nan)
+
+    return out
+
+
+def attach(coins: list) -> None:
+    """
+    Compute every feature for `coins` and store them on the coins (None = n/a).
+    Universe-sized batches are computed across the process pool (parallel.py).
+    """
+    if np is None or not coins:
+        return
+    feats = parallel.map_rows(compute, {"m": hourly_matrix(coins)}, FEATURE_NAMES)
+    for name in FEATURE_NAMES:
+        values = feats[name].tolist()
+        if name == "breakout":
+            for c, v in zip(coins, values):
+                c[name] = None if v != v else v > 0
+        else:
+            for c, v in zip(coins, values):
+                c[name] = None if v != v else v
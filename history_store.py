@@ -0,0 +1,237 @@
+"""
+Persistent score history.
+Scores from every scan go into an SQLite database (WAL mode) at
+HISTORY_DB_PATH: raw (coin, ts, score) rows keyed on (coin_id, ts) for
+HISTORY_RAW_RETENTION, plus hourly and daily rollups (count, mean, min, max,
+last) that are upserted in the same transaction and outlive the raw rows.
+Queries are index seeks on (coin_id, ts) / (coin_id, bucket), so their cost
+does not grow with the size of the history.
+
+Each thread gets its own connection: readers (the GUI, the price poller)
+never wait on a scan's insert, and writes are serialized by a lock.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import (
+    HISTORY_DB_PATH,
+    HISTORY_RAW_RETENTION,
+    HISTORY_HOURLY_RETENTION,
+    HISTORY_DAILY_RETENTION,
+    HISTORY_VELOCITY_WINDOW,
+)
+
+# Rollup tables and their bucket width / retention, finest first
+ROLLUPS: dict[str, tuple[int, float]] = {
+    "scores_1h": (3600,  HISTORY_HOURLY_RETENTION),
+    "scores_1d": (86400, HISTORY_DAILY_RETENTION),
+}
+_PRUNE_EVERY = 3600   # seconds between retention sweeps (run from record())
+_BATCH       = 500    # coin ids per IN (...) query
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    coin_id TEXT NOT NULL,
+    ts      REAL NOT NULL,
+    score   REAL NOT NULL,
+    PRIMARY KEY (coin_id, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_ts ON scores (ts);
+""" + "".join(f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    coin_id TEXT    NOT NULL,
+    bucket  INTEGER NOT NULL,
+    n       INTEGER NOT NULL,
+    total   REAL    NOT NULL,
+    lo      REAL    NOT NULL,
+    hi      REAL    NOT NULL,
+    last_ts REAL    NOT NULL,
+    last    REAL    NOT NULL,
+    PRIMARY KEY (coin_id, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {table}_bucket ON {table} (bucket);
+""" for table in ROLLUPS)
+
+_UPSERT = """
+INSERT INTO {table} (coin_id, bucket, n, total, lo, hi, last_ts, last) VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT (coin_id, bucket) DO UPDATE SET
+    n       = n + 1,
+    total   = total + excluded.total,
+    lo      = min(lo, excluded.lo),
+    hi      = max(hi, excluded.hi),
+    last    = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+    last_ts = max(last_ts, excluded.last_ts)
+"""
+
+
+class HistoryStore:
+    """
+    Score history for every coin ever scanned. record() takes a scan's coins
+    in one transaction; velocity(), latest() and history() read it back.
+    Safe to share across threads. If the database can't be opened, writes
+    are dropped, reads return nothing and last_error says why.
+    """
+
+    def __init__(self, path: Path | str = HISTORY_DB_PATH):
+        self.path       = Path(path)
+        self.last_error: str | None = None
+        self._local      = threading.local()
+        self._write_lock = threading.Lock()
+        self._pruned_at  = 0.0
+
+    # ── Connections ───────────────────────────────────────────────
+    def _conn(self) -> sqlite3.Connection | None:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+            except (OSError, sqlite3.Error) as e:
+                self.last_error = f"Score history unavailable: {e}"
+                return None
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _read(self, sql: str, args: tuple) -> list[tuple]:
+        conn = self._conn()
+        if conn is None:
+            return []
+        try:
+            return conn.execute(sql, args).fetchall()
+        except sqlite3.Error as e:
+            self.last_error = f"Score history read failed: {e}"
+            return []
+
+    # ── Writes ────────────────────────────────────────────────────
+    def record(self, coins: list[dict], ts: float | None = None) -> int:
+        """Store each coin's trend_score at `ts` (default now). Returns the number of rows written."""
+        ts   = time.time() if ts is None else ts
+        rows = [
+            (cid, ts, float(score)) for c in coins
+            if (cid := c.get("id")) and (score := c.get("trend_score")) is not None
+        ]
+        conn = self._conn()
+        if not rows or conn is None:
+            return 0
+        with self._write_lock:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT OR REPLACE INTO scores (coin_id, ts, score) VALUES (?, ?, ?)", rows)
+                for table, (width, _) in ROLLUPS.items():
+                    conn.executemany(
+                        _UPSERT.format(table=table),
+                        [(cid, int(t // width), s, s, s, t, s) for cid, t, s in rows],
+                    )
+                if ts - self._pruned_at >= _PRUNE_EVERY:
+                    self._prune(conn, ts)
+                    self._pruned_at = ts
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self.last_error = f"Score history write failed: {e}"
+                return 0
+        return len(rows)
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM scores WHERE ts < ?", (now - HISTORY_RAW_RETENTION,))
+        for table, (width, keep) in ROLLUPS.items():
+            conn.execute(f"DELETE FROM {table} WHERE bucket < ?", (int((now - keep) // width),))
+
+    # ── Reads ─────────────────────────────────────────────────────
+    def latest(self, cid: str) -> float | None:
+        """Most recent recorded score of `cid`."""
+        rows = self._read("SELECT score FROM scores WHERE coin_id = ? ORDER BY ts DESC LIMIT 1", (cid,))
+        if not rows:
+            rows = self._read("SELECT last FROM scores_1d WHERE coin_id = ? ORDER BY bucket DESC LIMIT 1", (cid,))
+        return rows[0][0] if rows else None
+
+    def recent(self, ids: list[str], since: float) -> dict[str, list[tuple[float, float]]]:
+        """
+        {coin_id: [(ts, score)] since `since`, oldest first} for many coins in a
+        few batched queries. A coin with no score that recent gets its latest one
+        alone (as latest() would); a coin never recorded is left out.
+        """
+        out: dict[str, list[tuple[float, float]]] = {}
+        ids = list(dict.fromkeys(ids))
+        for i in range(0, len(ids), _BATCH):
+            chunk = ids[i:i + _BATCH]
+            marks = ",".join("?" * len(chunk))
+            for cid, ts, score in self._read(
+                f"SELECT coin_id, ts, score FROM scores WHERE coin_id IN ({marks}) AND ts >= ? ORDER BY coin_id, ts",
+                (*chunk, since),
+            ):
+                out.setdefault(cid, []).append((ts, score))
+            # Older coins: newest raw row, else the newest daily rollup (max() picks the matching row)
+            for sql in (
+                "SELECT coin_id, max(ts), score FROM scores WHERE coin_id IN ({}) GROUP BY coin_id",
+                "SELECT coin_id, max(last_ts), last FROM scores_1d WHERE coin_id IN ({}) GROUP BY coin_id",
+            ):
+                rest = [cid for cid in chunk if cid not in out]
+                if not rest:
+                    break
+                for cid, ts, score in self._read(sql.format(",".join("?" * len(rest))), tuple(rest)):
+                    out[cid] = [(ts, score)]
+        return out
+
+    def velocity(self, cid: str, window: float = HISTORY_VELOCITY_WINDOW, now: float | None = None) -> float | None:
+        """Latest score minus the oldest one within `window` seconds before it; None with fewer than two."""
+        rows = self._read("SELECT ts, score FROM scores WHERE coin_id = ? ORDER BY ts DESC LIMIT 1", (cid,))
+        if not rows:
+            return None
+        last_ts, last = rows[0]
+        since = (last_ts if now is None else now) - window
+        first = self._read(
+            "SELECT ts, score FROM scores WHERE coin_id = ? AND ts >= ? ORDER BY ts LIMIT 1", (cid, since),
+        )
+        if not first or first[0][0] >= last_ts:
+            return None
+        return round(last - first[0][1], 4)
+
+    def history(
+        self, cid: str, since: float | None = None, until: float | None = None, resolution: str | None = None,
+    ) -> list[tuple[float, float]]:
+        """
+        [(ts, score)] of `cid`, oldest first. resolution "raw", "1h" or "1d"
+        (rollups give each bucket's start and mean score); default: the finest
+        one whose retention still covers `since`.
+        """
+        now   = time.time()
+        since = now - HISTORY_DAILY_RETENTION if since is None else since
+        until = now if until is None else until
+        if resolution is None:
+            resolution = (
+                "raw" if since >= now - HISTORY_RAW_RETENTION
+                else "1h" if since >= now - HISTORY_HOURLY_RETENTION
+                else "1d"
+            )
+        if resolution == "raw":
+            return self._read(
+                "SELECT ts, score FROM scores WHERE coin_id = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                (cid, since, until),
+            )
+        table = f"scores_{resolution}"
+        if table not in ROLLUPS:
+            raise ValueError(f"Unknown resolution {resolution!r} (raw, 1h or 1d)")
+        width = ROLLUPS[table][0]
+        return self._read(
+            f"SELECT bucket * {width}, total / n FROM {table} "
+            "WHERE coin_id = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+            (cid, int(since // width), int(until // width)),
+        )
+
+
+store = HistoryStore()
@@ -0,0 +1,122 @@
+"""
+On-disk cache for CoinGecko JSON responses.
+One file per (endpoint, params) under ~/.shitcoiner/cache, with a TTL and a
+stale-while-revalidate window per endpoint and ETag / Last-Modified validators
+so an expired entry can be refreshed with a cheap conditional request.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from config import CACHE_DIR, CACHE_TTLS
+
+
+class CacheEntry:
+    __slots__ = ("path", "body", "fetched_at", "etag", "last_modified")
+
+    def __init__(self, path: Path, body, fetched_at: float,
+                 etag: str | None = None, last_modified: str | None = None):
+        self.path          = path
+        self.body          = body
+        self.fetched_at    = fetched_at
+        self.etag          = etag
+        self.last_modified = last_modified
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def validators(self) -> dict[str, str]:
+        """Conditional-request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Endpoint-aware response cache. Endpoints not listed in `ttls` are never cached.
+    Counters: fresh hits, stale hits (served while revalidating), misses,
+    304 revalidations and writes.
+    """
+
+    def __init__(self, directory: Path = CACHE_DIR, ttls: dict | None = None):
+        self.directory = Path(directory)
+        self.ttls      = CACHE_TTLS if ttls is None else ttls
+        self.enabled   = True
+        self._lock     = threading.Lock()
+        self._stats    = {"hits": 0, "stale": 0, "misses": 0, "revalidated": 0, "stored": 0}
+
+    def policy(self, url: str) -> tuple[float, float]:
+        """(ttl, stale_window) seconds for this URL's endpoint; (0, 0) = uncached."""
+        path = urlparse(url).path
+        for endpoint, policy in self.ttls.items():
+            if path.endswith(endpoint):
+                return policy
+        return 0.0, 0.0
+
+    def _file(self, url: str, params: dict) -> Path:
+        u   = urlparse(url)   # host is part of the key so a replay server never mixes with live data
+        raw = json.dumps([u.netloc, u.path, sorted((k, str(v)) for k, v in params.items())])
+        return self.directory / (hashlib.sha1(raw.encode()).hexdigest() + ".json")
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def lookup(self, url: str, params: dict) -> CacheEntry | None:
+        """The stored entry for this request regardless of age, or None."""
+        if not self.enabled or self.policy(url)[0] <= 0:
+            return None
+        path = self._file(url, params)
+        try:
+            rec = json.loads(path.read_text())
+            return CacheEntry(path, rec["body"], rec["fetched_at"],
+                              rec.get("etag"), rec.get("last_modified"))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def store(self, url: str, params: dict, body,
+              etag: str | None = None, last_modified: str | None = None,
+              fetched_at: float | None = None) -> None:
+        if not self.enabled or self.policy(url)[0] <= 0:
+            return
+        path = self._file(url, params)
+        self._write(path, body, time.time() if fetched_at is None else fetched_at, etag, last_modified)
+        self.count("stored")
+
+    def refresh(self, entry: CacheEntry, fetched_at: float | None = None) -> None:
+        """Server answered 304 — the cached body is current again."""
+        self._write(entry.path, entry.body, time.time() if fetched_at is None else fetched_at,
+                    entry.etag, entry.last_modified)
+        self.count("revalidated")
+
+    def _write(self, path: Path, body, fetched_at: float,
+               etag: str | None, last_modified: str | None) -> None:
+        rec = {"fetched_at": fetched_at, "etag": etag, "last_modified": last_modified, "body": body}
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(rec, separators=(",", ":")))
+            os.replace(tmp, path)
+        except OSError:
+            pass   # a cache that can't write is just a slower cache
+
+    def clear(self) -> None:
+        for f in self.directory.glob("*.json"):
+            try:
+                f.unlink()
+            except OSError:
+                pass
@@ -6,9 +6,15 @@ Ranks micro/small-cap coins by momentum. Not financial advice.
 
 import argparse
 import sys
-from market_data import get_all_market_data, fetch_trending, RateLimitError
-from analysis    import rank_coins
-from config      import COINGECKO_TOP_N, BROWSER_TYPES
+import time
+from analysis    import ScoreAccumulator, IncrementalRanker, RankMove
+import archive
+import clusters
+import profiles
+from config      import (
+    COINGECKO_TOP_N, BROWSER_TYPES, CRAWLER_MAX_PAGES, LIVE_POLL_INTERVAL, LIVE_RANK_POLL,
+    CLUSTER_MOMENTUM_HOURS, RECORD_PATH,
+)
 
 
 def format_coin(c: dict, rank: int) -> str:
@@ -21,6 +27,8 @@ def format_coin(c: dict, rank: int) -> str:
     score    = c.get("trend_score", 0)
     mc_rank  = c.get("market_cap_rank") or "-"
     new_flag = " [NEW]" if c.get("_newly_listed") else ""
+    cluster  = c.get("cluster_id")
+    clu_flag = f" [C{cluster} {c['cluster_momentum']:+.0f}%]" if cluster is not None else ""
 
     price_str = f"${price:,.6f}"  if price is not None else "N/A"
     p24_str   = f"{p24:+.2f}%"   if p24  is not None else "N/A"
@@ -30,20 +38,43 @@ def format_coin(c: dict, rank: int) -> str:
     return (
         f"  {rank:3}. {sym:8} {name:18}{new_flag} "
         f"{price_str:14} 24h:{p24_str:9} 7d:{p7_str:9} "
-        f"v/mc:{vmr_str:6} score:{score:.3f} cap#{mc_rank}"
+        f"v/mc:{vmr_str:6} score:{score:.3f} cap#{mc_rank}{clu_flag}"
     )
 
 
-def run_scan(
-    top_n: int          = 20,
+def format_move(m: RankMove, ranker: IncrementalRanker) -> str:
+    c     = ranker.coin(m.id) or {}
+    sym   = (c.get("symbol") or m.id).upper()
+    old   = f"#{m.old_rank}" if m.old_rank else "—"
+    new   = f"#{m.new_rank}" if m.new_rank else "—"
+    arrow = "▲" if (m.new_rank or 10**9) < (m.old_rank or 10**9) else "▼"
+    o_sc  = f"{m.old_score:.3f}" if m.old_score is not None else "—"
+    n_sc  = f"{m.new_score:.3f}" if m.new_score is not None else "—"
+    return f"  {arrow} {sym:8} {old:>5} → {new:<5} score {o_sc} → {n_sc}"
+
+
+def collect_scan(
     fetch: int          | None = None,
     use_browser: bool   = True,
     exclude_blue_chips: bool = True,
-) -> list[dict]:
+    snapshot: list[dict] | None = None,
+) -> tuple[ScoreAccumulator, list[dict]]:
+    """
+    Stream the market pages into a ScoreAccumulator and gather the trending
+    signal; returns (accumulator, merged trending list). Every fetched coin is
+    also appended to `snapshot` if one is given.
+    """
+    from market_data import iter_market_data, fetch_trending
+
     fetch = fetch or COINGECKO_TOP_N
     warnings: list[str] = []
 
-    market_coins = get_all_market_data(top_n=fetch)
+    # Pages are filtered and range-tracked as they stream in; only the final sort waits
+    acc = ScoreAccumulator(exclude_blue_chips=exclude_blue_chips)
+    for page in iter_market_data(top_n=fetch):
+        acc.add(page)
+        if snapshot is not None:
+            snapshot.extend(page)
 
     trending: list[dict] = []
     try:
@@ -73,12 +104,55 @@ def run_scan(
     for w in warnings:
         print(w, file=sys.stderr)
 
-    ranked = rank_coins(
-        market_coins,
-        trending_coins=trending_merged or None,
-        exclude_blue_chips=exclude_blue_chips,
-    )
-    return ranked[:top_n]
+    return acc, trending_merged
+
+
+def run_scan(
+    top_n: int          = 20,
+    fetch: int          | None = None,
+    use_browser: bool   = True,
+    exclude_blue_chips: bool = True,
+    profile: str | None = None,
+) -> list[dict]:
+    acc, trending = collect_scan(fetch, use_browser, exclude_blue_chips)
+    return acc.rank(trending_coins=trending or None, top_k=top_n, profile=profiles.get(profile))
+
+
+def format_clusters(found: clusters.Clusters, limit: int = 5) -> list[str]:
+    """One line per co-movement cluster, hottest first."""
+    lines = []
+    for k in list(found.members)[:limit]:
+        ids = found.members[k]
+        more = f" +{len(ids) - 6} more" if len(ids) > 6 else ""
+        lines.append(f"  C{k:<3} {found.momentum[k]:+7.1f}%  ×{len(ids):<3} {', '.join(ids[:6])}{more}")
+    return lines
+
+
+def run_live(ranker: IncrementalRanker, top_n: int, interval: float = LIVE_POLL_INTERVAL) -> int:
+    """Poll prices for the best-ranked coins and print rank changes inside the top N until Ctrl-C."""
+    from market_data import fetch_simple_prices
+
+    print(f"Live re-ranking every {interval:g}s — Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(interval)
+            ids = [c["id"] for c in ranker.ranked(LIVE_RANK_POLL)]
+            try:
+                prices = fetch_simple_prices(ids)
+            except Exception as e:
+                print(f"Warning: price poll failed — {e}", file=sys.stderr)
+                continue
+            moves = [
+                m for m in ranker.update(prices)
+                if m.old_rank != m.new_rank and min(m.old_rank or top_n + 1, m.new_rank or top_n + 1) <= top_n
+            ]
+            if moves:
+                print(f"[{time.strftime('%H:%M:%S')}] {len(moves)} rank changes in the top {top_n}")
+                for m in moves:
+                    print(format_move(m, ranker))
+    except KeyboardInterrupt:
+        print()
+    return 0
 
 
 def main() -> int:
@@ -89,10 +163,22 @@ def main() -> int:
                         help="Show top N coins (default 20)")
     parser.add_argument("--fetch",               type=int,  default=COINGECKO_TOP_N,
                         help=f"Fetch N coins from API (default {COINGECKO_TOP_N})")
+    parser.add_argument("--universe",            action="store_true",
+                        help="Walk the whole CoinGecko universe (slow on the free tier; overrides --fetch)")
     parser.add_argument("--no-browser",          action="store_true",
                         help="Skip browser automation (API only)")
     parser.add_argument("--include-blue-chips",  action="store_true",
                         help="Include top-20 blue chips in results (hidden by default)")
+    parser.add_argument("--no-cache",            action="store_true",
+                        help="Ignore the local response cache and hit CoinGecko directly")
+    parser.add_argument("--record",              metavar="FILE", default=RECORD_PATH,
+                        help="Append every CoinGecko response to FILE for later replay (see replay.py; "
+                             "default $SHITCOINER_RECORD)")
+    parser.add_argument("--live",                action="store_true",
+                        help=f"After the scan, keep re-ranking from price polls every {LIVE_POLL_INTERVAL}s")
+    parser.add_argument("-p", "--profile",       action="append", metavar="NAME",
+                        help=f"Scan profile to rank by; repeat for several, or 'all' "
+                             f"(default {profiles.get().name}; have: {', '.join(profiles.names())})")
     parser.add_argument("--list-browsers",       action="store_true",
                         help="List supported browser types and exit")
     args = parser.parse_args()
@@ -101,15 +187,37 @@ def main() -> int:
         print("Supported browser types (Playwright):", ", ".join(BROWSER_TYPES))
         return 0
 
+    # Imported here, not at module level: process-pool workers re-import this module
+    import market_data
+    if args.universe:
+        args.fetch = CRAWLER_MAX_PAGES * market_data.PAGE_SIZE
+    market_data.cache.enabled = not args.no_cache
+    if args.record:
+        market_data.recorder.start(args.record)
+
+    try:
+        wanted = (
+            list(profiles.PROFILES.values()) if args.profile and "all" in (n.lower() for n in args.profile)
+            else [profiles.get(n) for n in args.profile or [None]]
+        )
+    except KeyError as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        return 2
+
     print(f"Fetching top {args.fetch} coins from CoinGecko...")
+    snapshot: list[dict] = []
     try:
-        top = run_scan(
-            top_n=args.top,
+        acc, trending = collect_scan(
             fetch=args.fetch,
             use_browser=not args.no_browser,
             exclude_blue_chips=not args.include_blue_chips,
+            snapshot=snapshot,
         )
-    except RateLimitError as e:
+        archive.archive_scan(snapshot, trending)
+        found = clusters.detect(snapshot)
+        found.tag(snapshot)
+        ranked = acc.rank_profiles(wanted, trending_coins=trending or None, top_k=args.top)
+    except market_data.RateLimitError as e:
         print(f"Rate limit: {e}", file=sys.stderr)
         return 1
     except Exception as e:
@@ -122,13 +230,27 @@ def main() -> int:
     print("   Blue chips (top 20 by market cap) are hidden. Use --include-blue-chips to show them.")
     print("=" * 95)
     print()
-    print(f"Top {len(top)} by shitcoin momentum score  [v/mc = vol/market-cap ratio]")
-    print()
-    for i, c in enumerate(top, 1):
-        print(format_coin(c, i))
+    for n, profile in enumerate(wanted):
+        if n:
+            print()
+        top   = ranked[profile.name]
+        label = f"  — profile {profile.name}" if len(wanted) > 1 or args.profile else ""
+        print(f"Top {len(top)} by shitcoin momentum score{label}  [v/mc = vol/market-cap ratio]")
+        print()
+        for i, c in enumerate(top, 1):
+            print(format_coin(c, i))
+    if found:
+        print()
+        print(f"Co-movement clusters ({len(found)} found, hottest first)  [mean member return over {CLUSTER_MOMENTUM_HOURS}h]")
+        for line in format_clusters(found):
+            print(line)
 
     from explainer import format_for_cli
     print(format_for_cli())
+
+    if args.live:
+        ranker = IncrementalRanker(snapshot, trending or None, not args.include_blue_chips, wanted[0])
+        return run_live(ranker, args.top)
     return 0
 
 
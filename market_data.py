@@ -1,27 +1,252 @@
 """Fetch crypto market data from CoinGecko API."""
 
+import heapq
+import threading
 import time
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable, Iterator
+
 import requests
-from config import COINGECKO_BASE, COINGECKO_TOP_N, REQUEST_TIMEOUT, RATE_LIMIT_WAIT, MAX_RETRIES
+from config import (
+    COINGECKO_BASE, COINGECKO_TOP_N, REQUEST_TIMEOUT, RATE_LIMIT_WAIT, MAX_RETRIES,
+    RATE_LIMIT_RETRIES, MAX_CONCURRENT_REQUESTS, SNAPSHOT_MAX_AGE,
+    SIMPLE_PRICE_BATCH, SIMPLE_PRICE_MAX_CHARS,
+)
+from http_cache import ResponseCache, CacheEntry
+from rate_limit import (
+    scheduler, retry_after_seconds, PRIORITY_SCAN, PRIORITY_POLL, PRIORITY_BACKGROUND,
+)
+from replay import recorder   # started by the CLI / GUI entry points (--record, SHITCOINER_RECORD)
+
+PAGE_SIZE = 250   # CoinGecko's max per_page for /coins/markets
+
+# Persistent response cache shared by every endpoint helper below
+cache = ResponseCache()
+
+# Shared pool for fan-out requests; bounded so a big --fetch can't stampede the API
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="coingecko")
 
 
 class RateLimitError(Exception):
     """Raised when CoinGecko returns 429 — caller should surface this to the user."""
 
 
-def _get(url: str, params: dict, attempt: int = 0) -> list | dict:
-    """GET with retry on transient errors; raises RateLimitError on 429."""
+class Coin:
+    """
+    Compact market record built at ingest — only the fields scoring, the GUI and
+    the CLI read, with the sparkline and the full hourly series packed into
+    array('f'). The feature and cluster fields are filled in later by
+    features.attach() and clusters.Clusters.tag().
+    Dict-compatible (get / [] / in / keys) so code written against raw CoinGecko
+    rows keeps working. As with a missing dict key, an unset (None) field falls
+    back to get()'s default. Keys outside FIELDS (e.g. _pixmap) go to an
+    overflow dict that is only created when first needed.
+    """
+
+    FIELDS = (
+        "id", "symbol", "name", "image",
+        "current_price", "market_cap", "market_cap_rank", "total_volume",
+        "price_change_percentage_24h", "price_change_percentage_7d",
+        "atl_date", "vol_mcap_ratio", "sparkline", "hourly",
+        "ret_1h", "ret_4h", "ret_12h", "volatility", "max_drawdown", "rsi", "breakout",
+        "cluster_id", "cluster_size", "cluster_momentum",
+        "trend_score", "rank",
+    )
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            object.__setattr__(self, name, None)
+        self._extra = None
+        for k, v in fields.items():
+            self[k] = v
+
+    def __getitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key in self.FIELDS:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        if key in self.FIELDS:
+            return getattr(self, key) is not None
+        return self._extra is not None and key in self._extra
+
+    def get(self, key: str, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def keys(self) -> list[str]:
+        ks = [k for k in self.FIELDS if getattr(self, k) is not None]
+        return ks + list(self._extra) if self._extra else ks
+
+    def items(self) -> list[tuple]:
+        return [(k, self.get(k)) for k in self.keys()]
+
+    def to_dict(self) -> dict:
+        d = dict(self.items())
+        for key in ("sparkline", "hourly"):
+            if d.get(key) is not None:
+                d[key] = list(d[key])
+        return d
+
+    def copy(self) -> "Coin":
+        c = Coin.__new__(Coin)
+        for name in self.FIELDS:
+            object.__setattr__(c, name, getattr(self, name))
+        c._extra = dict(self._extra) if self._extra else None
+        return c
+
+    def __repr__(self) -> str:
+        return f"Coin({self.id!r}, rank={self.market_cap_rank}, price={self.current_price})"
+
+
+class _SingleFlight:
+    """
+    Request coalescing. Concurrent callers asking for the same key share one
+    in-flight call; with `covers`, a caller can also join any in-flight call
+    whose key covers its own (e.g. a superset of simple/price ids).
+    Results are shared objects — callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable, covers: Callable[[Hashable], bool] | None = None):
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is None and covers is not None:
+                fut = next((f for k, f in self._calls.items() if covers(k)), None)
+            leader = fut is None
+            if leader:
+                fut = self._calls[key] = Future()
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_flight = _SingleFlight()
+
+# Latest /coins/markets pages fetched for a scan in this process, as the Coin records
+# the scan already holds: page -> (seen_at, coins). Entries older than SNAPSHOT_MAX_AGE
+# are dropped; background (crawler) pages aren't kept — the crawler has its own snapshot.
+_page_memory: dict[int, tuple[float, list[Coin]]] = {}
+_page_memory_lock = threading.Lock()
+
+
+def _params_key(params: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
+def _get(url: str, params: dict, priority: int = PRIORITY_SCAN) -> list | dict:
+    """
+    Every CoinGecko GET goes through here; in capture mode the response is
+    recorded under the time it was fetched from the API (not when it was served).
+    """
+    body, fetched_at = _get_cached(url, params, priority)
+    if recorder.active:
+        recorder.record(url, params, body, fetched_at)
+    return body
+
+
+def _get_cached(url: str, params: dict, priority: int) -> tuple[list | dict, float]:
+    """
+    Cached GET → (body, time it was fetched). Fresh entries are served from
+    disk; entries inside the stale window are served immediately while a
+    background call revalidates them; anything older goes to the network with
+    If-None-Match / If-Modified-Since.
+    """
+    entry = cache.lookup(url, params)
+    if entry is not None:
+        ttl, stale = cache.policy(url)
+        if entry.age < ttl:
+            cache.count("hits")
+            return entry.body, entry.fetched_at
+        if entry.age < ttl + stale:
+            cache.count("stale")
+            _revalidate_later(url, params)
+            return entry.body, entry.fetched_at
+    cache.count("misses")
+    return _flight.do((url, _params_key(params)), lambda: _fetch(url, params, priority, entry))
+
+
+_revalidating: set[tuple] = set()
+_revalidating_lock = threading.Lock()
+
+
+def _revalidate_later(url: str, params: dict) -> None:
+    """Refresh a stale entry in the background — at most one refresh per key at a time."""
+    key = (url, _params_key(params))
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+
+    def _run():
+        try:
+            # Re-read the entry: the copy handed to the caller may already be mutated
+            _fetch(url, params, PRIORITY_BACKGROUND, cache.lookup(url, params))
+        except Exception:
+            pass   # the stale copy already went out; the next call will try again
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(key)
+
+    _executor.submit(_run)
+
+
+def _fetch(url: str, params: dict, priority: int, entry: CacheEntry | None = None,
+           attempt: int = 0, throttled: int = 0) -> tuple[list | dict, float]:
+    """
+    Network GET through the shared request scheduler, with retry on transient errors.
+    Returns (body, time of the response), the same time the cache entry gets.
+    A 429 pauses every caller for Retry-After (or RATE_LIMIT_WAIT) and is retried;
+    RateLimitError is only raised once RATE_LIMIT_RETRIES are used up.
+    """
+    headers = entry.validators() if entry is not None else {}
+    scheduler.acquire(priority)
     try:
-        r = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        r = requests.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
     except requests.exceptions.Timeout:
         if attempt < MAX_RETRIES:
             time.sleep(2 ** attempt)
-            return _get(url, params, attempt + 1)
+            return _fetch(url, params, priority, entry, attempt + 1, throttled)
         raise RuntimeError("CoinGecko timed out — try again in a moment.")
     except requests.exceptions.ConnectionError:
         raise RuntimeError("Can't reach CoinGecko — check your internet connection.")
 
+    fetched_at = time.time()
+    if r.status_code == 304 and entry is not None:
+        cache.refresh(entry, fetched_at)
+        return entry.body, fetched_at
     if r.status_code == 429:
+        wait = retry_after_seconds(r.headers.get("Retry-After"))
+        scheduler.penalize(RATE_LIMIT_WAIT if wait is None else wait)
+        if throttled < RATE_LIMIT_RETRIES:
+            return _fetch(url, params, priority, entry, attempt, throttled + 1)
         raise RateLimitError(
             f"CoinGecko rate limit hit. Wait {RATE_LIMIT_WAIT} seconds and try again. "
             f"(The free API allows ~10-30 requests/minute.)"
@@ -29,11 +254,23 @@ def _get(url: str, params: dict, attempt: int = 0) -> list | dict:
     if r.status_code >= 500:
         if attempt < MAX_RETRIES:
             time.sleep(3 * (attempt + 1))
-            return _get(url, params, attempt + 1)
+            return _fetch(url, params, priority, entry, attempt + 1, throttled)
         raise RuntimeError(f"CoinGecko server error ({r.status_code}) — try again shortly.")
 
     r.raise_for_status()
-    return r.json()
+    body = r.json()
+    cache.store(url, params, body, r.headers.get("ETag"), r.headers.get("Last-Modified"), fetched_at)
+    return body, fetched_at
+
+
+def request_budget() -> dict:
+    """How much of the shared CoinGecko budget is left — see RequestScheduler.budget()."""
+    return scheduler.budget()
+
+
+def cache_stats() -> dict:
+    """Hit / stale / miss / 304 / write counters for the response cache."""
+    return cache.stats()
 
 
 def _downsample(prices: list[float], n: int = 48) -> list[float]:
@@ -46,46 +283,157 @@ def _downsample(prices: list[float], n: int = 48) -> list[float]:
     return [prices[int(i * step)] for i in range(n)]
 
 
-def fetch_coins_market(per_page: int = 250, page: int = 1, sparkline: bool = True) -> list[dict]:
-    """Fetch market data for coins ordered by market cap descending."""
-    url = f"{COINGECKO_BASE}/coins/markets"
-    params = {
+def _markets_params(per_page: int, page: int, sparkline: bool) -> dict:
+    return {
         "vs_currency": "usd",
         "order": "market_cap_desc",
-        "per_page": min(per_page, 250),
+        "per_page": min(per_page, PAGE_SIZE),
         "page": page,
         "sparkline": sparkline,
         "price_change_percentage": "24h,7d",
     }
-    return _get(url, params)
 
 
-def fetch_trending() -> list[dict]:
+def fetch_coins_market(
+    per_page: int = PAGE_SIZE,
+    page: int = 1,
+    sparkline: bool = True,
+    priority: int = PRIORITY_SCAN,
+) -> list[dict]:
+    """Fetch market data for coins ordered by market cap descending."""
+    url    = f"{COINGECKO_BASE}/coins/markets"
+    params = _markets_params(per_page, page, sparkline)
+    return _get(url, params, priority)
+
+
+def _remember_page(page: int, coins: list[Coin]) -> None:
+    now = time.time()
+    with _page_memory_lock:
+        for p in [p for p, (seen_at, _) in _page_memory.items() if now - seen_at >= SNAPSHOT_MAX_AGE]:
+            del _page_memory[p]
+        _page_memory[page] = (now, coins)
+
+
+def _fresh_page(pages: dict, page: int, max_age: float) -> list[dict] | None:
+    """A full-size markets page younger than max_age, from memory or else the disk cache."""
+    seen_at, rows = pages.get(page, (0.0, None))
+    if rows is not None and time.time() - seen_at < max_age:
+        return rows
+    url = f"{COINGECKO_BASE}/coins/markets"
+    for sparkline in (True, False):
+        entry = cache.lookup(url, _markets_params(PAGE_SIZE, page, sparkline))
+        if entry is not None and entry.age < max_age:
+            return entry.body
+    return None
+
+
+def latest_snapshot(max_age: float = SNAPSHOT_MAX_AGE) -> list[dict]:
+    """
+    Market rows already on hand, no network: the longest run of consecutive fresh
+    pages starting at page 1 (Coin records from memory first, then raw rows from the
+    disk cache). Empty if nothing is fresh. Rows are shared — don't mutate.
+    """
+    with _page_memory_lock:
+        pages = dict(_page_memory)
+
+    rows_out: list[dict] = []
+    page = 1
+    while (rows := _fresh_page(pages, page, max_age)) is not None:
+        rows_out.extend(rows)
+        if len(rows) < PAGE_SIZE:
+            break
+        page += 1
+    return rows_out
+
+
+def fetch_trending(priority: int = PRIORITY_SCAN) -> list[dict]:
     """Fetch trending coins from CoinGecko search trends."""
     url = f"{COINGECKO_BASE}/search/trending"
-    data = _get(url, {})
+    data = _get(url, {}, priority)
     return data.get("coins", [])[:20]
 
 
-def fetch_simple_prices(ids: list[str]) -> dict[str, dict]:
-    """
-    Lightweight price fetch for a list of coin IDs.
-    Returns {coin_id: {current_price, price_change_percentage_24h, market_cap, total_volume, vol_mcap_ratio}}.
-    Used for real-time watchlist polling — much cheaper than a full scan.
-    """
-    if not ids:
-        return {}
+def _price_batches(ids: list[str]) -> list[tuple[str, ...]]:
+    """Split ids into batches bounded by both count and joined length."""
+    batches: list[tuple[str, ...]] = []
+    batch: list[str] = []
+    chars = 0
+    for cid in ids:
+        if batch and (len(batch) >= SIMPLE_PRICE_BATCH or chars + 1 + len(cid) > SIMPLE_PRICE_MAX_CHARS):
+            batches.append(tuple(batch))
+            batch, chars = [], 0
+        chars += len(cid) + (1 if batch else 0)
+        batch.append(cid)
+    if batch:
+        batches.append(tuple(batch))
+    return batches
+
+
+def _fetch_price_batch(batch: tuple[str, ...], priority: int) -> dict:
+    """One /simple/price call; joins an in-flight call that already covers these ids."""
+    wanted = frozenset(batch)
     url = f"{COINGECKO_BASE}/simple/price"
     params = {
-        "ids": ",".join(ids),
+        "ids": ",".join(batch),
         "vs_currencies": "usd",
         "include_24hr_change": "true",
         "include_market_cap": "true",
         "include_24hr_vol": "true",
     }
-    raw = _get(url, params)
+    return _flight.do(
+        ("simple/price", wanted),
+        lambda: _get(url, params, priority),
+        covers=lambda k: k[0] == "simple/price" and wanted <= k[1],
+    )
+
+
+def fetch_simple_prices(ids: list[str], priority: int = PRIORITY_POLL) -> dict[str, dict]:
+    """
+    Lightweight price fetch for a list of coin IDs.
+    Returns {coin_id: {current_price, price_change_percentage_24h, market_cap, total_volume, vol_mcap_ratio}}.
+    Used for real-time watchlist polling — much cheaper than a full scan.
+    Large id lists are de-duplicated, split into bounded batches and fetched
+    concurrently; a failed batch is retried on its own, and only if every batch
+    fails is the error raised. Ids from a batch that still fails are simply absent.
+    """
+    ids = list(dict.fromkeys(cid for cid in ids if cid))
+    if not ids:
+        return {}
+    batches = _price_batches(ids)
+
+    raw: dict[str, dict] = {}
+    failed: list[tuple[str, ...]] = []
+    if len(batches) == 1:
+        try:
+            raw.update(_fetch_price_batch(batches[0], priority))
+        except RateLimitError:
+            raise
+        except Exception:
+            failed.append(batches[0])
+    else:
+        futures = [(b, _executor.submit(_fetch_price_batch, b, priority)) for b in batches]
+        for b, fut in futures:
+            try:
+                raw.update(fut.result())
+            except RateLimitError:
+                raise
+            except Exception:
+                failed.append(b)
+
+    last_error: Exception | None = None
+    for b in failed:
+        try:
+            raw.update(_fetch_price_batch(b, priority))
+        except Exception as e:
+            last_error = e
+    if last_error is not None and not raw:
+        raise last_error
+
+    wanted = set(ids)
     result: dict[str, dict] = {}
     for cid, data in raw.items():
+        if cid not in wanted:
+            continue
         mcap = data.get("usd_market_cap") or 0
         vol  = data.get("usd_24h_vol") or 0
         result[cid] = {
@@ -98,49 +446,122 @@ def fetch_simple_prices(ids: list[str]) -> dict[str, dict]:
     return result
 
 
-def fetch_gainers_losers() -> tuple[list[dict], list[dict]]:
-    """Top gainers and losers by 24h % from the first 100 by market cap."""
-    markets = fetch_coins_market(per_page=100, sparkline=False)
+def fetch_gainers_losers(
+    k: int = 15,
+    priority: int = PRIORITY_BACKGROUND,
+    max_age: float = SNAPSHOT_MAX_AGE,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Top-k gainers and losers by 24h % across every coin in the latest snapshot
+    (a scan's pages, cached pages, ...). Only when nothing recent is on hand is
+    a single markets page fetched. Single-pass heap selection: O(n log k).
+    """
+    markets = latest_snapshot(max_age)
+    if not markets:
+        markets = fetch_coins_market(per_page=PAGE_SIZE, sparkline=False, priority=priority)
+
+    def pct(m: dict) -> float:
+        return m["price_change_percentage_24h"]
+
     with_pct = [m for m in markets if m.get("price_change_percentage_24h") is not None]
-    by_24h   = sorted(with_pct, key=lambda x: x["price_change_percentage_24h"], reverse=True)
-    gainers  = by_24h[:15]
-    losers   = sorted(by_24h[-15:], key=lambda x: x["price_change_percentage_24h"])
+    gainers  = heapq.nlargest(k, with_pct, key=pct)
+    losers   = heapq.nsmallest(k, with_pct, key=pct)
     return gainers, losers
 
 
-def get_all_market_data(top_n: int | None = None) -> list[dict]:
+def _normalize_coin(raw: dict) -> Coin:
     """
-    Aggregate market data across multiple pages.
-    Fetches sparkline (7d hourly prices) and downsamples for charting.
-    Pre-computes vol_mcap_ratio for the scorer.
+    Per-coin ingest step: project the raw row onto a Coin, keep the hourly
+    series for the feature engine, downsample the sparkline for charting and
+    pre-compute vol_mcap_ratio for the scorer.
     """
-    top_n     = top_n or COINGECKO_TOP_N
-    all_coins: list[dict] = []
-    page      = 1
+    # Extract the hourly series (gaps kept as NaN) and downsample it for the sparkline
+    sp = raw.get("sparkline_in_7d")
+    if sp and isinstance(sp.get("price"), list):
+        hourly    = array("f", (float("nan") if p is None else p for p in sp["price"]))
+        prices    = [p for p in sp["price"] if p is not None]
+        sparkline = array("f", _downsample(prices))
+    else:
+        hourly    = array("f")
+        sparkline = array("f")
 
-    while len(all_coins) < top_n:
-        chunk = fetch_coins_market(per_page=250, page=page, sparkline=True)
-        if not chunk:
-            break
-        all_coins.extend(chunk)
-        if len(chunk) < 250:
-            break
-        page += 1
+    # Pre-compute vol/market-cap ratio
+    vol  = raw.get("total_volume") or 0
+    mcap = raw.get("market_cap") or 0
 
-    coins = all_coins[:top_n]
+    # With price_change_percentage=24h,7d the 7d figure arrives as *_in_currency
+    pct_7d = raw.get("price_change_percentage_7d")
+    if pct_7d is None:
+        pct_7d = raw.get("price_change_percentage_7d_in_currency")
 
-    for c in coins:
-        # Extract and downsample sparkline
-        sp = c.pop("sparkline_in_7d", None)
-        if sp and isinstance(sp.get("price"), list):
-            raw = [p for p in sp["price"] if p is not None]
-            c["sparkline"] = _downsample(raw)
-        else:
-            c["sparkline"] = []
+    return Coin(
+        id=raw.get("id"),
+        symbol=raw.get("symbol"),
+        name=raw.get("name"),
+        image=raw.get("image"),
+        current_price=raw.get("current_price"),
+        market_cap=raw.get("market_cap"),
+        market_cap_rank=raw.get("market_cap_rank"),
+        total_volume=raw.get("total_volume"),
+        price_change_percentage_24h=raw.get("price_change_percentage_24h"),
+        price_change_percentage_7d=pct_7d,
+        atl_date=raw.get("atl_date"),
+        vol_mcap_ratio=(vol / mcap) if mcap > 0 else 0.0,
+        sparkline=sparkline,
+        hourly=hourly,
+    )
 
-        # Pre-compute vol/market-cap ratio
-        vol  = c.get("total_volume") or 0
-        mcap = c.get("market_cap") or 0
-        c["vol_mcap_ratio"] = (vol / mcap) if mcap > 0 else 0.0
 
+def fetch_market_page(page: int, priority: int = PRIORITY_SCAN) -> list[Coin]:
+    """Fetch + normalize one full page of the market-cap ordered universe."""
+    rows  = fetch_coins_market(per_page=PAGE_SIZE, page=page, sparkline=True, priority=priority)
+    coins = [_normalize_coin(r) for r in rows]
+    if priority != PRIORITY_BACKGROUND:
+        _remember_page(page, coins)
+    return coins
+
+
+def iter_market_data(top_n: int | None = None, priority: int = PRIORITY_SCAN) -> Iterator[list[Coin]]:
+    """
+    Stream normalized coins page by page, in market-cap order, as pages arrive.
+    At most MAX_CONCURRENT_REQUESTS pages are downloading or waiting to be
+    consumed at once, so memory stays bounded however large top_n gets and the
+    consumer can score page 1 while later pages are still in flight.
+    """
+    top_n   = top_n or COINGECKO_TOP_N
+    n_pages = -(-top_n // PAGE_SIZE)
+
+    window: deque[Future] = deque()
+    next_page = 1
+    while next_page <= n_pages and len(window) < MAX_CONCURRENT_REQUESTS:
+        window.append(_executor.submit(fetch_market_page, next_page, priority))
+        next_page += 1
+
+    remaining = top_n
+    try:
+        while window:
+            coins = window.popleft().result()
+            if next_page <= n_pages and len(coins) == PAGE_SIZE:
+                window.append(_executor.submit(fetch_market_page, next_page, priority))
+                next_page += 1
+            if coins:
+                yield coins[:remaining]
+                remaining -= len(coins)
+            if len(coins) < PAGE_SIZE or remaining <= 0:
+                break   # ran off the end of the listed universe — later pages are empty
+    finally:
+        for fut in window:
+            fut.cancel()
+
+
+def get_all_market_data(top_n: int | None = None, priority: int = PRIORITY_SCAN) -> list[Coin]:
+    """
+    Aggregate market data across multiple pages.
+    Pages are requested concurrently and reassembled in market-cap order.
+    Fetches sparkline (7d hourly prices) and downsamples for charting.
+    Pre-computes vol_mcap_ratio for the scorer.
+    """
+    coins: list[Coin] = []
+    for page in iter_market_data(top_n, priority):
+        coins.extend(page)
     return coins
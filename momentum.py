@@ -0,0 +1,195 @@
+"""
+Rolling score momentum per coin.
+Each coin keeps its latest MOMENTUM_WINDOW (ts, score) pairs in an array-backed
+ring together with running sums of t, t², t³, t⁴, s, t·s and t²·s, so a new
+score updates the time-aware EMA, the least-squares slope (score per hour) and
+the acceleration (curvature of the least-squares parabola, score per hour²) in
+O(1) — however far apart the scans are. Scores older than MOMENTUM_MAX_AGE
+relative to the newest leave the fit.
+
+Writers serialize on the tracker's lock; after each update the coin's
+MomentumStats (an immutable tuple) is swapped in whole, so readers — the GUI
+thread, the price poller — look it up without any lock.
+"""
+
+import threading
+from array import array
+from typing import Callable, Iterable, NamedTuple
+
+from config import MOMENTUM_WINDOW, MOMENTUM_MAX_AGE, MOMENTUM_EMA_HALF_LIFE
+
+
+class MomentumStats(NamedTuple):
+    t:     float          # time of the latest score
+    score: float          # latest score
+    ema:   float          # time-aware exponential moving average of the score
+    slope: float | None   # least-squares score change per hour (None with < 2 distinct times)
+    accel: float | None   # change of that slope per hour (None with < 3 distinct times)
+    n:     int            # scores in the fit
+    span:  float          # hours between the oldest and newest score in the fit
+
+
+class _Ring:
+    """Fixed-capacity (t, s) ring plus the power sums of the points it holds; t in hours from `origin`."""
+
+    __slots__ = ("t", "s", "head", "n", "origin", "since_rebase", "sums", "ema", "last_t")
+
+    def __init__(self, capacity: int):
+        self.t            = array("d", bytes(8 * capacity))
+        self.s            = array("d", bytes(8 * capacity))
+        self.head         = 0      # index of the oldest point
+        self.n            = 0
+        self.origin       = None   # epoch seconds that t = 0 stands for
+        self.since_rebase = 0
+        self.sums         = [0.0] * 7   # Σt Σt² Σt³ Σt⁴ Σs Σts Σt²s
+        self.ema          = None
+        self.last_t       = None
+
+    def _add(self, t: float, s: float, sign: float) -> None:
+        t2 = t * t
+        sm = self.sums
+        sm[0] += sign * t
+        sm[1] += sign * t2
+        sm[2] += sign * t2 * t
+        sm[3] += sign * t2 * t2
+        sm[4] += sign * s
+        sm[5] += sign * t * s
+        sm[6] += sign * t2 * s
+
+    def _rebase(self) -> None:
+        """Re-anchor t at the oldest point and recompute the sums exactly (bounds float drift)."""
+        cap  = len(self.t)
+        idx  = [(self.head + i) % cap for i in range(self.n)]
+        base = self.t[idx[0]] if idx else 0.0
+        self.origin += base * 3600.0
+        self.sums = [0.0] * 7
+        for i in idx:
+            self.t[i] -= base
+            self._add(self.t[i], self.s[i], 1.0)
+        self.since_rebase = 0
+
+    def push(self, ts: float, score: float, max_age: float, half_life: float) -> bool:
+        """Add a score; False (ignored) unless it is newer than the newest one."""
+        if self.last_t is not None and ts <= self.last_t:
+            return False
+        if self.origin is None:
+            self.origin = ts
+        cap = len(self.t)
+        t   = (ts - self.origin) / 3600.0
+        if self.n == cap:                                   # full: the oldest point makes room
+            self._add(self.t[self.head], self.s[self.head], -1.0)
+            self.head = (self.head + 1) % cap
+            self.n   -= 1
+        i = (self.head + self.n) % cap
+        self.t[i], self.s[i] = t, score
+        self.n += 1
+        self._add(t, score, 1.0)
+        while self.n > 1 and t - self.t[self.head] > max_age / 3600.0:   # aged out
+            self._add(self.t[self.head], self.s[self.head], -1.0)
+            self.head = (self.head + 1) % cap
+            self.n   -= 1
+
+        if self.ema is None:
+            self.ema = score
+        else:
+            self.ema += (1.0 - 0.5 ** ((ts - self.last_t) / half_life)) * (score - self.ema)
+        self.last_t = ts
+
+        self.since_rebase += 1
+        if self.since_rebase >= cap:
+            self._rebase()
+        return True
+
+    def stats(self) -> MomentumStats:
+        n = self.n
+        st, st2, st3, st4, ss, sts, st2s = self.sums
+        oldest = self.t[self.head]
+        newest = self.t[(self.head + n - 1) % len(self.t)]
+
+        slope = accel = None
+        den = n * st2 - st * st
+        if n >= 2 and den > 1e-12 * max(1.0, n * st2):
+            slope = (n * sts - st * ss) / den
+        if n >= 3:
+            # Normal equations of s ≈ a·t² + b·t + c; accel = 2a (Cramer's rule)
+            det = st4 * (st2 * n - st * st) - st3 * (st3 * n - st * st2) + st2 * (st3 * st - st2 * st2)
+            if abs(det) > 1e-9 * max(1.0, st4 * st2 * n):
+                num = st2s * (st2 * n - st * st) - st3 * (sts * n - st * ss) + st2 * (sts * st - st2 * ss)
+                accel = 2.0 * num / det
+        return MomentumStats(
+            self.last_t, self.s[(self.head + n - 1) % len(self.t)], self.ema, slope, accel, n, newest - oldest,
+        )
+
+
+class MomentumTracker:
+    """Per-coin rolling momentum. record() / seed() write; get() is lock-free."""
+
+    def __init__(
+        self,
+        window: int = MOMENTUM_WINDOW,
+        max_age: float = MOMENTUM_MAX_AGE,
+        half_life: float = MOMENTUM_EMA_HALF_LIFE,
+    ):
+        self.window    = window
+        self.max_age   = max_age
+        self.half_life = half_life
+        self._rings: dict[str, _Ring] = {}
+        self._stats: dict[str, MomentumStats] = {}
+        self._seeded: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def _push(self, cid: str, ts: float, score: float) -> None:
+        ring = self._rings.get(cid)
+        if ring is None:
+            ring = self._rings[cid] = _Ring(self.window)
+        if ring.push(ts, score, self.max_age, self.half_life):
+            self._stats[cid] = ring.stats()
+
+    def record(self, coins: Iterable[dict], ts: float, loader: Callable[[str], list] | None = None) -> None:
+        """Add each coin's trend_score at `ts`; coins new to the tracker are seeded from `loader` first (see get())."""
+        with self._lock:
+            for c in coins:
+                cid   = c.get("id")
+                score = c.get("trend_score")
+                if not cid or score is None:
+                    continue
+                if loader is not None and cid not in self._seeded:
+                    self._seed(cid, loader(cid))
+                self._push(cid, ts, float(score))
+
+    def unseeded(self, ids: Iterable[str]) -> list[str]:
+        """The coins among `ids` whose history has not been loaded yet this session."""
+        return [cid for cid in ids if cid not in self._seeded]
+
+    def seed_many(self, ids: Iterable[str], points: dict[str, list[tuple[float, float]]]) -> None:
+        """seed() each of `ids` from points[cid] (coins without history are marked seeded too)."""
+        with self._lock:
+            for cid in ids:
+                self._seed(cid, points.get(cid, ()))
+
+    def seed(self, cid: str, points: Iterable[tuple[float, float]]) -> None:
+        """Load earlier (ts, score) history for a coin, oldest first; points not newer than its latest are skipped."""
+        with self._lock:
+            self._seed(cid, points)
+
+    def _seed(self, cid: str, points: Iterable[tuple[float, float]]) -> None:
+        self._seeded.add(cid)
+        for ts, score in points:
+            self._push(cid, ts, score)
+
+    def get(self, cid: str, loader: Callable[[str], list] | None = None) -> MomentumStats | None:
+        """
+        The coin's latest stats. With `loader`, a coin not yet seen this session is
+        first seeded from loader(cid) → [(ts, score)] (once per coin).
+        """
+        stats = self._stats.get(cid)
+        if stats is None and loader is not None and cid not in self._seeded:
+            self.seed(cid, loader(cid))
+            stats = self._stats.get(cid)
+        return stats
+
+
+tracker = MomentumTracker()
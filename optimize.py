@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Search scoring weights against recorded market snapshots.
+
+The factor matrix of every snapshot is built once (backtest.factor_matrix) and
+padded into a (snapshots × coins × factors) block, so a whole batch of
+candidate weight vectors scores every snapshot in one matrix multiply; each
+snapshot's top k then comes from a partition instead of a sort. Candidate
+batches are spread over the parallel.py process pool with the block in shared
+memory. The search keeps the latest OPTIMIZE_HOLDOUT of the snapshots out and
+reports the winner on them next to the base profile, then saves the winner as
+a named profile in USER_PROFILES_PATH.
+
+    python optimize.py capture.jsonl [more.jsonl ...] | --archive [--days N]  [--search grid|random|halving]
+                       [--factors pct_24h,vmr,...] [--horizon 4h] [--top 20] [--name OPTIMIZED]
+
+Searched factors share the weight the base profile gives them (1.0 if none),
+so a search over the five config weights keeps them summing to 1.00. Coins
+tied with the k-th score all count as picks. Needs NumPy.
+"""
+
+import argparse
+import itertools
+import math
+import sys
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import (
+    PARALLEL_WORKERS,
+    USER_PROFILES_PATH,
+    OPTIMIZE_HORIZON,
+    OPTIMIZE_CANDIDATES,
+    OPTIMIZE_GRID_STEP,
+    OPTIMIZE_HALVING,
+    OPTIMIZE_HOLDOUT,
+    BACKTEST_TOP_K,
+)
+import backtest
+import parallel
+import profiles
+import scoring_engine
+from profiles import ScanProfile, DEFAULT_WEIGHTS
+
+# The hand-picked config weights: WEIGHT_PRICE_CHANGE_24H … WEIGHT_MARKET_CAP_RANK
+DEFAULT_FACTORS = ("pct_24h", "vmr", "trending", "pct_7d", "mcap_rank")
+
+_BLOCK_ELEMENTS = 1 << 22   # snapshot × coin × candidate scores held at once per worker (16 MB)
+_MIN_RUNG       = 24        # fewest snapshots successive halving judges a candidate on
+
+
+class Problem(NamedTuple):
+    factors: list[str]   # searched factors, in weight-vector order
+    arrays:  dict        # F (S, N, m) factor values; base (S, N) fixed score part, NaN = not scored;
+                         # outcome (S, N, 3) forward return / went up / return known — all float32
+    times:   object      # (S,) snapshot times
+    k:       int
+
+
+class Stats(NamedTuple):
+    mean:  object   # (C,) mean forward return of the picks, %
+    hit:   object   # (C,) share of picks that went up
+    picks: object   # (C,) picks with a known forward return
+
+
+def build_problem(
+    series: backtest.SnapshotSeries,
+    base: ScanProfile,
+    factors: list[str],
+    horizon: float,
+    k: int,
+) -> Problem:
+    """Pad the series into per-snapshot blocks; factors `base` weights but the search doesn't are folded into `base`."""
+    fixed_names = [f for f, w in base.weights.items() if w and f not in factors]
+    F, _        = backtest.factor_matrix(series, base, list(factors) + fixed_names)
+    fixed       = F[:, len(factors):] @ np.array([base.weights[f] for f in fixed_names]) if fixed_names else 0.0
+    keep        = scoring_engine.filter_mask(series.cols, base.blue_chips_excluded(True), base.max_rank)
+    ret         = backtest.row_forward_returns(series, horizon)
+    known       = ~np.isnan(ret)
+
+    snap, n_max = series.snap, int(np.diff(series.offsets).max(initial=0))
+    pos         = np.arange(series.rows) - series.offsets[snap]
+    S           = len(series)
+    padded_F    = np.zeros((S, n_max, len(factors)), dtype=np.float32)
+    padded_base = np.full((S, n_max), np.nan, dtype=np.float32)
+    outcome     = np.zeros((S, n_max, 3), dtype=np.float32)
+    padded_F[snap, pos]    = F[:, :len(factors)]
+    padded_base[snap, pos] = np.where(keep, fixed, np.nan)
+    outcome[snap, pos]     = np.stack([np.where(known, ret, 0.0), ret > 0, known], axis=1)
+    return Problem(list(factors), {"F": padded_F, "base": padded_base, "outcome": outcome}, series.times, k)
+
+
+def evaluate(F, base, outcome, weights, snaps, k: int):
+    """
+    (C, 3) sums of forward return, went-up and return-known over the top-k
+    picks of each candidate row of `weights` in the snapshots `snaps`.
+    Module-level so parallel.map_shared workers can run it.
+    """
+    weights = np.asarray(weights, dtype=np.float32)
+    C, N    = len(weights), F.shape[1]
+    kk      = min(k, N)
+    out     = np.zeros((C, 3))
+    step    = max(1, _BLOCK_ELEMENTS // max(1, N * C))
+    for i in range(0, len(snaps), step):
+        s  = snaps[i:i + step]
+        sc = np.matmul(F[s], weights.T)                       # (b, N, C)
+        sc += base[s][:, :, None]
+        np.clip(sc, 0.0, 1.0, out=sc)
+        sc = np.ascontiguousarray(sc.transpose(0, 2, 1))      # (b, C, N)
+        np.nan_to_num(sc, copy=False, nan=-1.0)               # filtered / padding rows
+        kth  = np.partition(sc, N - kk, axis=-1)[..., N - kk:N - kk + 1]
+        pick = ((sc >= kth) & (sc >= 0.0)).astype(np.float32)
+        out += np.matmul(pick, outcome[s]).sum(axis=0)       # (b, C, 3) → (C, 3)
+    return out
+
+
+def evaluate_all(problem: Problem, weights, snaps) -> Stats:
+    """evaluate() for every candidate, in chunks across the process pool."""
+    weights = np.asarray(weights, dtype=np.float32)
+    chunks  = max(1, min(len(weights), 2 * PARALLEL_WORKERS))
+    tasks   = [
+        {"weights": w, "snaps": np.asarray(snaps), "k": problem.k}
+        for w in np.array_split(weights, chunks) if len(w)
+    ]
+    N, m    = problem.arrays["F"].shape[1:]
+    work    = len(snaps) * N * m * len(weights)
+    sums    = np.concatenate(parallel.map_shared(evaluate, problem.arrays, tasks, work))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return Stats(sums[:, 0] / sums[:, 2], sums[:, 1] / sums[:, 2], sums[:, 2])
+
+
+def objective(stats: Stats, metric: str):
+    values = stats.hit if metric == "hit" else stats.mean
+    return np.where(stats.picks > 0, values, -np.inf)
+
+
+# ── Candidates ────────────────────────────────────────────────────
+def grid_candidates(m: int, total: float, step: float = OPTIMIZE_GRID_STEP):
+    """Every split of `total` over m factors in multiples of `step` (stars and bars)."""
+    units = max(1, round(total / step))
+    rows  = []
+    for bars in itertools.combinations(range(units + m - 1), m - 1):
+        edges = (-1, *bars, units + m - 1)
+        rows.append([edges[i + 1] - edges[i] - 1 for i in range(m)])
+    return np.array(rows, dtype=float) * (total / units)
+
+
+def random_candidates(m: int, total: float, n: int, rng):
+    """n splits of `total` over m factors, uniform over the simplex."""
+    return rng.dirichlet(np.ones(m), n) * total
+
+
+def successive_halving(problem: Problem, weights, snaps, metric: str, eta: int, rng):
+    """
+    Judge every candidate on a small random sample of `snaps`, keep the best
+    1/eta, grow the sample eta-fold and repeat until the last round sees all
+    of them. Returns (surviving candidate indices, their Stats on all snaps).
+    """
+    snaps  = rng.permutation(np.asarray(snaps))
+    rounds = max(1, min(
+        int(math.log(max(len(weights), 1), eta)) + 1,
+        int(math.log(max(len(snaps) / _MIN_RUNG, 1), eta)) + 1,
+    ))
+    alive = np.arange(len(weights))
+    for r in range(rounds):
+        size   = len(snaps) if r == rounds - 1 else math.ceil(len(snaps) / eta ** (rounds - 1 - r))
+        stats  = evaluate_all(problem, weights[alive], np.sort(snaps[:size]))
+        if r == rounds - 1:
+            return alive, stats
+        keep  = np.argsort(-objective(stats, metric), kind="stable")[:max(1, math.ceil(len(alive) / eta))]
+        alive = alive[np.sort(keep)]
+
+
+# ── Search ────────────────────────────────────────────────────────
+class SearchResult(NamedTuple):
+    profile:    ScanProfile   # the winner, under the requested name
+    candidates: int
+    train:      Stats         # winner (index 0) and base profile (index 1) on the search snapshots
+    holdout:    Stats | None  # the same two on the held-out snapshots
+
+
+def split_snapshots(times, horizon: float, holdout: float):
+    """(search, held-out) snapshot indices: the latest `holdout` share is held out, and search snapshots whose exit lands in it are dropped."""
+    S     = len(times)
+    cut   = S - int(round(S * holdout))
+    if cut >= S:
+        return np.arange(S), np.arange(0)
+    train = np.flatnonzero(times[:cut] + horizon < times[cut])
+    return train, np.arange(cut, S)
+
+
+def optimize(
+    series: backtest.SnapshotSeries,
+    base: ScanProfile | None = None,
+    factors: list[str] | None = None,
+    search: str = "halving",
+    candidates: int = OPTIMIZE_CANDIDATES,
+    step: float = OPTIMIZE_GRID_STEP,
+    horizon: float = OPTIMIZE_HORIZON,
+    k: int = BACKTEST_TOP_K,
+    metric: str = "mean",
+    holdout: float = OPTIMIZE_HOLDOUT,
+    name: str = "OPTIMIZED",
+    seed: int | None = None,
+) -> SearchResult:
+    """Find the weights for `factors` that maximize `metric` of the top-k forward return over the series."""
+    base    = base or profiles.DEFAULT
+    factors = list(factors or DEFAULT_FACTORS)
+    unknown = set(factors) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown factor(s): {', '.join(sorted(unknown))}")
+    rng     = np.random.default_rng(seed)
+    total   = sum(base.weights[f] for f in factors) or 1.0
+    problem = build_problem(series, base, factors, horizon, k)
+    train, test = split_snapshots(series.times, horizon, holdout)
+    if not len(train):
+        raise ValueError("Not enough snapshots to search on — record a longer stretch or lower the holdout")
+
+    current = np.array([[base.weights[f] for f in factors]])
+    if search == "grid":
+        weights = grid_candidates(len(factors), total, step)
+    elif search in ("random", "halving"):
+        weights = random_candidates(len(factors), total, candidates, rng)
+    else:
+        raise ValueError(f"Unknown search {search!r} (grid, random or halving)")
+    weights = np.vstack([current, weights])   # the base weights always compete
+
+    if search == "halving":
+        alive, stats = successive_halving(problem, weights, train, metric, OPTIMIZE_HALVING, rng)
+    else:
+        alive, stats = np.arange(len(weights)), evaluate_all(problem, weights, train)
+    best    = alive[int(np.argmax(objective(stats, metric)))]
+    pair    = np.vstack([weights[best], current])
+    winner  = base._replace(
+        name=name,
+        weights={**base.weights, **{f: round(float(w), 4) for f, w in zip(factors, weights[best])}},
+    )
+    return SearchResult(
+        winner, len(weights),
+        evaluate_all(problem, pair, train),
+        evaluate_all(problem, pair, test) if len(test) else None,
+    )
+
+
+def format_result(r: SearchResult, factors: list[str], metric: str) -> str:
+    lines = [f"{r.candidates} candidates — best weights ({metric}):"]
+    for f in factors:
+        lines.append(f"  {f:<14} {r.profile.weights[f]:.3f}")
+    for label, stats in (("search", r.train), ("holdout", r.holdout)):
+        if stats is None:
+            continue
+        if not stats.picks.any():
+            lines.append(f"  {label:<8} (no forward returns that far ahead)")
+            continue
+        for i, who in enumerate(("best", "base")):
+            lines.append(
+                f"  {label:<8} {who}: mean {stats.mean[i]:+.2f}%  hit rate {stats.hit[i]:.1%}  "
+                f"({int(stats.picks[i])} picks)"
+            )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Search scoring weights against recorded market snapshots.")
+    backtest.add_source_arguments(parser)
+    parser.add_argument("--search", choices=("grid", "random", "halving"), default="halving")
+    parser.add_argument("--candidates", type=int, default=OPTIMIZE_CANDIDATES,
+                        help=f"Weight sets drawn by random / halving search (default {OPTIMIZE_CANDIDATES})")
+    parser.add_argument("--step", type=float, default=OPTIMIZE_GRID_STEP, help="Grid weight increment")
+    parser.add_argument("--factors", default=",".join(DEFAULT_FACTORS), help="Comma-separated factors to search")
+    parser.add_argument("--base", metavar="PROFILE", help="Profile supplying filters and the other weights (default: config)")
+    parser.add_argument("--horizon", default=backtest._fmt_horizon(OPTIMIZE_HORIZON), help="Forward-return horizon, e.g. 4h")
+    parser.add_argument("--top", type=int, default=BACKTEST_TOP_K, help="Picks per snapshot")
+    parser.add_argument("--metric", choices=("mean", "hit"), default="mean", help="Mean forward return or hit rate")
+    parser.add_argument("--holdout", type=float, default=OPTIMIZE_HOLDOUT, help="Latest share of snapshots held out")
+    parser.add_argument("--name", default="OPTIMIZED", help="Name the winner is saved under")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--dry-run", action="store_true", help="Report only, don't save the profile")
+    args = parser.parse_args()
+
+    if np is None:
+        print("Weight search needs NumPy (pip install numpy)", file=sys.stderr)
+        return 1
+    try:
+        base     = profiles.get(args.base) if args.base else profiles.DEFAULT
+        factors  = [f.strip() for f in args.factors.split(",") if f.strip()]
+        horizon  = backtest._parse_horizon(args.horizon)
+        series   = backtest.load_series(args)
+        if series is None:
+            raise ValueError("Give capture files or --archive")
+        print(f"{len(series)} snapshots, {series.rows:,} rows")
+        result   = optimize(
+            series, base, factors, args.search, args.candidates, args.step, horizon,
+            args.top, args.metric, args.holdout, args.name, args.seed,
+        )
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        parallel.shutdown()
+
+    print(format_result(result, factors, args.metric))
+    if not args.dry_run:
+        profiles.save_user_profile(result.profile)
+        print(f"Saved profile {result.profile.name!r} to {USER_PROFILES_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
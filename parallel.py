@@ -0,0 +1,202 @@
+"""
+Process-pool execution for the numeric scan stages on huge universes.
+A stage is a function over row-aligned columns that returns one value per row
+per output. map_rows() packs the input columns into a single
+multiprocessing.shared_memory block, hands each worker a row range plus the
+block's layout (a few hundred bytes — coin dicts are never pickled), and the
+workers write their slice of every output into a second shared block.
+map_shared() is the same for task-shaped work (e.g. optimize.py's candidate
+chunks): the arrays go into shared memory once, each task carries only its
+own small arguments.
+
+Runs in-process instead when the snapshot is below PARALLEL_MIN_ROWS (map_rows)
+or the tasks' total work below PARALLEL_MIN_WORK (map_shared), when
+PARALLEL_WORKERS ≤ 1, without NumPy, or once the pool has failed to start.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import PARALLEL_WORKERS, PARALLEL_MIN_ROWS, PARALLEL_MIN_WORK
+
+_ALIGN = 64   # byte alignment of each array inside a block
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_broken    = False   # pool failed once → stay in-process for the rest of the session
+last_error: str | None = None
+
+
+def _available() -> bool:
+    return np is not None and not _broken and PARALLEL_WORKERS > 1
+
+
+def enabled(rows: int) -> bool:
+    """True if a stage over `rows` rows would go to the process pool."""
+    return _available() and rows >= PARALLEL_MIN_ROWS
+
+
+def enabled_work(work: float) -> bool:
+    """True if tasks costing `work` element operations in total would go to the process pool."""
+    return _available() and work >= PARALLEL_MIN_WORK
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays laid out in one shared-memory block. `spec` is the
+    picklable (block name, layout) a worker passes to attach().
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict[str, tuple], owner: bool):
+        self._shm   = shm
+        self.layout = layout   # name -> (offset, shape, dtype str)
+        self.owner  = owner
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dt), buffer=shm.buf, offset=off)
+            for name, (off, shape, dt) in layout.items()
+        }
+
+    @property
+    def spec(self) -> tuple[str, dict[str, tuple]]:
+        return self._shm.name, self.layout
+
+    @classmethod
+    def create(cls, shapes: dict[str, tuple[tuple, str]]) -> "SharedArrays":
+        """New zero-filled block holding an array per name -> (shape, dtype)."""
+        layout, size = {}, 0
+        for name, (shape, dt) in shapes.items():
+            layout[name] = (size, tuple(shape), np.dtype(dt).str)
+            nbytes = int(np.prod(shape)) * np.dtype(dt).itemsize
+            size  += -(-nbytes // _ALIGN) * _ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        return cls(shm, layout, owner=True)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "SharedArrays":
+        """New block holding a copy of each array."""
+        block = cls.create({name: (a.shape, a.dtype.str) for name, a in arrays.items()})
+        for name, a in arrays.items():
+            block.arrays[name][...] = a
+        return block
+
+    @classmethod
+    def attach(cls, spec: tuple[str, dict[str, tuple]]) -> "SharedArrays":
+        name, layout = spec
+        return cls(shared_memory.SharedMemory(name=name), layout, owner=False)
+
+    def close(self) -> None:
+        self.arrays = {}   # drop the views before the buffer goes away
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _run_rows(func: Callable, in_spec, out_spec, start: int, stop: int, kwargs: dict) -> None:
+    """Worker side of map_rows: run `func` on rows [start, stop) and write the outputs in place."""
+    inputs, outputs = SharedArrays.attach(in_spec), SharedArrays.attach(out_spec)
+    try:
+        result = func(**{name: a[start:stop] for name, a in inputs.arrays.items()}, **kwargs)
+        for name, out in outputs.arrays.items():
+            out[start:stop] = result[name]
+        del result
+    finally:
+        inputs.close()
+        outputs.close()
+
+
+def _run_shared(func: Callable, spec, kwargs: dict):
+    """Worker side of map_shared: run `func` on the shared arrays plus one task's arguments."""
+    inputs = SharedArrays.attach(spec)
+    try:
+        return func(**inputs.arrays, **kwargs)
+    finally:
+        inputs.close()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the GUI process has Qt and network threads running
+            _pool = ProcessPoolExecutor(PARALLEL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def map_rows(func: Callable, inputs: dict, outputs: tuple[str, ...], **kwargs) -> dict:
+    """
+    func(**row slices of `inputs`, **kwargs) -> {output name: per-row values}.
+    Returns {name: float64 array} for each name in `outputs`, computed in
+    row chunks across the pool when enabled(), else by one direct call.
+    `func` must be a module-level function so workers can import it.
+    """
+    global _broken, last_error
+    rows = len(next(iter(inputs.values()))) if inputs else 0
+    if not enabled(rows):
+        result = func(**inputs, **kwargs)
+        return {name: np.asarray(result[name], dtype=float) for name in outputs}
+
+    out = SharedArrays.create({name: ((rows,), "f8") for name in outputs})
+    try:
+        with SharedArrays.from_arrays(inputs) as shared_in:
+            pool   = _get_pool()
+            bounds = np.linspace(0, rows, PARALLEL_WORKERS + 1).astype(int).tolist()
+            futures = [
+                pool.submit(_run_rows, func, shared_in.spec, out.spec, start, stop, kwargs)
+                for start, stop in zip(bounds, bounds[1:]) if stop > start
+            ]
+            for f in futures:
+                f.result()
+        return {name: a.copy() for name, a in out.arrays.items()}
+    except Exception as e:
+        last_error = f"Process pool failed, running in-process from now on: {e}"
+        _broken    = True
+        shutdown()
+        result = func(**inputs, **kwargs)
+        return {name: np.asarray(result[name], dtype=float) for name in outputs}
+    finally:
+        out.close()
+
+
+def map_shared(func: Callable, arrays: dict, tasks: list[dict], work: float) -> list:
+    """
+    [func(**arrays, **task) for task in tasks], with `arrays` placed in shared
+    memory once and the tasks spread across the pool when enabled_work() for
+    `work`, the caller's estimate of the tasks' total element operations.
+    Results are pickled back, so keep them small; they must not be views of
+    the shared arrays.
+    """
+    global _broken, last_error
+    if not enabled_work(work) or len(tasks) < 2:
+        return [func(**arrays, **task) for task in tasks]
+    try:
+        with SharedArrays.from_arrays(arrays) as shared:
+            pool    = _get_pool()
+            futures = [pool.submit(_run_shared, func, shared.spec, task) for task in tasks]
+            return [f.result() for f in futures]
+    except Exception as e:
+        last_error = f"Process pool failed, running in-process from now on: {e}"
+        _broken    = True
+        shutdown()
+        return [func(**arrays, **task) for task in tasks]
@@ -0,0 +1,157 @@
+"""
+Scan profiles — several rankings from one snapshot.
+A profile is a weight set plus filters and normalization choices layered over
+the defaults in config. SCAN_PROFILES lists the named ones, followed by any
+saved to USER_PROFILES_PATH by optimize.py; DEFAULT is the plain config (what
+rank_coins uses when no profile is given).
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from config import (
+    WEIGHT_PRICE_CHANGE_24H,
+    WEIGHT_VOL_MCAP_RATIO,
+    WEIGHT_TRENDING,
+    WEIGHT_PRICE_CHANGE_7D,
+    WEIGHT_MARKET_CAP_RANK,
+    NEWLY_LISTED_BONUS,
+    FEATURE_WEIGHTS,
+    FACTOR_NORMALIZATION,
+    SCAN_PROFILES,
+    DEFAULT_PROFILE,
+    USER_PROFILES_PATH,
+)
+from features import FEATURE_NAMES
+
+# Every weighted factor, in the order scores are summed
+DEFAULT_WEIGHTS: dict[str, float] = {
+    "pct_24h":      WEIGHT_PRICE_CHANGE_24H,
+    "vmr":          WEIGHT_VOL_MCAP_RATIO,
+    "trending":     WEIGHT_TRENDING,
+    "pct_7d":       WEIGHT_PRICE_CHANGE_7D,
+    "mcap_rank":    WEIGHT_MARKET_CAP_RANK,
+    "newly_listed": NEWLY_LISTED_BONUS,
+    **FEATURE_WEIGHTS,
+}
+RANGE_FACTORS = ("vmr", "pct_24h", "pct_7d")   # the factors normalized against the snapshot
+_KEYS = {"weights", "exclude_blue_chips", "max_rank", "normalization", "bounds"}
+
+
+class ScanProfile(NamedTuple):
+    name:               str
+    weights:            dict[str, float]               # every factor in DEFAULT_WEIGHTS
+    exclude_blue_chips: bool | None            = None  # None = follow the scan's setting
+    max_rank:           int | None             = None  # drop coins ranked beyond this (or unranked)
+    normalization:      dict[str, str] | None  = None  # per range factor; None = FACTOR_NORMALIZATION
+    bounds:             dict[str, tuple] | None = None  # fixed (lo, hi) per range factor
+
+    def blue_chips_excluded(self, default: bool) -> bool:
+        return default if self.exclude_blue_chips is None else self.exclude_blue_chips
+
+    def quantile_mode(self, factor: str) -> bool:
+        return (self.normalization or FACTOR_NORMALIZATION).get(factor, "minmax") == "quantile"
+
+    def fixed_bounds(self, factor: str) -> tuple[float, float] | None:
+        fixed = (self.bounds or {}).get(factor)
+        return tuple(fixed) if fixed is not None else None
+
+
+def build(name: str, spec: dict) -> ScanProfile:
+    """ScanProfile from a SCAN_PROFILES entry; unknown keys or factors raise ValueError."""
+    unknown = set(spec) - _KEYS
+    if unknown:
+        raise ValueError(f"Profile {name!r}: unknown setting(s) {', '.join(sorted(unknown))}")
+    weights = dict(DEFAULT_WEIGHTS)
+    for factor, w in (spec.get("weights") or {}).items():
+        if factor not in weights:
+            raise ValueError(f"Profile {name!r}: unknown factor {factor!r}")
+        weights[factor] = float(w)
+    for key in ("normalization", "bounds"):
+        for factor in spec.get(key) or {}:
+            if factor not in RANGE_FACTORS:
+                raise ValueError(f"Profile {name!r}: {key} only applies to {', '.join(RANGE_FACTORS)}")
+    normalization = {**FACTOR_NORMALIZATION, **spec["normalization"]} if spec.get("normalization") else None
+    return ScanProfile(
+        name, weights, spec.get("exclude_blue_chips"), spec.get("max_rank"),
+        normalization, dict(spec["bounds"]) if spec.get("bounds") else None,
+    )
+
+
+def to_spec(profile: ScanProfile) -> dict:
+    """The SCAN_PROFILES entry that build() turns back into `profile` (only what differs from the defaults)."""
+    out: dict = {}
+    weights = {f: w for f, w in profile.weights.items() if w != DEFAULT_WEIGHTS.get(f)}
+    if weights:
+        out["weights"] = weights
+    for key in ("exclude_blue_chips", "max_rank", "normalization", "bounds"):
+        value = getattr(profile, key)
+        if value is not None:
+            out[key] = value
+    return out
+
+
+def load_user_profiles(path: Path = USER_PROFILES_PATH) -> dict[str, ScanProfile]:
+    """Profiles saved by optimize.py. A missing or unreadable file, or an invalid entry, is skipped."""
+    try:
+        raw = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+    out = {}
+    for name, entry in raw.items() if isinstance(raw, dict) else ():
+        try:
+            out[name] = build(name, entry)
+        except (ValueError, TypeError, AttributeError):
+            continue
+    return out
+
+
+def save_user_profile(profile: ScanProfile, path: Path = USER_PROFILES_PATH) -> None:
+    """Add or replace `profile` in the user profile file (written atomically)."""
+    path = Path(path)
+    try:
+        raw = json.loads(path.read_text())
+    except (OSError, ValueError):
+        raw = {}
+    if not isinstance(raw, dict):
+        raw = {}
+    raw[profile.name] = to_spec(profile)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(raw, indent=2))
+    os.replace(tmp, path)
+
+
+DEFAULT = ScanProfile("DEFAULT", DEFAULT_WEIGHTS)
+PROFILES: dict[str, ScanProfile] = {
+    **{name: build(name, entry) for name, entry in SCAN_PROFILES.items()},
+    **load_user_profiles(),
+}
+
+
+def names() -> list[str]:
+    return list(PROFILES)
+
+
+def get(name: str | None = None) -> ScanProfile:
+    """Profile by name (case-insensitive); DEFAULT_PROFILE when name is None."""
+    if name is None:
+        return PROFILES.get(DEFAULT_PROFILE, DEFAULT)
+    for key, profile in PROFILES.items():
+        if key.lower() == name.lower():
+            return profile
+    raise KeyError(f"No scan profile named {name!r} (have: {', '.join(PROFILES)})")
+
+
+def scored_features(profiles: list[ScanProfile] | None = None) -> list[str]:
+    """Feature names with a non-zero weight in any of `profiles` (default: all configured + DEFAULT)."""
+    profiles = [DEFAULT, *PROFILES.values()] if profiles is None else profiles
+    return [name for name in FEATURE_NAMES if any(p.weights.get(name) for p in profiles)]
+
+
+def quantile_factors(profiles: list[ScanProfile] | None = None) -> list[str]:
+    """Range factors any of `profiles` normalizes by quantile (default: all configured + DEFAULT)."""
+    profiles = [DEFAULT, *PROFILES.values()] if profiles is None else profiles
+    return [name for name in RANGE_FACTORS if any(p.quantile_mode(name) for p in profiles)]
@@ -0,0 +1,112 @@
+"""
+Mergeable streaming quantile sketch (KLL — Karnin, Lang & Liberty 2016).
+Used for quantile normalization of scoring factors: values stream in page by
+page, sketches built on separate shards merge into one, and memory stays
+O(k) no matter how large the universe grows. Rank error is roughly 1.7/k.
+"""
+
+import math
+import random
+from typing import Iterable
+
+
+class KLLSketch:
+    """
+    Stack of compactors; an item at level h stands for 2**h original values.
+    When a level overflows it is sorted and every other item (random offset)
+    moves up a level. Deterministic for a given seed and feed order.
+    """
+
+    C = 2 / 3   # capacity decay per level below the top
+
+    def __init__(self, k: int = 200, seed: int | None = 0):
+        self.k    = k
+        self.n    = 0
+        self._levels: list[list[float]] = [[]]
+        self._rng = random.Random(seed)
+        self._size     = 0
+        self._max_size = self._capacity(0)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self._levels) - h - 1
+        return max(2, int(math.ceil(self.k * self.C ** depth)))
+
+    def _grow(self) -> None:
+        self._levels.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self._levels)))
+
+    def update(self, value: float) -> None:
+        self._levels[0].append(value)
+        self.n     += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values: Iterable[float]) -> None:
+        values = list(values)
+        self._levels[0].extend(values)
+        self.n     += len(values)
+        self._size += len(values)
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Fold another sketch in; the result summarizes both streams."""
+        while len(self._levels) < len(other._levels):
+            self._grow()
+        for h, items in enumerate(other._levels):
+            self._levels[h].extend(items)
+        self.n     += other.n
+        self._size  = sum(len(lv) for lv in self._levels)
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        while self._size >= self._max_size:
+            for h in range(len(self._levels)):
+                level = self._levels[h]
+                if len(level) < self._capacity(h):
+                    continue
+                if h + 1 == len(self._levels):
+                    self._grow()
+                level.sort()
+                # Odd count: hold the last item back so total weight is preserved exactly
+                keep   = [level.pop()] if len(level) % 2 else []
+                offset = self._rng.random() < 0.5
+                self._levels[h + 1].extend(level[offset::2])
+                self._levels[h] = keep
+                self._size = sum(len(lv) for lv in self._levels)
+                break
+            else:
+                break
+
+    def _weighted(self) -> list[tuple[float, int]]:
+        items = [(v, 1 << h) for h, level in enumerate(self._levels) for v in level]
+        items.sort()
+        return items
+
+    def quantiles(self, qs: Iterable[float]) -> list[float | None]:
+        """Approximate values at fractional ranks qs (0–1); None for an empty sketch."""
+        qs = list(qs)
+        if not self.n:
+            return [None] * len(qs)
+        items = self._weighted()
+        total = sum(w for _, w in items)
+        out   = []
+        for q in qs:
+            target = min(max(q, 0.0), 1.0) * total
+            cum    = 0
+            for v, w in items:
+                cum += w
+                if cum >= target:
+                    out.append(v)
+                    break
+            else:
+                out.append(items[-1][0])
+        return out
+
+    def quantile(self, q: float) -> float | None:
+        return self.quantiles((q,))[0]
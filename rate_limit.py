@@ -0,0 +1,122 @@
+"""
+Process-wide CoinGecko request scheduler.
+Token bucket sized to the free-tier budget, with a priority queue so a
+user-triggered scan never waits behind background polling.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+from config import REQUESTS_PER_MINUTE, REQUEST_BURST
+
+# Lower number = served first
+PRIORITY_SCAN       = 0   # user pressed RUN SCAN / ran the CLI
+PRIORITY_POLL       = 1   # watchlist price polling
+PRIORITY_BACKGROUND = 2   # gainers/losers, crawlers, anything nobody is waiting on
+
+
+class RequestScheduler:
+    """
+    Token bucket (per_minute tokens/min, up to `burst` banked) shared by every
+    CoinGecko call. Waiters are granted strictly in (priority, arrival) order.
+    A 429 with Retry-After freezes the bucket for that long via penalize().
+    """
+
+    def __init__(self, per_minute: int = REQUESTS_PER_MINUTE, burst: int = REQUEST_BURST):
+        self.per_minute = max(1, per_minute)
+        self.capacity   = max(1, burst)
+        self._rate      = self.per_minute / 60.0
+        self._tokens    = float(self.capacity)
+        self._stamp     = time.monotonic()
+        self._blocked   = 0.0                       # monotonic time until which nothing is sent
+        self._waiting: list[tuple[int, int]] = []   # heap of (priority, seq)
+        self._seq       = itertools.count()
+        self._granted: deque[float] = deque()       # grant times within the last minute
+        self._cond      = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self._rate)
+        self._stamp  = now
+        while self._granted and now - self._granted[0] >= 60.0:
+            self._granted.popleft()
+
+    def acquire(self, priority: int = PRIORITY_BACKGROUND, timeout: float | None = None) -> None:
+        """Block until this caller may send one request. Raises TimeoutError after `timeout` s."""
+        ticket   = (priority, next(self._seq))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    at_head = self._waiting[0] == ticket
+                    if at_head and now >= self._blocked and self._tokens >= 1.0:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= 1.0
+                        self._granted.append(now)
+                        self._cond.notify_all()
+                        return
+
+                    # Only the head of the queue sleeps on the clock; everyone else waits for a grant
+                    wait = None
+                    if at_head:
+                        wait = max(self._blocked - now, (1.0 - self._tokens) / self._rate, 0.01)
+                    if deadline is not None:
+                        left = deadline - now
+                        if left <= 0:
+                            raise TimeoutError("Timed out waiting for CoinGecko request budget.")
+                        wait = left if wait is None else min(wait, left)
+                    self._cond.wait(wait)
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                raise
+
+    def penalize(self, seconds: float) -> None:
+        """Server said slow down — drain the bucket and send nothing for `seconds`."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens  = 0.0
+            self._blocked = max(self._blocked, now + max(0.0, seconds))
+            self._cond.notify_all()
+
+    def budget(self) -> dict:
+        """Snapshot of the budget: requests left this rolling minute, queue depth, backoff."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "per_minute":  self.per_minute,
+                "used":        len(self._granted),
+                "remaining":   max(0, self.per_minute - len(self._granted)),
+                "tokens":      int(self._tokens),
+                "queued":      len(self._waiting),
+                "blocked_for": max(0.0, self._blocked - now),
+            }
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# The one scheduler every CoinGecko call in this process goes through
+scheduler = RequestScheduler()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Record / replay CoinGecko traffic.
+
+Capture: set SHITCOINER_RECORD=capture.jsonl (or pass --record to the CLI) and
+every response _get hands back is appended to that file as one JSON line.
+
+Replay: serve a capture from a local stand-in for the API, then point the app at it:
+
+    python replay.py capture.jsonl --port 8765 [--speed 10] [--latency 0.3]
+    COINGECKO_BASE=http://127.0.0.1:8765/api/v3 python main.py
+
+Without --speed each endpoint+params key serves its recordings in order,
+sticking on the last, so a recorded scan replays exactly; a price request
+with no recording of its own gets the prices as of the newest record served
+so far. With --speed the capture's own clock runs at that multiple of real
+time and every request gets the latest recording at that point.
+"""
+
+import argparse
+import bisect
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+
+def _params_key(params: dict, drop: tuple[str, ...] = ()) -> tuple:
+    return tuple(sorted((k, str(v).lower()) for k, v in params.items() if k not in drop))
+
+
+# ── Capture ───────────────────────────────────────────────────────
+class Recorder:
+    """Appends {t, path, params, body} lines to a JSONL file. Thread-safe; off until start()."""
+
+    def __init__(self):
+        self._fh   = None
+        self._lock = threading.Lock()
+        self._last: dict[tuple, float] = {}   # (path, params) -> fetch time of the newest body recorded
+
+    @property
+    def active(self) -> bool:
+        return self._fh is not None
+
+    def start(self, path: str | Path) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(path, "a", encoding="utf-8")
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def record(self, url: str, params: dict, body, t: float | None = None) -> None:
+        """
+        Append a response body fetched from the API at `t` (default now). A body
+        no newer than the last one recorded for the same request — a cache hit
+        served again, or one fetch shared by several callers — is skipped.
+        """
+        t    = time.time() if t is None else t
+        path = urlparse(url).path
+        key  = (path, _params_key(params))
+        with self._lock:
+            if self._fh is None or self._last.get(key, float("-inf")) >= t:
+                return
+            self._last[key] = t
+        line = json.dumps({
+            "t":      t,
+            "path":   path,
+            "params": {k: str(v) for k, v in params.items()},
+            "body":   body,
+        }, separators=(",", ":"))
+        with self._lock:
+            if self._fh is not None:
+                self._fh.write(line + "\n")
+                self._fh.flush()
+
+
+recorder = Recorder()
+
+
+# ── Replay ────────────────────────────────────────────────────────
+def load_capture(path: str | Path) -> list[dict]:
+    """All records of a capture file, oldest first. Torn trailing lines are skipped."""
+    records = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    records.sort(key=lambda r: r["t"])
+    return records
+
+
+def _endpoint(path: str) -> str:
+    for ep in ("/coins/markets", "/search/trending", "/simple/price"):
+        if path.endswith(ep):
+            return ep
+    return path
+
+
+class ReplayStore:
+    """Recordings indexed for lookup by endpoint + params, on a virtual clock."""
+
+    def __init__(self, records: list[dict], speed: float | None = None):
+        self.speed  = speed
+        self.t0     = records[0]["t"] if records else time.time()
+        self.start  = time.time()
+        self._lock  = threading.Lock()
+        self._by_key: dict[tuple, list[dict]] = {}
+        self._cursor: dict[tuple, int] = {}
+        self._served_t = self.t0   # capture time of the newest record served in cursor mode
+        # id -> ([t], [simple/price quote or markets row]) across the capture, oldest first
+        self._prices: dict[str, tuple[list[float], list[dict]]] = {}
+        for r in records:
+            ep = _endpoint(r["path"])
+            self._by_key.setdefault((ep, _params_key(r["params"])), []).append(r)
+            if ep == "/coins/markets":
+                # Also index without `sparkline` so a sparkline=false call can use a full page
+                self._by_key.setdefault((ep, _params_key(r["params"], ("sparkline",))), []).append(r)
+            for cid, entry in _price_entries(ep, r["body"]):
+                times, entries = self._prices.setdefault(cid, ([], []))
+                times.append(r["t"])
+                entries.append(entry)
+        self._times = {key: [r["t"] for r in recs] for key, recs in self._by_key.items()}
+
+    def now(self) -> float:
+        """Current position on the capture's clock (only meaningful with a speed)."""
+        return self.t0 + (time.time() - self.start) * (self.speed or 0.0)
+
+    def _pick(self, key: tuple) -> dict | None:
+        recs = self._by_key.get(key)
+        if not recs:
+            return None
+        if self.speed:
+            i = bisect.bisect_right(self._times[key], self.now()) - 1
+            return recs[max(0, i)]
+        with self._lock:
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = min(i + 1, len(recs) - 1)
+            self._served_t    = max(self._served_t, recs[i]["t"])
+        return recs[i]
+
+    def answer(self, path: str, params: dict):
+        """Response body for a request, or None if the capture can't answer it."""
+        ep  = _endpoint(path)
+        rec = self._pick((ep, _params_key(params)))
+        if rec is None and ep == "/simple/price":
+            return self._simple_price(params)
+        if rec is None and ep == "/coins/markets":
+            rec = self._pick((ep, _params_key(params, ("sparkline",))))
+            if rec is not None and str(params.get("sparkline")).lower() == "false":
+                return [{k: v for k, v in row.items() if k != "sparkline_in_7d"} for row in rec["body"]]
+        return rec["body"] if rec is not None else None
+
+    def _simple_price(self, params: dict) -> dict:
+        """Latest known price per requested id, as of the virtual clock or the newest record served."""
+        if self.speed:
+            limit = self.now()
+        else:
+            with self._lock:
+                limit = self._served_t
+        out: dict[str, dict] = {}
+        for cid in params.get("ids", "").split(","):
+            times, entries = self._prices.get(cid, ((), ()))
+            i = bisect.bisect_right(times, limit) - 1
+            if i < 0:
+                continue
+            entry = entries[i]
+            out[cid] = entry if "usd" in entry else {   # markets row → simple/price shape
+                "usd":            entry.get("current_price"),
+                "usd_24h_change": entry.get("price_change_percentage_24h"),
+                "usd_market_cap": entry.get("market_cap"),
+                "usd_24h_vol":    entry.get("total_volume"),
+            }
+        return out
+
+
+def _price_entries(ep: str, body):
+    """(id, quote or markets row) pairs carried by a /simple/price or /coins/markets body."""
+    if ep == "/simple/price" and isinstance(body, dict):
+        yield from body.items()
+    elif ep == "/coins/markets" and isinstance(body, list):
+        for row in body:
+            if row.get("id"):
+                yield row["id"], row
+
+
+def make_server(store: ReplayStore, port: int = 8765, latency: float = 0.0) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            u      = urlparse(self.path)
+            params = dict(parse_qsl(u.query))
+            body   = store.answer(u.path, params)
+            if latency:
+                time.sleep(latency)
+            status = 200
+            if body is None:
+                status, body = 404, {"error": f"no recording for {u.path}"}
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve a recorded CoinGecko capture on localhost.")
+    parser.add_argument("capture",               help="JSONL file written by SHITCOINER_RECORD / --record")
+    parser.add_argument("--port",    type=int,   default=8765)
+    parser.add_argument("--speed",   type=float, default=None,
+                        help="Run the capture's clock at this multiple of real time (default: replay in order)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds of artificial delay per response")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)
+    if not records:
+        print(f"No recordings in {args.capture}", file=sys.stderr)
+        return 1
+    server = make_server(ReplayStore(records, args.speed), args.port, args.latency)
+    print(f"Replaying {len(records)} responses from {args.capture}")
+    print(f"  COINGECKO_BASE=http://127.0.0.1:{args.port}/api/v3")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
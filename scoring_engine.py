@@ -0,0 +1,278 @@
+"""
+Columnar (NumPy) scoring engine behind analysis.rank_coins.
+A snapshot is turned into one array per scoring input once; the hard filters,
+the five weighted factors and the newly-listed bonus are then whole-array
+operations. Mirrors analysis.score_coin factor for factor, so scores match the
+per-coin path within float tolerance. The normalized factor columns are kept
+in a FactorColumns, so several scan profiles score one snapshot for the price
+of little more than one weighted sum each.
+
+NumPy is optional — without it analysis falls back to the per-coin path.
+"""
+
+import time
+from typing import Callable, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import NEWLY_LISTED_DAYS, BLUE_CHIP_RANK_CUTOFF, FEATURE_RANGES
+from profiles import DEFAULT_WEIGHTS
+import features
+import parallel
+
+
+def available() -> bool:
+    return np is not None
+
+
+class SnapshotColumns:
+    """
+    One array per raw scoring input, row-aligned with `coins`.
+    Missing numbers are NaN; `ids` holds lower-cased ids for trending lookups.
+    """
+
+    __slots__ = ("coins", "ids", "pct_24h", "pct_7d", "vmr", "mcap_rank", "stable", "atl_ts", "features")
+
+    def __init__(self, coins, ids, pct_24h, pct_7d, vmr, mcap_rank, stable, atl_ts, features=None):
+        self.coins     = coins
+        self.ids       = ids
+        self.pct_24h   = pct_24h
+        self.pct_7d    = pct_7d
+        self.vmr       = vmr
+        self.mcap_rank = mcap_rank
+        self.stable    = stable
+        self.atl_ts    = atl_ts
+        self.features  = features or {}   # scored sparkline features only, NaN = n/a
+
+    @property
+    def n(self) -> int:
+        return len(self.stable)
+
+    @classmethod
+    def from_coins(
+        cls, coins: list, derive: Callable, feature_names: Iterable[str] | None = None,
+    ) -> "SnapshotColumns":
+        """
+        `derive(coin)` supplies the slow-changing per-coin attributes
+        (id_lower, stable, atl_ts) — analysis passes its DerivedCache.get.
+        `feature_names` are the sparkline features to columnize (default: the scored ones).
+        """
+        if feature_names is None:
+            feature_names = [name for name, *_ in features.scoring_factors()]
+        n   = len(coins)
+        nan = float("nan")
+        ids       = []
+        pct_24h   = np.empty(n)
+        pct_7d    = np.empty(n)
+        vmr       = np.empty(n)
+        mcap_rank = np.empty(n)
+        stable    = np.empty(n, dtype=bool)
+        atl_ts    = np.empty(n)
+        for i, c in enumerate(coins):
+            d = derive(c)
+            ids.append(d.id_lower)
+            p24 = c.get("price_change_percentage_24h")
+            p7  = c.get("price_change_percentage_7d")
+            rk  = c.get("market_cap_rank")
+            pct_24h[i]   = nan if p24 is None else p24
+            pct_7d[i]    = nan if p7 is None else p7
+            vmr[i]       = c.get("vol_mcap_ratio", 0.0)
+            mcap_rank[i] = nan if rk is None else rk
+            stable[i]    = d.stable
+            atl_ts[i]    = nan if d.atl_ts is None else d.atl_ts
+        feats = {
+            name: np.fromiter((nan if (v := c.get(name)) is None else v for c in coins), dtype=float, count=n)
+            for name in feature_names
+        }
+        return cls(list(coins), ids, pct_24h, pct_7d, vmr, mcap_rank, stable, atl_ts, feats)
+
+    @classmethod
+    def concat(cls, parts: list["SnapshotColumns"]) -> "SnapshotColumns":
+        if len(parts) == 1:
+            return parts[0]
+        coins, ids = [], []
+        for p in parts:
+            coins.extend(p.coins)
+            ids.extend(p.ids)
+        cat = lambda name: np.concatenate([getattr(p, name) for p in parts]) if parts else np.empty(0)
+        names = set(parts[0].features).intersection(*(p.features for p in parts[1:]))
+        feats = {name: np.concatenate([p.features[name] for p in parts]) for name in names}
+        return cls(coins, ids, cat("pct_24h"), cat("pct_7d"), cat("vmr"),
+                   cat("mcap_rank"), cat("stable").astype(bool), cat("atl_ts"), feats)
+
+    def factor_values(self, name: str):
+        """Known values of a range-normalized factor ("vmr", "pct_24h", "pct_7d") over non-stable rows."""
+        col = getattr(self, name)[~self.stable]
+        return col[~np.isnan(col)]
+
+
+def _normalize(values, lo: float, hi: float):
+    """Vector analysis._normalize."""
+    if hi <= lo:
+        return np.full(values.shape, 0.5)
+    return np.clip((values - lo) / (hi - lo), 0.0, 1.0)
+
+
+def _normalize_log(values, lo: float, hi: float):
+    """Vector analysis._normalize_log."""
+    if hi <= lo:
+        return np.zeros(values.shape)
+    ll = np.log1p(max(0.0, lo))
+    lh = np.log1p(hi)
+    if lh <= ll:
+        out = np.full(values.shape, 0.5)
+    else:
+        with np.errstate(invalid="ignore"):
+            out = np.clip((np.log1p(values) - ll) / (lh - ll), 0.0, 1.0)
+    return np.where(values > 0, out, 0.0)
+
+
+def filter_mask(cols: SnapshotColumns, exclude_blue_chips: bool = True, max_rank: int | None = None):
+    """True for rows that survive the hard filters (stablecoins, optionally blue chips / rank cap)."""
+    keep = ~cols.stable
+    with np.errstate(invalid="ignore"):
+        if exclude_blue_chips:
+            keep &= ~(cols.mcap_rank <= BLUE_CHIP_RANK_CUTOFF)
+        if max_rank is not None:
+            keep &= cols.mcap_rank <= max_rank   # unranked (NaN) rows drop out too
+    return keep
+
+
+class FactorColumns:
+    """
+    Normalized (0–1) factor columns of one snapshot, missing-data defaults
+    filled in. Each column is built on first use and memoized per
+    normalization range, so profiles that share bounds share the work.
+    """
+
+    def __init__(self, cols: SnapshotColumns, trend_ids: set[str], now: float | None = None, trending=None):
+        self.cols      = cols
+        self.trend_ids = trend_ids
+        self.now       = time.time() if now is None else now
+        self._memo: dict[tuple, object] = {}
+        if trending is not None:   # precomputed on-the-list mask (pool workers have no ids)
+            self._memo[("trending", None, None)] = np.where(trending, 1.0, 0.05)
+
+    def trending_mask(self):
+        return np.fromiter((cid in self.trend_ids for cid in self.cols.ids), dtype=bool, count=self.cols.n)
+
+    def get(self, name: str, lo: float | None = None, hi: float | None = None):
+        key = (name, lo, hi)
+        col = self._memo.get(key)
+        if col is None:
+            col = self._memo[key] = self._build(name, lo, hi)
+        return col
+
+    def _build(self, name: str, lo, hi):
+        cols = self.cols
+        if name in ("pct_24h", "pct_7d"):
+            raw = getattr(cols, name)
+            return np.where(np.isnan(raw), 0.4, _normalize(raw, lo, hi))
+        if name == "vmr":
+            return _normalize_log(cols.vmr, lo, hi)
+        if name == "trending":
+            return np.where(self.trending_mask(), 1.0, 0.05)
+        if name == "mcap_rank":
+            return np.where(np.isnan(cols.mcap_rank), 0.7, _normalize(cols.mcap_rank, lo, hi))
+        if name == "newly_listed":
+            with np.errstate(invalid="ignore"):
+                newly = np.floor((self.now - cols.atl_ts) / 86400.0) <= NEWLY_LISTED_DAYS
+            return newly.astype(float)
+        f = cols.features.get(name)
+        if f is None:
+            f = np.full(cols.n, np.nan)   # weight switched on after these columns were built
+        lo, hi = FEATURE_RANGES[name]
+        return np.where(np.isnan(f), 0.4, _normalize(f, lo, hi))
+
+
+def score_profile(
+    factors: FactorColumns,
+    weights: dict[str, float],
+    vmr_bounds: tuple[float, float],
+    pct_24h_bounds: tuple[float, float],
+    pct_7d_bounds: tuple[float, float],
+    exclude_blue_chips: bool = True,
+    max_rank: int | None = None,
+):
+    """Scores (0–1) for every row under one weight set; NaN where a hard filter drops the coin."""
+    cutoff = BLUE_CHIP_RANK_CUTOFF if exclude_blue_chips else 1
+    score = weights["pct_24h"] * factors.get("pct_24h", *pct_24h_bounds)
+    score = score + weights["vmr"]          * factors.get("vmr", *vmr_bounds)
+    score = score + weights["trending"]     * factors.get("trending")
+    score = score + weights["pct_7d"]       * factors.get("pct_7d", *pct_7d_bounds)
+    score = score + weights["mcap_rank"]    * factors.get("mcap_rank", cutoff, 500)
+    score = score + weights["newly_listed"] * factors.get("newly_listed")
+    for name, weight, *_ in features.scoring_factors(weights):
+        score = score + weight * factors.get(name)
+
+    score = np.clip(score, 0.0, 1.0)
+    return np.where(filter_mask(factors.cols, exclude_blue_chips, max_rank), score, np.nan)
+
+
+ProfileJob = tuple   # (name, weights, vmr_bounds, pct_24h_bounds, pct_7d_bounds, exclude_blue_chips, max_rank)
+
+
+def score_profiles(factors: FactorColumns, jobs: list[ProfileJob]) -> dict:
+    """{name: scores} for several profiles over one set of factor columns."""
+    return {name: score_profile(factors, *args) for name, *args in jobs}
+
+
+def score_profiles_rows(
+    pct_24h, pct_7d, vmr, mcap_rank, stable, atl_ts, trending,
+    *, jobs: list[ProfileJob], now: float, **feature_cols,
+) -> dict:
+    """score_profiles over bare column slices — the unit of work parallel.map_rows sends a worker."""
+    cols = SnapshotColumns(None, None, pct_24h, pct_7d, vmr, mcap_rank, stable, atl_ts, feature_cols)
+    return score_profiles(FactorColumns(cols, set(), now, trending), jobs)
+
+
+def score_profiles_parallel(factors: FactorColumns, jobs: list[ProfileJob]) -> dict:
+    """score_profiles, run across the process pool for snapshots big enough (see parallel.py)."""
+    cols = factors.cols
+    if not parallel.enabled(cols.n):
+        return score_profiles(factors, jobs)
+    inputs = {
+        "pct_24h": cols.pct_24h, "pct_7d": cols.pct_7d, "vmr": cols.vmr, "mcap_rank": cols.mcap_rank,
+        "stable": cols.stable, "atl_ts": cols.atl_ts, "trending": factors.trending_mask(), **cols.features,
+    }
+    return parallel.map_rows(
+        score_profiles_rows, inputs, tuple(name for name, *_ in jobs), jobs=jobs, now=factors.now,
+    )
+
+
+def score_columns(
+    cols: SnapshotColumns,
+    trend_ids: set[str],
+    vmr_bounds: tuple[float, float],
+    pct_24h_bounds: tuple[float, float],
+    pct_7d_bounds: tuple[float, float],
+    exclude_blue_chips: bool = True,
+    now: float | None = None,
+    weights: dict[str, float] | None = None,
+):
+    """Scores (0–1) for every row; NaN where a hard filter drops the coin. Default weights from config."""
+    return score_profile(
+        FactorColumns(cols, trend_ids, now), DEFAULT_WEIGHTS if weights is None else weights,
+        vmr_bounds, pct_24h_bounds, pct_7d_bounds, exclude_blue_chips,
+    )
+
+
+def ranked_indices(scores, top_k: int | None = None):
+    """
+    Row indices of non-NaN scores, best first; ties keep snapshot order.
+    With top_k, the best k are picked by partition and only they are sorted.
+    """
+    idx = np.flatnonzero(~np.isnan(scores))
+    if top_k is not None and top_k < idx.size:
+        if top_k <= 0:
+            return idx[:0]
+        vals = scores[idx]
+        kth  = -np.partition(-vals, top_k - 1)[top_k - 1]   # k-th best score
+        # Everything strictly better, then the earliest rows tied with the k-th
+        above = idx[vals > kth]
+        tied  = idx[vals == kth][:top_k - above.size]
+        idx   = np.sort(np.concatenate((above, tied)))
+    return idx[np.argsort(-scores[idx], kind="stable")]
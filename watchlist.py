@@ -0,0 +1,175 @@
+"""
+The bag: coins being watched, with their entry position and alert levels.
+It is read from WATCHLIST_PATH once and served from memory afterwards; the
+file's mtime is checked (at most every WATCHLIST_CHECK_EVERY seconds) so
+edits made outside the app are picked up. Changes are written atomically
+(temp file + rename), WATCHLIST_SAVE_DELAY seconds after the last one, so a
+burst of edits costs one write.
+
+subscribe() registers a callback run after every change — made here or
+picked up from disk — in the thread that made or noticed it.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from config import WATCHLIST_PATH, WATCHLIST_SAVE_DELAY, WATCHLIST_CHECK_EVERY
+
+
+class WatchlistStore:
+    """
+    {coin_id: entry} kept in memory and mirrored to a JSON file. Safe to share
+    across threads. If the file can't be read or written, last_error says why.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = WATCHLIST_PATH,
+        save_delay: float = WATCHLIST_SAVE_DELAY,
+        check_every: float = WATCHLIST_CHECK_EVERY,
+    ):
+        self.path        = Path(path)
+        self.save_delay  = save_delay
+        self.check_every = check_every
+        self.last_error: str | None = None
+        self._entries: dict[str, dict] = {}
+        self._loaded     = False
+        self._stamp      = None    # (mtime_ns, size) of the file as last read or written
+        self._checked_at = 0.0
+        self._dirty      = False   # changed in memory, not yet written
+        self._timer: threading.Timer | None = None
+        self._listeners: list[Callable[[], None]] = []
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    # ── Change notifications ──────────────────────────────────────
+    def subscribe(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self) -> None:
+        for callback in list(self._listeners):
+            callback()
+
+    # ── Disk ──────────────────────────────────────────────────────
+    def _file_stamp(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _sync(self) -> bool:
+        """Load the file on first use, and again when it changed on disk. True if the entries changed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded and (self._dirty or now - self._checked_at < self.check_every):
+                return False
+            self._checked_at = now
+            stamp = self._file_stamp()
+            if self._loaded and stamp == self._stamp:
+                return False
+            entries = {}
+            if stamp is not None:
+                try:
+                    raw = json.loads(self.path.read_text())
+                except (OSError, ValueError) as e:
+                    # Possibly caught mid-write by another program: keep what we have, retry next check
+                    self.last_error = f"Watchlist unreadable: {e}"
+                    if self._loaded:
+                        return False
+                    raw = {}
+                entries = raw if isinstance(raw, dict) else {}
+            first         = not self._loaded
+            changed       = entries != self._entries
+            self._entries = entries
+            self._stamp   = stamp
+            self._loaded  = True
+        return changed and not first
+
+    def _write(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(self._entries, indent=2))
+                os.replace(tmp, self.path)
+            except OSError as e:
+                self.last_error = f"Watchlist not saved: {e}"
+                return
+            self._dirty = False
+            self._stamp = self._file_stamp()
+
+    def flush(self) -> None:
+        """Write pending changes now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._write()
+
+    def _changed(self) -> None:
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self.save_delay > 0:
+                self._timer = threading.Timer(self.save_delay, self._write)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.save_delay <= 0:
+            self._write()
+        self._notify()
+
+    # ── Reads ─────────────────────────────────────────────────────
+    def all(self) -> dict[str, dict]:
+        """Every entry, in the order added (a copy; change the bag through put() / remove())."""
+        if self._sync():
+            self._notify()
+        with self._lock:
+            return dict(self._entries)
+
+    def ids(self) -> list[str]:
+        return list(self.all())
+
+    def get(self, cid: str) -> dict | None:
+        return self.all().get(cid)
+
+    def __contains__(self, cid: str) -> bool:
+        return cid in self.all()
+
+    def __len__(self) -> int:
+        return len(self.all())
+
+    # ── Writes ────────────────────────────────────────────────────
+    def put(self, cid: str, entry: dict) -> None:
+        """Add or replace a coin's entry."""
+        self._sync()
+        with self._lock:
+            self._entries[cid] = entry
+        self._changed()
+
+    def remove(self, cid: str) -> bool:
+        """Drop a coin; False if it wasn't in the bag."""
+        self._sync()
+        with self._lock:
+            if self._entries.pop(cid, None) is None:
+                return False
+        self._changed()
+        return True
+
+
+store = WatchlistStore()